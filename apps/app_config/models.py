@@ -34,6 +34,22 @@ class Config(BaseModel):
         except cls.DoesNotExist:
             return default
 
+    @classmethod
+    def get_float(cls, key, default=0.0):
+        """Obtiene el valor de una configuración numérica (default si falta o es inválido)"""
+        try:
+            return float(cls.get_value(key, default))
+        except (TypeError, ValueError):
+            return default
+
+    @classmethod
+    def get_bool(cls, key, default=False):
+        """Obtiene el valor de una configuración booleana ('1', 'true', 'yes', 'si')"""
+        value = cls.get_value(key)
+        if value is None:
+            return default
+        return value.strip().lower() in ('1', 'true', 'yes', 'si', 'sí')
+
     @classmethod
     def set_value(cls, key, value):
         """Establece o actualiza el valor de una configuración"""
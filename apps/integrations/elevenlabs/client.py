@@ -8,9 +8,11 @@ import os
 import sys
 import subprocess
 import shutil
+import time
 import requests
 from django.conf import settings
 from apps.app_config.models import Config
+from apps.queue_system import metrics
 
 
 class ElevenLabsClient:
@@ -64,6 +66,7 @@ class ElevenLabsClient:
             "optimize_streaming_latency": 3
         }
 
+        start = time.perf_counter()
         try:
             response = requests.post(url, json=data, headers=headers, stream=True)
 
@@ -72,12 +75,15 @@ class ElevenLabsClient:
                 for chunk in response.iter_content(chunk_size=1024):
                     if chunk:
                         audio_chunks.append(chunk)
+                metrics.TTS_SECONDS.observe(time.perf_counter() - start, status='ok')
                 return b''.join(audio_chunks)
             else:
+                metrics.TTS_SECONDS.observe(time.perf_counter() - start, status=str(response.status_code))
                 print(f"[ELEVENLABS] ❌ Error {response.status_code}: {response.text}")
                 return None
 
         except Exception as e:
+            metrics.TTS_SECONDS.observe(time.perf_counter() - start, status='error')
             print(f"[ELEVENLABS] ❌ Exception en text_to_speech: {str(e)}")
             return None
 
@@ -125,7 +131,6 @@ class ElevenLabsClient:
 
             # Generar nombre de archivo si no se proporciona
             if not filename:
-                import time
                 filename = f"tts_{int(time.time())}.mp3"
 
             # Asegurar extensión .mp3
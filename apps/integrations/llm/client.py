@@ -3,9 +3,11 @@ Cliente genérico de LLM compatible con múltiples proveedores
 Soporta: OpenAI, Claude, DeepSeek, LMStudio, etc.
 """
 
+import time
 import requests
 import logging
 from apps.app_config.models import Config
+from apps.queue_system import metrics
 
 logger = logging.getLogger(__name__)
 
@@ -101,6 +103,7 @@ class LLMClient:
         logger.info(f"[LLM] Request to {self.api_url}")
         logger.debug(f"[LLM] Request body: {data}")
 
+        start = time.perf_counter()
         try:
             response = requests.post(
                 self.api_url,
@@ -108,6 +111,10 @@ class LLMClient:
                 json=data,
                 timeout=30
             )
+            metrics.LLM_SECONDS.observe(
+                time.perf_counter() - start,
+                status='ok' if response.status_code == 200 else str(response.status_code)
+            )
 
             print(f"[LLM] 📥 Response status: {response.status_code}")
             logger.info(f"[LLM] Response status: {response.status_code}")
@@ -148,6 +155,7 @@ class LLMClient:
                 return None
 
         except requests.exceptions.Timeout:
+            metrics.LLM_SECONDS.observe(time.perf_counter() - start, status='timeout')
             print("[LLM] ⏱️ TIMEOUT: Request timeout after 30 seconds")
             logger.error("[LLM] Request timeout after 30 seconds")
             return None
@@ -158,6 +166,8 @@ class LLMClient:
             logger.error(f"[LLM] Full response: {response.text if 'response' in locals() else 'No response'}")
             return None
         except Exception as e:
+            if 'response' not in locals():
+                metrics.LLM_SECONDS.observe(time.perf_counter() - start, status='error')
             print(f"[LLM] ❌ EXCEPTION: {str(e)}")
             logger.error(f"[LLM] Exception: {str(e)}", exc_info=True)
             return None
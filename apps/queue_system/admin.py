@@ -9,7 +9,7 @@ from .models import Service, ServiceEventConfig, EventQueue
 class ServiceEventConfigInline(admin.TabularInline):
     model = ServiceEventConfig
     extra = 1
-    fields = ['event_type', 'is_enabled', 'priority', 'is_async', 'is_discardable', 'is_stackable']
+    fields = ['event_type', 'is_enabled', 'priority', 'is_async', 'is_discardable', 'is_stackable', 'is_aggregatable', 'coalesce_window_ms', 'max_age_seconds', 'rate_limit_per_second', 'rate_limit_burst', 'rate_limit_policy']
     ordering = ['-priority', 'event_type']
 
 
@@ -37,7 +37,8 @@ class ServiceAdmin(admin.ModelAdmin):
             'fields': ('id', 'name', 'slug', 'description')
         }),
         ('Configuración Técnica', {
-            'fields': ('service_class', 'is_active', 'max_queue_size', 'obs_scene_name')
+            'fields': ('service_class', 'is_active', 'max_queue_size', 'priority_aging_rate', 'max_attempts',
+                       'retry_backoff_seconds', 'max_concurrency', 'obs_scene_name')
         }),
         ('Estadísticas', {
             'fields': ('pending_count', 'processing_count', 'created_at'),
@@ -172,7 +173,10 @@ class ServiceEventConfigAdmin(admin.ModelAdmin):
             'fields': ('service', 'event_type', 'is_enabled')
         }),
         ('Configuración de Procesamiento', {
-            'fields': ('priority', 'is_async', 'is_discardable', 'is_stackable')
+            'fields': ('priority', 'is_async', 'is_discardable', 'is_stackable', 'is_aggregatable', 'coalesce_window_ms', 'max_age_seconds')
+        }),
+        ('Límite de Tasa', {
+            'fields': ('rate_limit_per_second', 'rate_limit_burst', 'rate_limit_policy')
         }),
     )
 
@@ -249,14 +253,22 @@ class EventQueueAdmin(admin.ModelAdmin):
         'is_async',
         'created_at',
         'processed_at',
+        'expires_at',
+        'batch_parent',
+        'batch_size',
+        'worker_id',
+        'lease_expires_at',
+        'attempts',
+        'last_error',
         'event_details'
     ]
     ordering = ['-created_at']
     date_hierarchy = 'created_at'
+    actions = ['requeue_items']
 
     fieldsets = (
         ('Información de la Cola', {
-            'fields': ('id', 'service', 'status', 'created_at', 'processed_at')
+            'fields': ('id', 'service', 'status', 'created_at', 'processed_at', 'expires_at')
         }),
         ('Evento Relacionado', {
             'fields': ('live_event', 'session', 'event_details')
@@ -264,8 +276,40 @@ class EventQueueAdmin(admin.ModelAdmin):
         ('Configuración', {
             'fields': ('priority', 'is_async')
         }),
+        ('Worker', {
+            'fields': ('worker_id', 'lease_expires_at', 'attempts', 'last_error'),
+            'classes': ('collapse',)
+        }),
+        ('Lote (coalescing)', {
+            'fields': ('batch_parent', 'batch_size'),
+            'classes': ('collapse',)
+        }),
     )
 
+    @admin.action(description='Reencolar eventos dead/failed seleccionados')
+    def requeue_items(self, request, queryset):
+        """Devuelve a la cola los items dead/failed (intentos y TTL reiniciados)"""
+        heads = queryset.filter(status__in=['dead', 'failed'], batch_parent__isnull=True)
+        head_ids = list(heads.values_list('id', flat=True))
+
+        requeued = EventQueue.objects.filter(id__in=head_ids).update(
+            status='pending',
+            attempts=0,
+            available_at=None,
+            expires_at=None,
+            lease_expires_at=None,
+            processed_at=None
+        )
+        # Los eventos agrupados en esos lotes vuelven con su cabeza
+        EventQueue.objects.filter(
+            batch_parent_id__in=head_ids, status__in=['dead', 'failed']
+        ).update(status='coalesced', processed_at=None)
+
+        skipped = queryset.count() - requeued
+        messages.success(request, f"{requeued} evento(s) reencolados")
+        if skipped:
+            messages.warning(request, f"{skipped} evento(s) ignorados (no están en dead/failed o son parte de un lote)")
+
     def event_type_display(self, obj):
         """Muestra el tipo de evento"""
         return obj.live_event.event_type
@@ -278,7 +322,10 @@ class EventQueueAdmin(admin.ModelAdmin):
             'processing': '#007bff',
             'completed': '#28a745',
             'failed': '#dc3545',
-            'discarded': '#6c757d'
+            'discarded': '#6c757d',
+            'expired': '#fd7e14',
+            'coalesced': '#17a2b8',
+            'dead': '#343a40'
         }
         color = color_map.get(obj.status, '#6c757d')
         return format_html(
@@ -0,0 +1,142 @@
+"""
+Control de admisión - Límites de tasa por servicio y tipo de evento
+
+Algunos servicios no pueden seguir el ritmo del live aunque la cola tenga
+lugar (ej: el TTS de DinoChrome está serializado por tts_lock). Con un
+límite en el ServiceEventConfig (rate_limit_per_second / rate_limit_burst)
+el dispatcher consulta un token bucket en memoria antes de tocar la BD y
+aplica la política del config al exceso:
+
+- drop:     el evento no se encola (resultado 'rate_limited', sin escrituras)
+- coalesce: se suma como miembro al último item encolado con la misma clave
+            (tipo y regalo) si sigue pendiente; si no, se descarta como drop
+- defer:    se encola con available_at en el momento en que habrá token; si
+            eso supera el TTL del config (o DEFER_MAX_SECONDS) se descarta
+
+El estado es por proceso: con varios dispatchers (captura y simulador) cada
+uno aplica su límite por separado.
+"""
+
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+
+# Máxima espera de un evento diferido si el config no tiene TTL (segundos)
+DEFER_MAX_SECONDS = 60
+
+
+class TokenBucket:
+    """Bucket de `burst` tokens que se rellena a `rate` tokens por segundo"""
+
+    def __init__(self, rate: float, burst: int, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = now
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, now: float) -> bool:
+        """Consume un token si hay"""
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def reserve(self, now: float, max_wait: float) -> Optional[float]:
+        """
+        Reserva el próximo token libre (el saldo puede quedar negativo)
+
+        Returns:
+            float o None: Segundos hasta que el token esté disponible, o None
+                si la espera supera max_wait (no se reserva nada)
+        """
+        self._refill(now)
+        wait = max(0.0, (1 - self.tokens) / self.rate)
+        if wait > max_wait:
+            return None
+        self.tokens -= 1
+        return wait
+
+
+class Admission:
+    """Decisión para un evento: 'admit', 'drop', 'coalesce' (con head_id) o 'defer' (con delay)"""
+
+    def __init__(self, decision: str, delay: float = 0.0, head_id: Optional[int] = None):
+        self.decision = decision
+        self.delay = delay
+        self.head_id = head_id
+
+
+ADMIT = Admission('admit')
+
+
+class AdmissionController:
+    """Buckets por ServiceEventConfig y último item encolado por clave (para coalesce)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets: Dict[int, TokenBucket] = {}
+        self._heads: Dict[Tuple[int, str], int] = {}
+
+    def _bucket(self, config, now: float) -> TokenBucket:
+        rate = config.rate_limit_per_second
+        burst = config.rate_limit_burst or max(1, int(rate))
+        bucket = self._buckets.get(config.pk)
+        if bucket is None or bucket.rate != rate or bucket.burst != burst:
+            # Config nuevo o cambiado desde el admin
+            bucket = self._buckets[config.pk] = TokenBucket(rate, burst, now)
+        return bucket
+
+    def admit(self, config, coalesce_key: str = '') -> Admission:
+        """
+        Decide si un evento entra según el límite de su config
+
+        Args:
+            config: ServiceEventConfig del servicio y tipo
+            coalesce_key: Clave del evento (para la política coalesce)
+        """
+        if not config.rate_limit_per_second or config.rate_limit_per_second <= 0:
+            return ADMIT
+
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._bucket(config, now)
+            if bucket.take(now):
+                return ADMIT
+
+            policy = config.rate_limit_policy
+            if policy == 'defer':
+                max_wait = config.max_age_seconds or DEFER_MAX_SECONDS
+                delay = bucket.reserve(now, max_wait)
+                if delay is not None:
+                    return Admission('defer', delay=delay)
+            elif policy == 'coalesce':
+                head_id = self._heads.get((config.service_id, coalesce_key))
+                if head_id:
+                    return Admission('coalesce', head_id=head_id)
+        return Admission('drop')
+
+    def remember_head(self, config, coalesce_key: str, queue_item_id: Optional[int]):
+        """Registra el último item encolado de un config con límite (cabeza para la política coalesce)"""
+        if queue_item_id and config.rate_limit_per_second:
+            with self._lock:
+                self._heads[(config.service_id, coalesce_key)] = queue_item_id
+
+    def forget_head(self, config, coalesce_key: str, queue_item_id: int):
+        """Olvida una cabeza que ya no está pendiente"""
+        with self._lock:
+            if self._heads.get((config.service_id, coalesce_key)) == queue_item_id:
+                del self._heads[(config.service_id, coalesce_key)]
+
+    def reset(self):
+        with self._lock:
+            self._buckets.clear()
+            self._heads.clear()
+
+
+controller = AdmissionController()
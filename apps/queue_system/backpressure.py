@@ -0,0 +1,151 @@
+"""
+Backpressure - Saturación de las colas publicada para la captura
+
+El dispatcher publica, cada vez que encola, la saturación de la cola del
+servicio (pendientes / max_queue_size). La captura la lee para degradarse
+sola cuando los servicios no dan abasto (ventanas de agregación más anchas,
+no guardar tipos que ningún servicio procesa) y volver a fidelidad completa
+cuando la presión baja.
+
+La captura puede correr en otro proceso (--capture-process), así que además
+del estado en memoria se escribe tmp/backpressure.json (como mucho una vez
+por PUBLISH_INTERVAL, mezclando con lo que publicaron otros procesos, p.ej.
+la vista del simulador). Una saturación sin actualizar en STALE_SECONDS no
+cuenta: si nadie encola, no hay presión.
+"""
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+from django.conf import settings
+
+STATE_PATH = Path(settings.BASE_DIR) / 'tmp' / 'backpressure.json'
+
+# Escritura del archivo como mucho cada tantos segundos (por proceso)
+PUBLISH_INTERVAL = 1.0
+
+# Saturaciones más viejas que esto se ignoran
+STALE_SECONDS = 10
+
+# Niveles de degradación de la captura
+LEVEL_NORMAL = 0
+LEVEL_ELEVATED = 1
+LEVEL_CRITICAL = 2
+LEVEL_NAMES = {LEVEL_NORMAL: 'normal', LEVEL_ELEVATED: 'elevado', LEVEL_CRITICAL: 'crítico'}
+
+
+class BackpressureBoard:
+    """Saturación por servicio: el dispatcher publica, la captura lee"""
+
+    def __init__(self, path=STATE_PATH):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._local: Dict[str, list] = {}  # servicio -> [saturación, epoch]
+        self._last_write = 0.0
+        self._cache: Dict[str, list] = {}
+        self._cache_at = 0.0
+
+    def publish(self, service_name: str, pending: int, capacity: int):
+        """Registra la saturación de la cola de un servicio (llamado por el dispatcher)"""
+        saturation = min(1.0, pending / capacity) if capacity > 0 else 1.0
+        now = time.time()
+        with self._lock:
+            self._local[service_name] = [saturation, now]
+            if now - self._last_write < PUBLISH_INTERVAL:
+                return
+            self._last_write = now
+            local = dict(self._local)
+        try:
+            self._write(local)
+        except OSError:
+            pass  # la captura en este proceso usa el estado en memoria
+
+    def _write(self, local: Dict[str, list]):
+        merged = self._read_file()
+        for name, entry in local.items():
+            if name not in merged or merged[name][1] <= entry[1]:
+                merged[name] = entry
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(f'{self.path.name}.{os.getpid()}.tmp')
+        tmp_path.write_text(json.dumps(merged), encoding='utf-8')
+        os.replace(tmp_path, self.path)
+
+    def _read_file(self) -> Dict[str, list]:
+        try:
+            return json.loads(self.path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return {}
+
+    def snapshot(self) -> Dict[str, float]:
+        """
+        Saturación vigente por servicio (0.0 - 1.0)
+
+        Mezcla lo publicado en este proceso con el archivo compartido (releído
+        como mucho una vez por PUBLISH_INTERVAL).
+        """
+        now = time.time()
+        with self._lock:
+            if now - self._cache_at >= PUBLISH_INTERVAL:
+                self._cache = self._read_file()
+                self._cache_at = now
+            entries = dict(self._cache)
+            for name, entry in self._local.items():
+                if name not in entries or entries[name][1] <= entry[1]:
+                    entries[name] = entry
+        return {
+            name: saturation for name, (saturation, updated) in entries.items()
+            if now - updated <= STALE_SECONDS
+        }
+
+    def pressure(self, services: Optional[set] = None) -> float:
+        """Saturación máxima entre los servicios (o solo los indicados)"""
+        values = [
+            saturation for name, saturation in self.snapshot().items()
+            if services is None or name in services
+        ]
+        return max(values, default=0.0)
+
+    def reset(self):
+        with self._lock:
+            self._local.clear()
+            self._cache.clear()
+            self._cache_at = 0.0
+
+
+class PressureLevel:
+    """
+    Nivel de degradación con histéresis
+
+    Sube apenas la presión pasa un umbral y baja recién cuando queda
+    `recover_margin` por debajo, para no alternar en cada segundo.
+    """
+
+    def __init__(self, elevated: float = 0.7, critical: float = 0.9, recover_margin: float = 0.15):
+        self.elevated = elevated
+        self.critical = critical
+        self.recover_margin = recover_margin
+        self.level = LEVEL_NORMAL
+
+    def update(self, pressure: float) -> int:
+        """Recalcula el nivel con la presión actual y lo retorna"""
+        if pressure >= self.critical:
+            target = LEVEL_CRITICAL
+        elif pressure >= self.elevated:
+            target = LEVEL_ELEVATED
+        else:
+            target = LEVEL_NORMAL
+
+        if target < self.level:
+            # Bajar solo con margen por debajo del umbral del nivel actual
+            threshold = self.critical if self.level == LEVEL_CRITICAL else self.elevated
+            if pressure > threshold - self.recover_margin:
+                return self.level
+        self.level = target
+        return self.level
+
+
+board = BackpressureBoard()
@@ -3,6 +3,10 @@ BaseQueueService - Clase base abstracta para servicios de cola
 
 Todos los servicios que procesen eventos deben heredar de esta clase
 e implementar el método process_event()
+
+Los servicios limitados por I/O pueden implementar además `aprocess_event`
+(async): el worker los corre como tareas en un event loop, con hasta
+Service.max_concurrency eventos en vuelo, en lugar de un thread por evento.
 """
 
 from abc import ABC, abstractmethod
@@ -53,6 +57,73 @@ class BaseQueueService(ABC):
         """
         pass
 
+    def process_batch(self, live_events: list, queue_item: EventQueue) -> bool:
+        """
+        Procesa un lote de eventos agrupados por coalescing (opcional).
+
+        Solo se llama cuando ServiceEventConfig.coalesce_window_ms > 0 y llegó
+        más de un evento del mismo tipo (y regalo) dentro de la ventana. Todos
+        los eventos comparten el mismo queue_item (la cabeza del lote).
+
+        Por defecto procesa cada evento con process_event(); los servicios
+        pueden sobrescribirlo para enviar una sola acción por ráfaga.
+
+        Args:
+            live_events: Eventos del lote, el primero es el de la cabeza
+            queue_item: El item de la cola cabeza del lote
+
+        Returns:
+            bool: True si todo el lote se procesó exitosamente
+
+        Ejemplo:
+            def process_batch(self, live_events, queue_item):
+                usernames = [ev.user_nickname for ev in live_events]
+                self.display_gift_burst(usernames)
+                return True
+        """
+        results = [self.process_event(live_event, queue_item) for live_event in live_events]
+        return all(results)
+
+    async def aprocess_event(self, live_event: LiveEvent, queue_item: EventQueue) -> bool:
+        """
+        Versión async de process_event (opcional).
+
+        Si el servicio la implementa, el worker usa AsyncServiceWorker: cada
+        item es una tarea en el event loop del worker y las esperas de red
+        (LLM, TTS, HTTP) no ocupan un thread. No debe bloquear el loop: nada de
+        time.sleep ni clientes HTTP síncronos (usar asyncio.sleep, un cliente
+        async, o asyncio.to_thread para código bloqueante). El ORM de Django
+        tampoco puede usarse directamente desde el loop.
+
+        Args:
+            live_event: El evento de TikTok a procesar
+            queue_item: El item de la cola
+
+        Returns:
+            bool: True si se procesó exitosamente, False si falló
+
+        Ejemplo:
+            async def aprocess_event(self, live_event, queue_item):
+                async with httpx.AsyncClient() as client:
+                    await client.post(self.webhook_url, json=live_event.event_data)
+                return True
+        """
+        raise NotImplementedError
+
+    async def aprocess_batch(self, live_events: list, queue_item: EventQueue) -> bool:
+        """
+        Versión async de process_batch (opcional).
+
+        Por defecto procesa cada evento del lote con aprocess_event(), en orden.
+        """
+        results = [await self.aprocess_event(live_event, queue_item) for live_event in live_events]
+        return all(results)
+
+    @classmethod
+    def supports_async(cls) -> bool:
+        """Si el servicio implementa aprocess_event (usa el worker async)"""
+        return cls.aprocess_event is not BaseQueueService.aprocess_event
+
     def on_start(self):
         """
         Hook ejecutado cuando el worker inicia (opcional).
@@ -7,9 +7,95 @@ Este módulo se encarga de:
 3. Verificar espacio en cola
 4. Encolar eventos con prioridad
 5. Descartar eventos de baja prioridad si es necesario
+
+Antes de tocar la BD se aplica el límite de tasa del ServiceEventConfig
+(token bucket en memoria, ver admission.py): el exceso se descarta, se
+agrupa en el último item encolado o se difiere según la política.
+
+Cada encolado publica la saturación de la cola del servicio en
+backpressure.board; la captura la usa para degradarse bajo presión.
+
+Los pasos 3-5 corren en una transacción por servicio: se bloquea la fila del
+Service (SELECT ... FOR UPDATE), así dos dispatchers (la captura y la vista
+del simulador, o los threads de adispatch) no llenan la cola de más ni
+desalojan el mismo item. Servicios distintos no se esperan entre sí. La
+víctima se elige con skip_locked para no esperar a un worker que la está
+tomando.
+
+Para muchos eventos juntos (canal de captura, replay) está `dispatch_many`:
+resuelve las rutas una vez, decide capacidad y descartes en memoria y
+escribe los items de cada servicio con un solo bulk_create.
+
+Desde código async (la captura) se usa `adispatch`: en lugar de pasar por el
+executor thread-sensitive de sync_to_async (un solo thread compartido por
+todo el proceso, así que los eventos se procesan de a uno), cada servicio
+se encola en un thread del pool de BD del dispatcher y varios eventos
+pueden estar en vuelo a la vez.
 """
 
-from .models import Service, ServiceEventConfig, EventQueue
+import asyncio
+import heapq
+import logging
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from asgiref.sync import sync_to_async
+from django.db import OperationalError, close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import Service, ServiceEventConfig, EventQueue, compute_sort_key
+from . import metrics
+from .admission import controller as admission_controller
+from .backpressure import board as backpressure_board
+
+logger = logging.getLogger(__name__)
+
+# Pool de threads para el camino async (cada thread con su conexión a la BD)
+DB_POOL_SIZE = 4
+_db_executor = None
+_db_executor_lock = threading.Lock()
+
+
+def configure_db_pool(max_workers: int):
+    """Define el tamaño del pool de BD (llamar desde código sync antes del primer run_db)"""
+    global DB_POOL_SIZE
+    DB_POOL_SIZE = max(1, max_workers)
+
+
+def _get_db_executor() -> ThreadPoolExecutor:
+    global _db_executor
+    with _db_executor_lock:
+        if _db_executor is None:
+            _db_executor = ThreadPoolExecutor(max_workers=DB_POOL_SIZE, thread_name_prefix='dispatch-db')
+        return _db_executor
+
+
+async def run_db(func, *args, **kwargs):
+    """
+    Ejecuta una función con acceso a la BD en el pool del dispatcher
+
+    Las llamadas concurrentes corren en paralelo (hasta dispatch_db_threads),
+    a diferencia de sync_to_async por defecto, que las serializa.
+    """
+    return await sync_to_async(_with_fresh_connection, thread_sensitive=False, executor=_get_db_executor())(
+        func, *args, **kwargs
+    )
+
+
+def _with_fresh_connection(func, *args, **kwargs):
+    """
+    Corre func en un thread del pool descartando conexiones vencidas antes y después
+
+    Los threads del pool viven todo el proceso; sin esto, con MySQL fallan con
+    "server has gone away" después de wait_timeout (igual que BatchWriter._run).
+    """
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        close_old_connections()
 
 
 class EventDispatcher:
@@ -45,78 +131,356 @@ class EventDispatcher:
         Returns:
             dict: Resumen de encolamiento por servicio
         """
-        results = {
+        start = time.perf_counter()
+        results = EventDispatcher._empty_results()
+        EventDispatcher._log_dispatch(live_event)
+
+        # 1. Obtener servicios activos suscritos a este tipo de evento
+        configs = EventDispatcher._get_configs(live_event.event_type)
+
+        if not configs:
+            logger.debug("[DISPATCHER] ⚠️  Sin servicios suscritos a %s", live_event.event_type)
+            metrics.DISPATCH_SECONDS.observe(time.perf_counter() - start, event_type=live_event.event_type)
+            return results
+
+        # 2. Procesar cada configuración
+        for config in configs:
+            EventDispatcher._dispatch_to_service(results, live_event, config)
+
+        metrics.DISPATCH_SECONDS.observe(time.perf_counter() - start, event_type=live_event.event_type)
+        return results
+
+    @staticmethod
+    async def adispatch(live_event):
+        """
+        Versión async de dispatch: los servicios suscritos se encolan en paralelo
+
+        Cada _process_service_queue corre en un thread del pool de BD, así
+        que el loop de la captura no espera a la BD y otros eventos del live
+        pueden distribuirse al mismo tiempo.
+
+        Returns:
+            dict: Mismo resumen que dispatch()
+        """
+        start = time.perf_counter()
+        results = EventDispatcher._empty_results()
+        EventDispatcher._log_dispatch(live_event)
+
+        configs = await run_db(EventDispatcher._get_configs, live_event.event_type)
+        if not configs:
+            logger.debug("[DISPATCHER] ⚠️  Sin servicios suscritos a %s", live_event.event_type)
+            metrics.DISPATCH_SECONDS.observe(time.perf_counter() - start, event_type=live_event.event_type)
+            return results
+
+        outcomes = await asyncio.gather(
+            *[run_db(EventDispatcher._dispatch_to_service, results, live_event, config) for config in configs],
+            return_exceptions=True
+        )
+        for config, outcome in zip(configs, outcomes):
+            if isinstance(outcome, Exception):
+                logger.error("[DISPATCHER] ❌ %s: Error encolando: %s", config.service.name, outcome)
+
+        metrics.DISPATCH_SECONDS.observe(time.perf_counter() - start, event_type=live_event.event_type)
+        return results
+
+    # Resultados agregados de dispatch_many
+    BATCH_OUTCOMES = ('enqueued', 'coalesced', 'evicted', 'discarded', 'queue_full', 'skipped', 'rate_limited', 'deferred')
+
+    # Candidatos a desalojo extra de dispatch_many (reemplazo si un worker toma uno)
+    EVICTION_SPARE_CANDIDATES = 4
+
+    @staticmethod
+    def dispatch_many(live_events):
+        """
+        Distribuye muchos eventos a la vez
+
+        - Las rutas (ServiceEventConfig) se resuelven con una sola consulta
+        - Por servicio: un COUNT de pendientes para todo el lote, los descartes
+          se deciden en memoria (mismas reglas que dispatch: se desaloja el
+          item de menor prioridad si es descartable y de prioridad menor) y
+          los items nuevos se escriben con un solo bulk_create
+        - Los configs con coalescing (o límite de tasa con política coalesce)
+          usan el camino individual: los miembros de un lote necesitan el id
+          de la cabeza antes de insertarse
+        - El límite de tasa se aplica por evento antes de armar el lote
+
+        Args:
+            live_events: LiveEvents ya guardados
+
+        Returns:
+            dict: Totales por resultado (enqueued, coalesced, evicted,
+                discarded, queue_full, skipped, rate_limited, deferred),
+                'events' y el detalle por servicio en 'services'. Los
+                diferidos también cuentan en enqueued
+        """
+        start = time.perf_counter()
+        outcomes = EventDispatcher.BATCH_OUTCOMES
+        per_service = defaultdict(lambda: dict.fromkeys(outcomes, 0))
+
+        # 1. Rutas de todos los tipos del lote
+        configs_by_type = defaultdict(list)
+        event_types = {live_event.event_type for live_event in live_events}
+        if event_types:
+            for config in ServiceEventConfig.objects.filter(
+                service__is_active=True,
+                event_type__in=event_types,
+                is_enabled=True
+            ).select_related('service'):
+                configs_by_type[config.event_type].append(config)
+
+        # 2. Candidatos por servicio (en orden de llegada)
+        candidates = defaultdict(list)
+        services = {}
+        for live_event in live_events:
+            for config in configs_by_type.get(live_event.event_type, ()):
+                counts = per_service[config.service.name]
+                if EventDispatcher._skip_reason(live_event, config):
+                    counts['skipped'] += 1
+                    continue
+                if config.coalesce_window_ms or (config.rate_limit_per_second and config.rate_limit_policy == 'coalesce'):
+                    result = EventDispatcher._process_service_queue(live_event, config)
+                    counts[EventDispatcher._outcome(result)] += 1
+                    if result.get('discarded_event'):
+                        counts['evicted'] += 1
+                    continue
+                admission = admission_controller.admit(config)
+                if admission.decision == 'drop':
+                    counts['rate_limited'] += 1
+                    continue
+                if admission.decision == 'defer':
+                    counts['deferred'] += 1
+                services.setdefault(config.service_id, config.service)
+                candidates[config.service_id].append(
+                    (live_event, config, EventDispatcher._effective_priority(live_event, config), admission.delay)
+                )
+
+        # 3. Capacidad, descartes e inserción por servicio
+        for service_id, rows in candidates.items():
+            service = services[service_id]
+            counts = per_service[service.name]
+            for outcome, count in EventDispatcher._admit_batch(service, rows).items():
+                counts[outcome] += count
+
+        totals = dict.fromkeys(outcomes, 0)
+        for service_name, counts in per_service.items():
+            for outcome, count in counts.items():
+                if count:
+                    totals[outcome] += count
+                    metrics.DISPATCH_OUTCOMES.inc(count, service=service_name, outcome=outcome)
+
+        elapsed = time.perf_counter() - start
+        metrics.DISPATCH_MANY_SECONDS.observe(elapsed)
+        logger.info(
+            "[DISPATCHER] 📦 Lote de %s eventos en %.0fms: %s encolados, %s agrupados, %s desalojados, "
+            "%s descartados, %s cola llena, %s saltados, %s limitados, %s diferidos",
+            len(live_events), elapsed * 1000, *(totals[outcome] for outcome in outcomes)
+        )
+        return {'events': len(live_events), **totals, 'services': dict(per_service)}
+
+    @staticmethod
+    def _admit_batch(service, rows):
+        """
+        Decide qué items nuevos de un servicio entran a la cola y los inserta
+
+        Los primeros entran mientras haya lugar. Cada uno que no entra mira el
+        item de menor prioridad (el más viejo si empatan) entre los pendientes
+        y los ya aceptados del lote: si es descartable y de menor prioridad,
+        lo desaloja y toma su lugar; si no, el nuevo se descarta (queue_full si
+        su config no es descartable). Si un worker tomó al pendiente elegido
+        antes del descarte, se prueba con el siguiente.
+
+        Args:
+            service: Service de la cola
+            rows: Lista de (live_event, config, prioridad, delay) en orden de llegada
+
+        Returns:
+            dict: Conteos enqueued / evicted / discarded / queue_full
+        """
+        return EventDispatcher._with_queue_lock(service, EventDispatcher._admit_rows, service, rows)
+
+    @staticmethod
+    def _admit_rows(service, rows):
+        """Cuerpo de _admit_batch (con la cola del servicio bloqueada)"""
+        counts = {'enqueued': 0, 'evicted': 0, 'discarded': 0, 'queue_full': 0}
+        pending = EventQueue.objects.filter(service=service, status='pending').count()
+        free = max(0, service.max_queue_size - pending)
+        accepted = list(rows[:free])
+        overflow = rows[free:]
+        evicted_new = set()
+
+        if overflow:
+            discardable_types = set(ServiceEventConfig.objects.filter(
+                service=service, is_discardable=True
+            ).values_list('event_type', flat=True))
+
+            # Candidatos a desalojo: los pendientes más bajos (con reserva por si
+            # un worker toma alguno antes del descarte) y los aceptados del lote
+            existing = list(EventQueue.objects.filter(
+                service=service, status='pending'
+            ).select_related('live_event').select_for_update(
+                skip_locked=True, of=('self',)
+            ).order_by('priority', 'created_at')[:len(overflow) + EventDispatcher.EVICTION_SPARE_CANDIDATES])
+            heap = [(item.priority, seq, item) for seq, item in enumerate(existing)]
+            heap += [(priority, len(existing) + index, index) for index, (_, _, priority, _) in enumerate(accepted)]
+            heapq.heapify(heap)
+            seq = len(heap)
+
+            for row in overflow:
+                live_event, config, priority, _ = row
+                admitted = False
+                while heap and not admitted:
+                    victim_priority, _, victim = heap[0]
+                    if isinstance(victim, EventQueue):
+                        victim_type = victim.live_event.event_type
+                    else:
+                        victim_type = accepted[victim][0].event_type
+                    if victim_type not in discardable_types or victim_priority >= priority:
+                        break
+                    heapq.heappop(heap)
+                    if isinstance(victim, EventQueue):
+                        # Condicionado a que siga pendiente (igual que dispatch): si un
+                        # worker lo tomó, el lugar no se libera y se prueba el siguiente
+                        if not victim.mark_discarded():
+                            continue
+                        counts['evicted'] += 1
+                    else:
+                        evicted_new.add(victim)
+                        counts['discarded'] += 1
+                    accepted.append(row)
+                    heapq.heappush(heap, (priority, seq, len(accepted) - 1))
+                    seq += 1
+                    admitted = True
+                if not admitted:
+                    counts['discarded' if config.is_discardable else 'queue_full'] += 1
+
+        now = timezone.now()
+        items = [
+            EventQueue(**EventDispatcher._queue_item_fields(live_event, config, priority, now, delay))
+            for index, (live_event, config, priority, delay) in enumerate(accepted)
+            if index not in evicted_new
+        ]
+        EventQueue.objects.bulk_create(items)
+        counts['enqueued'] = len(items)
+        # Demanda (pendientes + llegados) sobre capacidad, igual que en dispatch
+        backpressure_board.publish(service.name, pending + len(rows), service.max_queue_size)
+        return counts
+
+    @staticmethod
+    def _empty_results():
+        return {
             'enqueued': [],
             'discarded': [],
             'queue_full': [],
-            'skipped': []
+            'skipped': [],
+            'rate_limited': []
         }
 
-        # Log de entrada
-        event_info = f"{live_event.event_type} de @{live_event.user_nickname}"
+    @staticmethod
+    def _log_dispatch(live_event):
+        """Log de entrada (solo se arma el detalle si el nivel está activo)"""
+        if not logger.isEnabledFor(logging.INFO):
+            return
+        detail = ''
         if live_event.event_type == 'GiftEvent':
             gift_name = EventDispatcher._get_gift_name(live_event)
             if gift_name:
-                event_info = f"GiftEvent[{gift_name}] de @{live_event.user_nickname}"
+                detail = f"[{gift_name}]"
         elif live_event.event_type == 'CommentEvent':
-            comment = live_event.event_data.get('comment', '')[:30]
-            event_info = f"CommentEvent['{comment}'] de @{live_event.user_nickname}"
-
-        print(f"[DISPATCHER] ━━━ Distribuyendo: {event_info}")
+            detail = f"['{live_event.event_data.get('comment', '')[:30]}']"
+        logger.info(
+            "[DISPATCHER] ━━━ Distribuyendo: %s%s de @%s",
+            live_event.event_type, detail, live_event.user_nickname
+        )
 
-        # 1. Obtener servicios activos suscritos a este tipo de evento
-        configs = ServiceEventConfig.objects.filter(
+    @staticmethod
+    def _get_configs(event_type):
+        """Configuraciones de servicios activos suscritos a un tipo de evento"""
+        return list(ServiceEventConfig.objects.filter(
             service__is_active=True,
-            event_type=live_event.event_type,
+            event_type=event_type,
             is_enabled=True
-        ).select_related('service')
+        ).select_related('service'))
 
-        if not configs.exists():
-            print(f"[DISPATCHER] ⚠️  Sin servicios suscritos a {live_event.event_type}")
-            return results
+    @staticmethod
+    def _dispatch_to_service(results, live_event, config):
+        """Encola el evento para un servicio y registra el resultado"""
+        result = EventDispatcher._process_service_queue(live_event, config)
+        EventDispatcher._record_result(results, config, result)
 
-        # 2. Procesar cada configuración
-        for config in configs:
-            result = EventDispatcher._process_service_queue(live_event, config)
-            service_name = config.service.name
-
-            if result['status'] == 'enqueued':
-                priority = result.get('priority', config.priority)
-                results['enqueued'].append({
-                    'service': service_name,
-                    'priority': priority
-                })
-                # Log detallado
-                queue_size = EventQueue.objects.filter(
-                    service=config.service, status='pending'
-                ).count()
+    @staticmethod
+    def _record_result(results, config, result):
+        """Agrega el resultado de un servicio al resumen, con su log y métrica"""
+        service_name = config.service.name
+
+        if result['status'] == 'enqueued':
+            priority = result.get('priority', config.priority)
+            results['enqueued'].append({
+                'service': service_name,
+                'priority': priority,
+                'discarded_event': result.get('discarded_event'),
+                'coalesced_into': result.get('coalesced_into')
+            })
+            # Log detallado (el COUNT de la cola solo se paga en modo debug)
+            if logger.isEnabledFor(logging.INFO):
+                queue_info = ""
+                if logger.isEnabledFor(logging.DEBUG):
+                    queue_size = EventQueue.objects.filter(
+                        service=config.service, status='pending'
+                    ).count()
+                    queue_info = f" | Cola: {queue_size}/{config.service.max_queue_size}"
                 discarded_info = ""
                 if result.get('discarded_event'):
                     discarded_info = f" (descartó evento #{result['discarded_event']})"
-                print(f"[DISPATCHER] ✅ {service_name}: Encolado P:{priority} | Cola: {queue_size}/{config.service.max_queue_size}{discarded_info}")
-
-            elif result['status'] == 'skipped':
-                results['skipped'].append({
-                    'service': service_name,
-                    'reason': result.get('reason', 'Unknown')
-                })
-                print(f"[DISPATCHER] ⏭️  {service_name}: Saltado - {result.get('reason', 'racha en curso')}")
-
-            elif result['status'] == 'discarded':
-                results['discarded'].append({
-                    'service': service_name,
-                    'reason': result.get('reason', 'Unknown')
-                })
-                print(f"[DISPATCHER] 🗑️  {service_name}: Descartado - {result.get('reason', 'cola llena')}")
-
-            elif result['status'] == 'queue_full':
-                results['queue_full'].append({
-                    'service': service_name,
-                    'reason': 'Cola llena sin eventos descartables'
-                })
-                print(f"[DISPATCHER] 🔴 {service_name}: Cola llena ({config.service.max_queue_size}/{config.service.max_queue_size})")
+                elif result.get('coalesced_into'):
+                    discarded_info = f" (agrupado en lote #{result['coalesced_into']})"
+                elif result.get('deferred_seconds'):
+                    discarded_info = f" (diferido {result['deferred_seconds']:.1f}s por límite de tasa)"
+                logger.info(
+                    "[DISPATCHER] ✅ %s: Encolado P:%s%s%s",
+                    service_name, priority, queue_info, discarded_info
+                )
+
+        elif result['status'] == 'skipped':
+            results['skipped'].append({
+                'service': service_name,
+                'reason': result.get('reason', 'Unknown')
+            })
+            logger.debug("[DISPATCHER] ⏭️  %s: Saltado - %s", service_name, result.get('reason', 'racha en curso'))
+
+        elif result['status'] == 'discarded':
+            results['discarded'].append({
+                'service': service_name,
+                'reason': result.get('reason', 'Unknown')
+            })
+            logger.info("[DISPATCHER] 🗑️  %s: Descartado - %s", service_name, result.get('reason', 'cola llena'))
+
+        elif result['status'] == 'queue_full':
+            results['queue_full'].append({
+                'service': service_name,
+                'reason': 'Cola llena sin eventos descartables'
+            })
+            logger.warning(
+                "[DISPATCHER] 🔴 %s: Cola llena (%s/%s)",
+                service_name, config.service.max_queue_size, config.service.max_queue_size
+            )
+
+        elif result['status'] == 'rate_limited':
+            results['rate_limited'].append({
+                'service': service_name,
+                'reason': result.get('reason', 'Unknown')
+            })
+            logger.debug("[DISPATCHER] 🚦 %s: Limitado - %s", service_name, result.get('reason', 'límite de tasa'))
+
+        metrics.DISPATCH_OUTCOMES.inc(service=service_name, outcome=EventDispatcher._outcome(result))
 
-        return results
+    @staticmethod
+    def _outcome(result):
+        """Etiqueta de métrica para el resultado de un servicio"""
+        if result.get('coalesced_into'):
+            return 'coalesced'
+        if result.get('deferred_seconds'):
+            return 'deferred'
+        return result['status']
 
     @staticmethod
     def _process_service_queue(live_event, config):
@@ -133,35 +497,94 @@ class EventDispatcher:
         service = config.service
 
         # 1. Filtrar por is_stackable para GiftEvent
-        if live_event.event_type == 'GiftEvent' and not config.is_stackable:
-            # Solo procesar si la racha ha finalizado ('end') o no hay racha (None)
-            if live_event.streak_status in ('start', 'continue'):
-                return {
-                    'status': 'skipped',
-                    'reason': f'Racha en curso (status={live_event.streak_status})'
-                }
+        skip_reason = EventDispatcher._skip_reason(live_event, config)
+        if skip_reason:
+            return {'status': 'skipped', 'reason': skip_reason}
 
         # 2. Calcular prioridad efectiva (considerando tipo de regalo)
-        effective_priority = config.priority
-        if live_event.event_type == 'GiftEvent':
-            gift_name = EventDispatcher._get_gift_name(live_event)
-            if gift_name:
-                gift_priority = EventDispatcher.GIFT_PRIORITIES.get(gift_name.lower())
-                if gift_priority is not None:
-                    effective_priority = gift_priority
+        effective_priority = EventDispatcher._effective_priority(live_event, config)
+
+        # 3. Límite de tasa (en memoria, antes de cualquier escritura)
+        coalesce_key = EventDispatcher._get_coalesce_key(live_event)
+        admission = admission_controller.admit(config, coalesce_key)
+        if admission.decision == 'coalesce':
+            if EventDispatcher._join_rate_limited(live_event, config, effective_priority, admission.head_id):
+                return {'status': 'enqueued', 'priority': effective_priority, 'coalesced_into': admission.head_id}
+            admission_controller.forget_head(config, coalesce_key, admission.head_id)
+        if admission.decision in ('drop', 'coalesce'):
+            return {
+                'status': 'rate_limited',
+                'reason': f'Límite de {config.rate_limit_per_second:g}/s ({config.rate_limit_policy})'
+            }
+
+        # 4. Coalescing: sumarse al lote pendiente del mismo tipo/regalo (no ocupa lugar en la cola)
+        if config.coalesce_window_ms:
+            head_id = EventDispatcher._try_coalesce(live_event, config, effective_priority)
+            if head_id:
+                return {'status': 'enqueued', 'priority': effective_priority, 'coalesced_into': head_id}
+
+        # 5-7. Capacidad, descarte e inserción en una transacción (cola del servicio bloqueada)
+        result = EventDispatcher._with_queue_lock(
+            service, EventDispatcher._admit_event, live_event, config, effective_priority, admission.delay
+        )
+        if result['status'] == 'enqueued':
+            admission_controller.remember_head(config, coalesce_key, result.get('queue_item_id'))
+        return result
 
-        # 3. Verificar tamaño de cola
+    # Reintentos de la transacción de encolado ante deadlock / lock wait timeout
+    LOCK_RETRIES = 3
+
+    @staticmethod
+    def _with_queue_lock(service, func, *args):
+        """
+        Ejecuta func(*args) en una transacción con la cola del servicio bloqueada
+
+        El lock es la fila del Service (SELECT ... FOR UPDATE): serializa a los
+        dispatchers que encolan en ese servicio y nada más. Los workers no lo
+        toman, así que el claim sigue en paralelo.
+        """
+        for attempt in range(EventDispatcher.LOCK_RETRIES):
+            try:
+                with transaction.atomic():
+                    Service.objects.select_for_update().filter(pk=service.pk).values_list('pk', flat=True).first()
+                    return func(*args)
+            except OperationalError as e:
+                if attempt == EventDispatcher.LOCK_RETRIES - 1:
+                    raise
+                logger.warning(
+                    "[DISPATCHER] 🔁 %s: Conflicto de locks al encolar (%s), reintento %s",
+                    service.name, e, attempt + 1
+                )
+                time.sleep(0.01 * 2 ** attempt)
+
+    @staticmethod
+    def _admit_event(live_event, config, effective_priority, delay=0.0):
+        """
+        Encola el evento si hay lugar o si puede desalojar a uno de menor prioridad
+
+        Se llama con la cola del servicio bloqueada (_with_queue_lock).
+
+        Args:
+            delay: Segundos que el worker debe esperar para tomarlo (límite de tasa 'defer')
+        """
+        service = config.service
+
+        # 5. Verificar tamaño de cola
         current_queue_size = EventQueue.objects.filter(
             service=service,
             status='pending'
         ).count()
 
-        # 4. Si hay espacio, encolar directamente
+        # Demanda (pendientes + este) sobre capacidad: llega a 1.0 con la cola llena
+        backpressure_board.publish(service.name, current_queue_size + 1, service.max_queue_size)
+
+        # 6. Si hay espacio, encolar directamente
         if current_queue_size < service.max_queue_size:
-            EventDispatcher._enqueue_event(live_event, config)
-            return {'status': 'enqueued', 'priority': effective_priority}
+            item = EventDispatcher._enqueue_event(live_event, config, delay)
+            return {'status': 'enqueued', 'priority': effective_priority, 'queue_item_id': item.id,
+                    'deferred_seconds': delay}
 
-        # 5. Cola llena - intentar descartar eventos de menor prioridad
+        # 7. Cola llena - intentar descartar eventos de menor prioridad
         if config.is_discardable:
             # El nuevo evento es descartable
             # Intentar encontrar un evento descartable de menor prioridad
@@ -169,10 +592,12 @@ class EventDispatcher:
 
             if discarded:
                 # Se descartó un evento de menor prioridad, encolar el nuevo
-                EventDispatcher._enqueue_event(live_event, config)
+                item = EventDispatcher._enqueue_event(live_event, config, delay)
                 return {
                     'status': 'enqueued',
                     'priority': effective_priority,
+                    'queue_item_id': item.id,
+                    'deferred_seconds': delay,
                     'discarded_event': discarded.id
                 }
             else:
@@ -188,10 +613,12 @@ class EventDispatcher:
 
             if discarded:
                 # Se descartó un evento descartable de menor prioridad
-                EventDispatcher._enqueue_event(live_event, config)
+                item = EventDispatcher._enqueue_event(live_event, config, delay)
                 return {
                     'status': 'enqueued',
                     'priority': effective_priority,
+                    'queue_item_id': item.id,
+                    'deferred_seconds': delay,
                     'discarded_event': discarded.id
                 }
             else:
@@ -202,34 +629,164 @@ class EventDispatcher:
                 }
 
     @staticmethod
-    def _enqueue_event(live_event, config):
+    def _skip_reason(live_event, config):
+        """Motivo para no encolar (racha en curso de un regalo no stackable) o None"""
+        if live_event.event_type == 'GiftEvent' and not config.is_stackable:
+            # Solo procesar si la racha ha finalizado ('end') o no hay racha (None)
+            if live_event.streak_status in ('start', 'continue'):
+                return f'Racha en curso (status={live_event.streak_status})'
+        return None
+
+    @staticmethod
+    def _effective_priority(live_event, config):
+        """Prioridad del config, sobrescrita por GIFT_PRIORITIES para regalos conocidos"""
+        if live_event.event_type == 'GiftEvent':
+            gift_name = EventDispatcher._get_gift_name(live_event)
+            if gift_name:
+                gift_priority = EventDispatcher.GIFT_PRIORITIES.get(gift_name.lower())
+                if gift_priority is not None:
+                    return gift_priority
+        return config.priority
+
+    @staticmethod
+    def _enqueue_event(live_event, config, delay=0.0):
         """
         Encola un evento en la cola del servicio
 
         Args:
             live_event: El evento a encolar
             config: ServiceEventConfig con la configuración
+            delay: Segundos antes de que el worker pueda tomarlo
+
+        Returns:
+            EventQueue: El item creado
         """
-        # Determinar prioridad (puede ser sobrescrita por tipo de regalo)
-        priority = config.priority
-        gift_name = None
+        return EventQueue.objects.create(**EventDispatcher._queue_item_fields(
+            live_event, config, EventDispatcher._effective_priority(live_event, config), timezone.now(), delay
+        ))
+
+    @staticmethod
+    def _queue_item_fields(live_event, config, priority, now, delay=0.0):
+        """Campos de un EventQueue nuevo ('pending') para el evento"""
+
+        # TTL: una reacción que llega tarde es peor que ninguna
+        expires_at = None
+        if config.max_age_seconds:
+            expires_at = now + timedelta(seconds=config.max_age_seconds)
+
+        # Cabeza de lote: el worker no la toma hasta que cierre la ventana. Con la
+        # política coalesce del límite de tasa también puede recibir miembros: la
+        # clave hace que el worker cargue el lote (_claim_batch), sin ventana
+        coalesce_key = ''
+        available_at = None
+        if config.coalesce_window_ms:
+            coalesce_key = EventDispatcher._get_coalesce_key(live_event)
+            available_at = now + timedelta(milliseconds=config.coalesce_window_ms)
+        elif config.rate_limit_per_second and config.rate_limit_policy == 'coalesce':
+            coalesce_key = EventDispatcher._get_coalesce_key(live_event)
+
+        # Diferido por límite de tasa: se toma cuando el bucket tenga token
+        if delay:
+            available_at = max(available_at or now, now + timedelta(seconds=delay))
+
+        return dict(
+            service=config.service,
+            live_event=live_event,
+            session_id=live_event.session_id,
+            priority=priority,
+            is_async=config.is_async,
+            status='pending',
+            expires_at=expires_at,
+            coalesce_key=coalesce_key,
+            available_at=available_at,
+            sort_key=compute_sort_key(priority, time.time(), config.service.priority_aging_rate)
+        )
 
-        # Para GiftEvent, verificar si hay prioridad específica por regalo
+    @staticmethod
+    def _get_coalesce_key(live_event):
+        """Clave de agrupación: tipo de evento y, para GiftEvent, nombre del regalo"""
         if live_event.event_type == 'GiftEvent':
-            gift_name = EventDispatcher._get_gift_name(live_event)
-            if gift_name:
-                gift_priority = EventDispatcher.GIFT_PRIORITIES.get(gift_name.lower())
-                if gift_priority is not None:
-                    priority = gift_priority
+            gift_name = EventDispatcher._get_gift_name(live_event) or ''
+            return f"GiftEvent:{gift_name.lower()}"[:150]
+        return live_event.event_type
+
+    @staticmethod
+    def _try_coalesce(live_event, config, priority):
+        """
+        Agrega el evento al lote pendiente abierto (misma clave, dentro de la ventana)
+
+        El item miembro se inserta antes de incrementar batch_size con un UPDATE
+        condicionado a que la cabeza siga pendiente: si el worker ya la tomó, el
+        worker ve al miembro al cargar el lote o el UPDATE no afecta filas y el
+        miembro pasa a ser un item normal.
+
+        Returns:
+            int o None: ID de la cabeza del lote, o None si no hay lote abierto
+        """
+        coalesce_key = EventDispatcher._get_coalesce_key(live_event)
+        window_start = timezone.now() - timedelta(milliseconds=config.coalesce_window_ms)
+
+        head = EventQueue.objects.filter(
+            service=config.service,
+            status='pending',
+            coalesce_key=coalesce_key,
+            created_at__gte=window_start
+        ).order_by('id').only('id', 'expires_at').first()
 
-        EventQueue.objects.create(
+        if not head:
+            return None
+
+        member, joined = EventDispatcher._join_batch(live_event, config, priority, head, coalesce_key)
+        if joined:
+            return head.id
+
+        # La cabeza ya estaba en proceso: el miembro queda como item independiente
+        EventQueue.objects.filter(id=member.id, status='coalesced').update(status='pending', batch_parent=None)
+        return None
+
+    @staticmethod
+    def _join_rate_limited(live_event, config, priority, head_id):
+        """
+        Política coalesce del límite de tasa: suma el evento al último item encolado
+
+        Returns:
+            bool: True si se agregó al lote; False si la cabeza ya no está
+                pendiente (el evento se descarta, no se encola aparte)
+        """
+        head = EventQueue.objects.filter(id=head_id, status='pending').only('id', 'expires_at', 'coalesce_key').first()
+        if not head:
+            return False
+
+        member, joined = EventDispatcher._join_batch(live_event, config, priority, head, head.coalesce_key)
+        if joined:
+            return True
+        EventQueue.objects.filter(id=member.id, status='coalesced').update(
+            status='discarded', batch_parent=None, processed_at=timezone.now()
+        )
+        return False
+
+    @staticmethod
+    def _join_batch(live_event, config, priority, head, coalesce_key):
+        """
+        Inserta el miembro del lote y suma 1 a batch_size de la cabeza si sigue pendiente
+
+        Returns:
+            tuple: (item miembro, True si la cabeza lo aceptó)
+        """
+        member = EventQueue.objects.create(
             service=config.service,
             live_event=live_event,
             session=live_event.session,
             priority=priority,
             is_async=config.is_async,
-            status='pending'
+            status='coalesced',
+            batch_parent_id=head.id,
+            coalesce_key=coalesce_key,
+            expires_at=head.expires_at,
+            sort_key=compute_sort_key(priority, time.time(), config.service.priority_aging_rate)
         )
+        joined = EventQueue.objects.filter(id=head.id, status='pending').update(batch_size=F('batch_size') + 1)
+        return member, bool(joined)
 
     @staticmethod
     def _get_gift_name(live_event):
@@ -267,10 +824,13 @@ class EventDispatcher:
         """
         # Buscar el evento descartable de menor prioridad
         # Ordenar por: prioridad ascendente (menor primero), luego por antiguedad (más viejo primero)
+        # Se bloquea la fila; si un worker la está tomando se pasa a la siguiente
         event_to_discard = EventQueue.objects.filter(
             service=service,
             status='pending'
-        ).select_related('live_event').order_by('priority', 'created_at').first()
+        ).select_related('live_event').select_for_update(
+            skip_locked=True, of=('self',)
+        ).order_by('priority', 'created_at').first()
 
         if event_to_discard:
             # Verificar que sea descartable
@@ -282,9 +842,13 @@ class EventDispatcher:
             if event_config and event_config.is_discardable:
                 # Verificar que tenga menor prioridad que el nuevo evento
                 if event_to_discard.priority < new_priority:
-                    # Marcar como descartado
-                    event_to_discard.mark_discarded()
-                    print(f"[DISPATCHER] 🗑️  Descartado evento P:{event_to_discard.priority} para hacer espacio a P:{new_priority}")
+                    # Marcar como descartado (False si un worker lo tomó justo antes)
+                    if not event_to_discard.mark_discarded():
+                        return None
+                    logger.info(
+                        "[DISPATCHER] 🗑️  Descartado evento P:%s para hacer espacio a P:%s",
+                        event_to_discard.priority, new_priority
+                    )
                     return event_to_discard
 
         return None
@@ -0,0 +1,83 @@
+"""
+Logging no bloqueante para el sistema de eventos
+
+Los threads del camino caliente (captura, dispatch, workers) solo encolan el
+LogRecord en un QueueHandler; un QueueListener en su propio thread hace las
+escrituras a archivo y consola. Los mensajes repetitivos de nivel INFO/DEBUG
+se muestrean para que el modo verbose no distorsione el throughput.
+"""
+
+import logging
+import queue
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Muestrea mensajes de alto volumen
+
+    Por cada (logger, plantilla del mensaje) deja pasar los primeros `burst`
+    registros de cada segundo y después 1 de cada `every`. WARNING o superior
+    siempre pasa. Con logging lazy (logger.info('... %s', x)) la plantilla es
+    la misma para todos los eventos de un tipo, así que se agrupan bien.
+    """
+
+    def __init__(self, burst: int = 20, every: int = 100):
+        super().__init__()
+        self.burst = burst
+        self.every = max(1, every)
+        self._lock = threading.Lock()
+        self._window = int(time.monotonic())
+        self._counts = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+
+        key = (record.name, record.msg)
+        now = int(time.monotonic())
+        with self._lock:
+            if now != self._window:
+                self._window = now
+                self._counts.clear()
+            count = self._counts.get(key, 0) + 1
+            self._counts[key] = count
+
+        if count <= self.burst:
+            return True
+        return (count - self.burst) % self.every == 0
+
+
+def setup_queue_logging(handlers, level=logging.INFO, burst: int = 20, every: int = 100,
+                        fmt: str = '%(asctime)s [%(levelname)s] %(message)s',
+                        datefmt: str = '%Y-%m-%d %H:%M:%S') -> QueueListener:
+    """
+    Configura el root logger con QueueHandler + QueueListener
+
+    Args:
+        handlers: handlers reales (archivo, consola) que corren en el thread del listener
+        level: nivel del root logger (los logger.debug() se descartan sin formatear)
+        burst / every: parámetros del SamplingFilter
+
+    Returns:
+        El QueueListener iniciado (llamar a stop() al apagar para vaciar la cola)
+    """
+    formatter = logging.Formatter(fmt, datefmt=datefmt)
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = QueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(burst=burst, every=every))
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    return listener
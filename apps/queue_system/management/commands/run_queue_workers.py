@@ -5,11 +5,21 @@ Uso:
     python manage.py run_queue_workers
     python manage.py run_queue_workers --verbose
     python manage.py run_queue_workers --service dinochrome
+    python manage.py run_queue_workers --service dinochrome,music
+    python manage.py run_queue_workers --processes     # un proceso por servicio (supervisor)
+    python manage.py run_queue_workers --metrics-port 9108   # /metrics (con --processes, un puerto por hijo)
 """
 
 from django.core.management.base import BaseCommand
 from apps.queue_system.models import Service
-from apps.queue_system.worker import ServiceWorker
+from apps.queue_system.worker import create_worker
+from apps.queue_system.log_setup import setup_queue_logging
+from apps.queue_system.supervisor import WorkerSupervisor, parse_groups, write_stats
+from apps.queue_system import metrics
+from apps.app_config.models import Config
+from pathlib import Path
+import logging
+import os
 import time
 import signal
 import sys
@@ -22,12 +32,14 @@ class Command(BaseCommand):
         super().__init__()
         self.workers = []
         self.running = True
+        self.log_listener = None
+        self.supervisor = None
 
     def add_arguments(self, parser):
         parser.add_argument(
             '--service',
             type=str,
-            help='Ejecutar solo un servicio específico (por slug)',
+            help='Ejecutar solo estos servicios (slugs separados por coma)',
             required=False
         )
         parser.add_argument(
@@ -35,6 +47,34 @@ class Command(BaseCommand):
             action='store_true',
             help='Mostrar logs detallados de procesamiento'
         )
+        parser.add_argument(
+            '--processes',
+            action='store_true',
+            help='Un proceso por servicio (o grupo de Config worker_process_groups) con reinicio automático'
+        )
+        parser.add_argument(
+            '--metrics-port',
+            type=int,
+            default=0,
+            help='Puerto HTTP para métricas Prometheus en /metrics (con --processes, el proceso i usa este + i; '
+                 '0 = desactivado)'
+        )
+        # Usados por el supervisor al lanzar cada proceso hijo
+        parser.add_argument(
+            '--stats-file',
+            type=str,
+            help='Escribir el estado de los workers en este archivo JSON cada 5 segundos'
+        )
+        parser.add_argument(
+            '--parent-pid',
+            type=int,
+            help='Terminar si el proceso padre (supervisor) deja de existir'
+        )
+        parser.add_argument(
+            '--log-file',
+            type=str,
+            help='Agregar los logs a este archivo además de la consola'
+        )
 
     def handle(self, *args, **options):
         # Configurar handler de señales para detener gracefully
@@ -43,11 +83,23 @@ class Command(BaseCommand):
 
         service_slug = options.get('service')
         verbose = options.get('verbose', False)
+        stats_file = options.get('stats_file')
+        parent_pid = options.get('parent_pid')
+
+        # Logs de workers/dispatcher a consola sin bloquear los threads
+        handlers = [logging.StreamHandler(sys.stdout)]
+        if options.get('log_file'):
+            handlers.append(logging.FileHandler(options['log_file'], encoding='utf-8'))
+        self.log_listener = setup_queue_logging(
+            handlers=handlers,
+            level=logging.DEBUG if verbose else logging.INFO,
+        )
 
         # Obtener servicios
         if service_slug:
-            # Un servicio específico
-            services = Service.objects.filter(slug=service_slug, is_active=True)
+            # Servicios específicos
+            slugs = [slug.strip() for slug in service_slug.split(',') if slug.strip()]
+            services = Service.objects.filter(slug__in=slugs, is_active=True)
             if not services.exists():
                 self.stdout.write(
                     self.style.ERROR(f'❌ Servicio "{service_slug}" no encontrado o inactivo')
@@ -68,12 +120,24 @@ class Command(BaseCommand):
         self.stdout.write(self.style.SUCCESS('=' * 60))
         self.stdout.write('')
 
+        metrics_port = options.get('metrics_port') or 0
+        if options.get('processes'):
+            self._run_supervisor(services, verbose, options.get('log_file'), metrics_port)
+            return
+
+        if metrics_port:
+            try:
+                metrics.start_http_server(metrics_port)
+                self.stdout.write(f'📈 Métricas Prometheus en http://0.0.0.0:{metrics_port}/metrics')
+            except OSError as e:
+                self.stdout.write(self.style.WARNING(f'⚠️  No se pudo iniciar el servidor de métricas: {e}'))
+
         # Crear y iniciar workers
         for service in services:
             self.stdout.write(f'📦 Iniciando worker para: {self.style.WARNING(service.name)}')
 
             try:
-                worker = ServiceWorker(service, verbose=verbose)
+                worker = create_worker(service, verbose=verbose)
                 worker.start()
                 self.workers.append(worker)
 
@@ -101,12 +165,23 @@ class Command(BaseCommand):
         # Loop de monitoreo
         try:
             counter = 0
+            if stats_file:
+                self._write_stats(stats_file)
             while self.running:
                 time.sleep(1)
                 counter += 1
 
-                # Mostrar estadísticas cada 30 segundos
-                if counter % 30 == 0:
+                # Proceso hijo: el supervisor lee este archivo para sus estadísticas
+                if stats_file and counter % 5 == 0:
+                    self._write_stats(stats_file)
+
+                # Proceso hijo huérfano (el supervisor murió sin detenerlo)
+                if parent_pid and os.getppid() != parent_pid:
+                    self.stdout.write(self.style.WARNING('⚠️  Supervisor terminado, deteniendo workers...'))
+                    break
+
+                # Mostrar estadísticas cada 30 segundos (el supervisor muestra las de sus hijos)
+                if counter % 30 == 0 and not stats_file:
                     self._show_stats()
 
         except KeyboardInterrupt:
@@ -115,6 +190,53 @@ class Command(BaseCommand):
         # Detener workers
         self._stop_workers()
 
+    def _write_stats(self, stats_file):
+        """Vuelca el estado de los workers para el supervisor"""
+        try:
+            write_stats(Path(stats_file), [worker.get_status() for worker in self.workers])
+        except Exception as e:
+            self.stdout.write(self.style.WARNING(f'⚠️  No se pudo escribir {stats_file}: {e}'))
+
+    def _run_supervisor(self, services, verbose, log_file, metrics_port=0):
+        """Modo procesos: un run_queue_workers hijo por grupo de servicios"""
+        groups = parse_groups(
+            Config.get_value('worker_process_groups'),
+            [service.slug for service in services]
+        )
+        self.supervisor = WorkerSupervisor(groups, verbose=verbose, log_file=log_file, metrics_port=metrics_port)
+        for worker in self.supervisor.processes:
+            port_info = f' (métricas en :{worker.metrics_port})' if worker.metrics_port else ''
+            self.stdout.write(f'📦 Proceso para: {self.style.WARNING(", ".join(worker.slugs))}{port_info}')
+        self.supervisor.start()
+
+        self.stdout.write('')
+        self.stdout.write(self.style.SUCCESS(f'✅ {len(groups)} proceso(s) de workers'))
+        self.stdout.write('')
+        self.stdout.write('💡 Presiona Ctrl+C para detener los workers')
+        self.stdout.write('📊 Estadísticas cada 30 segundos...')
+        self.stdout.write('')
+
+        try:
+            counter = 0
+            while self.running:
+                time.sleep(1)
+                counter += 1
+                self.supervisor.poll()
+                if counter % 30 == 0:
+                    self._show_stats()
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write('')
+        self.stdout.write(self.style.WARNING('⏹️  Deteniendo procesos de workers...'))
+        self.supervisor.stop()
+        self.stdout.write(self.style.SUCCESS('✅ Todos los procesos detenidos'))
+        self.stdout.write('')
+
+        if self.log_listener:
+            self.log_listener.stop()
+            self.log_listener = None
+
     def _signal_handler(self, signum, frame):
         """Handler para señales de sistema"""
         self.stdout.write('')
@@ -138,6 +260,10 @@ class Command(BaseCommand):
         self.stdout.write(self.style.SUCCESS('✅ Todos los workers detenidos'))
         self.stdout.write('')
 
+        if self.log_listener:
+            self.log_listener.stop()
+            self.log_listener = None
+
     def _show_stats(self):
         """Muestra estadísticas de los workers"""
         self.stdout.write('')
@@ -145,18 +271,29 @@ class Command(BaseCommand):
         self.stdout.write(self.style.SUCCESS('📊 ESTADÍSTICAS DE WORKERS'))
         self.stdout.write(self.style.SUCCESS('=' * 60))
 
-        for worker in self.workers:
-            status = worker.get_status()
+        if self.supervisor:
+            statuses = self.supervisor.get_status()
+        else:
+            statuses = [worker.get_status() for worker in self.workers]
 
+        for status in statuses:
             # Indicador de estado
             status_icon = '🟢' if status['running'] else '🔴'
 
             self.stdout.write(f"\n{status_icon} {self.style.WARNING(status['service'])}")
+            if 'pid' in status:
+                self.stdout.write(f"  • Proceso: pid {status['pid']} ({status['restarts']} reinicios)")
             self.stdout.write(f"  • Pendientes: {status['pending']}")
             self.stdout.write(f"  • Procesando: {status['processing']}")
+            if status['expired']:
+                self.stdout.write(f"  • Expirados (TTL): {status['expired']}")
+            if status['reaped']:
+                self.stdout.write(f"  • Recuperados (lease vencido): {status['reaped']}")
 
             if status['async_threads'] > 0:
                 self.stdout.write(f"  • Threads async activos: {status['async_threads']}")
+            if status.get('async_tasks'):
+                self.stdout.write(f"  • Tareas async en vuelo: {status['async_tasks']}")
 
         self.stdout.write('')
         self.stdout.write(self.style.SUCCESS('=' * 60))
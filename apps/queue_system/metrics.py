@@ -0,0 +1,261 @@
+"""
+Utilidades de métricas para el sistema de colas
+
+- percentile / summarize: resumen de latencias (p50, p95, p99)
+- MetricsRegistry: contadores, gauges e histogramas en memoria del proceso,
+  expuestos en formato de texto de Prometheus
+
+Las métricas se actualizan en el camino caliente (captura, dispatch, worker)
+con un lock por métrica; un scrape solo serializa lo que hay en memoria y
+nunca consulta la BD.
+"""
+
+import math
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """
+    Percentil por rango más cercano sobre una lista YA ordenada
+
+    Args:
+        sorted_values: valores ordenados ascendentemente
+        pct: percentil entre 0 y 100
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(values: Iterable[float]) -> Dict[str, float]:
+    """Resumen estándar de una serie de latencias (count, p50, p95, p99, max)"""
+    ordered = sorted(values)
+    return {
+        'count': len(ordered),
+        'p50': percentile(ordered, 50),
+        'p95': percentile(ordered, 95),
+        'p99': percentile(ordered, 99),
+        'max': ordered[-1] if ordered else 0.0,
+    }
+
+
+# ========================================
+# REGISTRY (formato Prometheus)
+# ========================================
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        with self._lock:
+            items = sorted(self._values.items())
+        lines.extend(self._render_samples(items))
+        return lines
+
+    def _render_samples(self, items) -> List[str]:
+        return [
+            f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}'
+            for key, value in items
+        ]
+
+
+class Counter(_Metric):
+    """Contador monotónico por combinación de labels"""
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """Valor que sube y baja (p.ej. items en proceso)"""
+    kind = 'gauge'
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    """Histograma acumulativo con buckets fijos (en segundos)"""
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state['counts'][index] += 1
+                    break
+            state['sum'] += value
+            state['count'] += 1
+
+    def _render_samples(self, items) -> List[str]:
+        lines = []
+        for key, state in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, state['counts']):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}')
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f'{self.name}_sum{labels} {_format_value(state["sum"])}')
+            lines.append(f'{self.name}_count{labels} {state["count"]}')
+        return lines
+
+
+class MetricsRegistry:
+    """Registro de métricas del proceso"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, documentation, labelnames=()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """Serializa todas las métricas en formato de texto de Prometheus"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+# Métricas del pipeline
+EVENTS_RECEIVED = registry.counter(
+    'tiktok_events_received_total', 'Eventos recibidos de TikTok Live', ['event_type'])
+EVENTS_STORED = registry.counter(
+    'tiktok_events_stored_total', 'LiveEvents guardados (después de agregar likes/joins)', ['event_type'])
+CHANNEL_DROPPED = registry.counter(
+    'tiktok_capture_channel_dropped_total', 'Eventos descartados por buffer lleno en el canal captura -> consumidor')
+CHANNEL_DUPLICATES = registry.counter(
+    'tiktok_capture_channel_duplicates_total', 'Registros reenviados por la captura tras un envío parcial y descartados por el consumidor')
+EVENTS_SHED = registry.counter(
+    'tiktok_events_shed_total', 'Eventos no guardados por backpressure (quedan en el journal)', ['event_type'])
+CAPTURE_PRESSURE_LEVEL = registry.gauge(
+    'tiktok_capture_pressure_level', 'Nivel de degradación de la captura por backpressure (0 normal, 1 elevado, 2 crítico)')
+CAPTURE_RECONNECTS = registry.counter(
+    'tiktok_capture_reconnects_total', 'Reconexiones de la captura a la misma sesión tras un corte')
+CAPTURE_GAP_SECONDS = registry.histogram(
+    'tiktok_capture_gap_seconds', 'Duración de los cortes de conexión de la captura (sin eventos)',
+    buckets=(1.0, 2.0, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0))
+DISPATCH_OUTCOMES = registry.counter(
+    'queue_dispatch_total', 'Resultados del dispatch por servicio', ['service', 'outcome'])
+DISPATCH_SECONDS = registry.histogram(
+    'queue_dispatch_seconds', 'Duración de EventDispatcher.dispatch', ['event_type'])
+DISPATCH_MANY_SECONDS = registry.histogram(
+    'queue_dispatch_many_seconds', 'Duración de EventDispatcher.dispatch_many (un lote)')
+CLAIM_WAIT_SECONDS = registry.histogram(
+    'queue_claim_wait_seconds', 'Tiempo en cola desde que se encola hasta que el worker lo toma', ['service'])
+PROCESSING_SECONDS = registry.histogram(
+    'queue_processing_seconds', 'Duración de process_event', ['service', 'result'])
+EVENTS_EXPIRED = registry.counter(
+    'queue_events_expired_total', 'Items que superaron max_age_seconds antes de ser tomados', ['service'])
+RETRIES = registry.counter(
+    'queue_retries_total', 'Items fallidos reprogramados (retry) o enviados a dead-letter (dead)', ['service', 'outcome'])
+LEASES_REAPED = registry.counter(
+    'queue_leases_reaped_total', 'Items con lease vencido recuperados por el reaper', ['service', 'outcome'])
+PROCESSING_INFLIGHT = registry.gauge(
+    'queue_processing_inflight', 'Items en proceso en este proceso', ['service'])
+TTS_SECONDS = registry.histogram(
+    'tts_request_seconds', 'Latencia de ElevenLabs text_to_speech', ['status'])
+LLM_SECONDS = registry.histogram(
+    'llm_request_seconds', 'Latencia de LLMClient.chat', ['status'])
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        body = registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Sin logs por scrape
+        pass
+
+
+def start_http_server(port: int, host: str = '0.0.0.0') -> ThreadingHTTPServer:
+    """Expone /metrics en un thread daemon"""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True, name='metrics-http')
+    thread.start()
+    return server
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.3 on 2026-10-19 09:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('queue_system', '0004_populate_tugofwar_service'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='serviceeventconfig',
+            name='is_aggregatable',
+            field=models.BooleanField(default=True, help_text='LikeEvent: si acepta likes agregados por ventana (True) o necesita cada tap individual (False)'),
+        ),
+    ]
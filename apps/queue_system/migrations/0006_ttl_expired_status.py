@@ -0,0 +1,33 @@
+# Generated by Django 5.1.3 on 2026-10-19 09:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('queue_system', '0005_serviceeventconfig_is_aggregatable'),
+        ('tiktok_events', '0005_liveevent_trace_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='eventqueue',
+            name='expires_at',
+            field=models.DateTimeField(blank=True, help_text='Si sigue pendiente después de este momento se marca como expirado (max_age_seconds de la configuración)', null=True),
+        ),
+        migrations.AddField(
+            model_name='serviceeventconfig',
+            name='max_age_seconds',
+            field=models.PositiveIntegerField(default=0, help_text='Segundos máximos que el evento puede esperar en cola antes de expirar (0 = sin límite)'),
+        ),
+        migrations.AlterField(
+            model_name='eventqueue',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('completed', 'Completed'), ('failed', 'Failed'), ('discarded', 'Discarded'), ('expired', 'Expired')], db_index=True, default='pending', help_text='Estado del evento en la cola', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='eventqueue',
+            index=models.Index(fields=['service', 'status', 'expires_at'], name='event_queue_service_f098c2_idx'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.1.3 on 2026-10-19 09:27
+
+from django.db import migrations, models
+
+
+def backfill_sort_key(apps, schema_editor):
+    """Calcula sort_key de los items pendientes (misma fórmula que models.compute_sort_key)"""
+    EventQueue = apps.get_model('queue_system', 'EventQueue')
+
+    items = EventQueue.objects.filter(status__in=['pending', 'processing']).select_related('service')
+    to_update = []
+    for item in items.iterator():
+        rate = item.service.priority_aging_rate
+        enqueued_ts = item.created_at.timestamp()
+        if rate and rate > 0:
+            item.sort_key = enqueued_ts - item.priority / rate
+        else:
+            item.sort_key = enqueued_ts - item.priority * 1_000_000
+        to_update.append(item)
+
+    EventQueue.objects.bulk_update(to_update, ['sort_key'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('queue_system', '0006_ttl_expired_status'),
+        ('tiktok_events', '0005_liveevent_trace_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='eventqueue',
+            name='sort_key',
+            field=models.FloatField(default=0, help_text='Orden de claim (ascendente) con aging de prioridad, ver compute_sort_key'),
+        ),
+        migrations.AddField(
+            model_name='service',
+            name='priority_aging_rate',
+            field=models.FloatField(default=0, help_text='Puntos de prioridad que gana un evento por segundo en cola. 0 (default) = orden estricto por prioridad; activarlo por servicio si los eventos de baja prioridad no pueden esperar sin límite (ej.: con 0.1 un P5 empata con un P10 recién llegado a los 50s de espera y lo pasa después)'),
+        ),
+        migrations.AddIndex(
+            model_name='eventqueue',
+            index=models.Index(fields=['service', 'status', 'sort_key'], name='event_queue_service_5e3a2d_idx'),
+        ),
+        migrations.RunPython(backfill_sort_key, migrations.RunPython.noop),
+    ]
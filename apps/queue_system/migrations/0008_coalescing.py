@@ -0,0 +1,49 @@
+# Generated by Django 5.1.3 on 2026-10-19 09:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('queue_system', '0007_priority_aging'),
+        ('tiktok_events', '0005_liveevent_trace_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='eventqueue',
+            name='available_at',
+            field=models.DateTimeField(blank=True, help_text='El worker no toma el item antes de este momento (cierre de la ventana de coalescing)', null=True),
+        ),
+        migrations.AddField(
+            model_name='eventqueue',
+            name='batch_parent',
+            field=models.ForeignKey(blank=True, help_text="Item cabeza del lote en el que se agrupó este evento (status 'coalesced')", null=True, on_delete=django.db.models.deletion.CASCADE, related_name='batch_items', to='queue_system.eventqueue'),
+        ),
+        migrations.AddField(
+            model_name='eventqueue',
+            name='batch_size',
+            field=models.PositiveIntegerField(default=1, help_text='Eventos que lleva el lote (cabeza incluida)'),
+        ),
+        migrations.AddField(
+            model_name='eventqueue',
+            name='coalesce_key',
+            field=models.CharField(blank=True, default='', help_text='Clave de agrupación (tipo de evento y regalo); vacío si la configuración no agrupa', max_length=150),
+        ),
+        migrations.AddField(
+            model_name='serviceeventconfig',
+            name='coalesce_window_ms',
+            field=models.PositiveIntegerField(default=0, help_text='Agrupa en un solo item los eventos pendientes del mismo tipo (y regalo) que lleguen dentro de esta ventana; el servicio los recibe juntos en process_batch (0 = sin agrupar)'),
+        ),
+        migrations.AlterField(
+            model_name='eventqueue',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('completed', 'Completed'), ('failed', 'Failed'), ('discarded', 'Discarded'), ('expired', 'Expired'), ('coalesced', 'Coalesced')], db_index=True, default='pending', help_text='Estado del evento en la cola', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='eventqueue',
+            index=models.Index(fields=['service', 'status', 'coalesce_key'], name='event_queue_service_e0d87e_idx'),
+        ),
+    ]
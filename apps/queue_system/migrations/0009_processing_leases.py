@@ -0,0 +1,38 @@
+# Generated by Django 5.1.3 on 2026-10-19 09:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('queue_system', '0008_coalescing'),
+        ('tiktok_events', '0005_liveevent_trace_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='eventqueue',
+            name='attempts',
+            field=models.PositiveIntegerField(default=0, help_text='Veces que un worker tomó este item'),
+        ),
+        migrations.AddField(
+            model_name='eventqueue',
+            name='lease_expires_at',
+            field=models.DateTimeField(blank=True, help_text='Si el worker no renueva el lease antes de este momento, el reaper devuelve el item a la cola', null=True),
+        ),
+        migrations.AddField(
+            model_name='eventqueue',
+            name='worker_id',
+            field=models.CharField(blank=True, default='', help_text='Worker que tomó el item (host:pid:servicio:id)', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='service',
+            name='max_attempts',
+            field=models.PositiveIntegerField(default=3, help_text='Veces que un evento puede tomarse antes de darlo por fallido si el worker muere procesándolo'),
+        ),
+        migrations.AddIndex(
+            model_name='eventqueue',
+            index=models.Index(fields=['service', 'status', 'lease_expires_at'], name='event_queue_service_eae888_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.3 on 2026-10-19 09:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('queue_system', '0009_processing_leases'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='service',
+            name='retry_backoff_seconds',
+            field=models.FloatField(default=2.0, help_text='Espera base antes de reintentar un evento fallido; se duplica en cada intento (tope 60s)'),
+        ),
+        migrations.AlterField(
+            model_name='eventqueue',
+            name='available_at',
+            field=models.DateTimeField(blank=True, help_text='El worker no toma el item antes de este momento (cierre de la ventana de coalescing o backoff de reintento)', null=True),
+        ),
+        migrations.AlterField(
+            model_name='eventqueue',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('completed', 'Completed'), ('failed', 'Failed'), ('discarded', 'Discarded'), ('expired', 'Expired'), ('coalesced', 'Coalesced'), ('dead', 'Dead')], db_index=True, default='pending', help_text='Estado del evento en la cola', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='service',
+            name='max_attempts',
+            field=models.PositiveIntegerField(default=3, help_text='Intentos por evento (fallos y caídas del worker) antes de moverlo a la cola de muertos (dead)'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.3 on 2026-10-19 09:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('queue_system', '0010_retries_dead_letter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='service',
+            name='max_concurrency',
+            field=models.PositiveIntegerField(default=10, help_text='Eventos en vuelo a la vez en el worker async (solo servicios que implementan aprocess_event)'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.3 on 2026-10-19 09:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('queue_system', '0011_service_max_concurrency'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='serviceeventconfig',
+            name='rate_limit_burst',
+            field=models.PositiveIntegerField(default=0, help_text='Ráfaga máxima admitida de golpe (0 = igual al límite por segundo, mínimo 1)'),
+        ),
+        migrations.AddField(
+            model_name='serviceeventconfig',
+            name='rate_limit_per_second',
+            field=models.FloatField(default=0, help_text='Eventos por segundo que se admiten para este servicio y tipo; el exceso se maneja según la política, antes de escribir en la cola (0 = sin límite)'),
+        ),
+        migrations.AddField(
+            model_name='serviceeventconfig',
+            name='rate_limit_policy',
+            field=models.CharField(choices=[('drop', 'Descartar el exceso'), ('coalesce', 'Agrupar en el último encolado'), ('defer', 'Diferir hasta que haya lugar')], default='drop', help_text='Qué hacer con el exceso: descartarlo, sumarlo al lote del último item encolado con la misma clave, o encolarlo con available_at cuando haya token (hasta max_age_seconds o 60s)', max_length=10),
+        ),
+    ]
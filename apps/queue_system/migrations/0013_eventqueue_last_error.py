@@ -0,0 +1,18 @@
+# Generated by Django 5.1.3 on 2026-10-19 10:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('queue_system', '0012_rate_limits'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='eventqueue',
+            name='last_error',
+            field=models.TextField(blank=True, default='', help_text='Motivo del último fallo (error, process_event falso o lease vencido)'),
+        ),
+    ]
@@ -3,6 +3,31 @@ from django.utils import timezone
 from apps.base_models import BaseModel
 
 
+# Con aging desactivado (rate 0) cada punto de prioridad equivale a este
+# tiempo de espera: en la práctica, orden estricto por prioridad y luego FIFO
+STRICT_PRIORITY_SPAN_SECONDS = 1_000_000
+
+
+def compute_sort_key(priority, enqueued_ts, aging_rate):
+    """
+    Clave de orden de la cola con aging de prioridad
+
+    La prioridad efectiva de un item es priority + aging_rate * espera. Como
+    "ahora" es igual para todos los items, ordenar por prioridad efectiva
+    descendente equivale a ordenar por enqueued_ts - priority / aging_rate
+    ascendente: la clave se calcula una vez al encolar y el claim la usa
+    con un índice, sin cálculos por fila.
+
+    Args:
+        priority: Prioridad del item
+        enqueued_ts: Momento de encolado (epoch en segundos)
+        aging_rate: Puntos de prioridad que gana el item por segundo de espera
+    """
+    if aging_rate and aging_rate > 0:
+        return enqueued_ts - priority / aging_rate
+    return enqueued_ts - priority * STRICT_PRIORITY_SPAN_SECONDS
+
+
 class Service(BaseModel):
     """
     Modelo para definir servicios que procesan eventos
@@ -22,6 +47,24 @@ class Service(BaseModel):
     is_active = models.BooleanField(default=True, db_index=True, help_text="Si el servicio está activo")
     max_queue_size = models.IntegerField(default=100, help_text="Tamaño máximo de la cola de eventos")
     obs_scene_name = models.CharField(max_length=255, null=True, blank=True, help_text="Nombre de la escena en OBS asociada a este servicio")
+    max_attempts = models.PositiveIntegerField(
+        default=3,
+        help_text="Intentos por evento (fallos y caídas del worker) antes de moverlo a la cola de muertos (dead)"
+    )
+    retry_backoff_seconds = models.FloatField(
+        default=2.0,
+        help_text="Espera base antes de reintentar un evento fallido; se duplica en cada intento (tope 60s)"
+    )
+    max_concurrency = models.PositiveIntegerField(
+        default=10,
+        help_text="Eventos en vuelo a la vez en el worker async (solo servicios que implementan aprocess_event)"
+    )
+    priority_aging_rate = models.FloatField(
+        default=0,
+        help_text="Puntos de prioridad que gana un evento por segundo en cola. 0 (default) = orden estricto por "
+                  "prioridad; activarlo por servicio si los eventos de baja prioridad no pueden esperar sin límite "
+                  "(ej.: con 0.1 un P5 empata con un P10 recién llegado a los 50s de espera y lo pasa después)"
+    )
 
     class Meta:
         db_table = 'services'
@@ -90,6 +133,42 @@ class ServiceEventConfig(BaseModel):
         default=True,
         help_text="Si se procesa cada regalo de la racha (True) o solo al finalizar la racha (False)"
     )
+    is_aggregatable = models.BooleanField(
+        default=True,
+        help_text="LikeEvent: si acepta likes agregados por ventana (True) o necesita cada tap individual (False)"
+    )
+    coalesce_window_ms = models.PositiveIntegerField(
+        default=0,
+        help_text="Agrupa en un solo item los eventos pendientes del mismo tipo (y regalo) que lleguen dentro "
+                  "de esta ventana; el servicio los recibe juntos en process_batch (0 = sin agrupar)"
+    )
+    max_age_seconds = models.PositiveIntegerField(
+        default=0,
+        help_text="Segundos máximos que el evento puede esperar en cola antes de expirar (0 = sin límite)"
+    )
+
+    # Límite de tasa (token bucket en memoria del dispatcher)
+    RATE_LIMIT_POLICY_CHOICES = [
+        ('drop', 'Descartar el exceso'),
+        ('coalesce', 'Agrupar en el último encolado'),
+        ('defer', 'Diferir hasta que haya lugar'),
+    ]
+    rate_limit_per_second = models.FloatField(
+        default=0,
+        help_text="Eventos por segundo que se admiten para este servicio y tipo; el exceso se maneja según "
+                  "la política, antes de escribir en la cola (0 = sin límite)"
+    )
+    rate_limit_burst = models.PositiveIntegerField(
+        default=0,
+        help_text="Ráfaga máxima admitida de golpe (0 = igual al límite por segundo, mínimo 1)"
+    )
+    rate_limit_policy = models.CharField(
+        max_length=10,
+        choices=RATE_LIMIT_POLICY_CHOICES,
+        default='drop',
+        help_text="Qué hacer con el exceso: descartarlo, sumarlo al lote del último item encolado con la misma "
+                  "clave, o encolarlo con available_at cuando haya token (hasta max_age_seconds o 60s)"
+    )
 
     class Meta:
         db_table = 'service_event_configs'
@@ -142,6 +221,9 @@ class EventQueue(BaseModel):
         ('completed', 'Completed'),
         ('failed', 'Failed'),
         ('discarded', 'Discarded'),
+        ('expired', 'Expired'),
+        ('coalesced', 'Coalesced'),
+        ('dead', 'Dead'),
     ]
     status = models.CharField(
         max_length=20,
@@ -154,9 +236,57 @@ class EventQueue(BaseModel):
     # Configuración (copiada de ServiceEventConfig al encolar)
     priority = models.IntegerField(help_text="Prioridad del evento (copiada de la configuración)")
     is_async = models.BooleanField(help_text="Si debe procesarse async (copiada de la configuración)")
+    # Coalescing (ServiceEventConfig.coalesce_window_ms o límite de tasa con política coalesce)
+    coalesce_key = models.CharField(
+        max_length=150,
+        blank=True,
+        default='',
+        help_text="Clave de agrupación (tipo de evento y regalo); vacío si la configuración no agrupa"
+    )
+    batch_parent = models.ForeignKey(
+        'self',
+        on_delete=models.CASCADE,
+        related_name='batch_items',
+        null=True,
+        blank=True,
+        help_text="Item cabeza del lote en el que se agrupó este evento (status 'coalesced')"
+    )
+    batch_size = models.PositiveIntegerField(default=1, help_text="Eventos que lleva el lote (cabeza incluida)")
+    available_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="El worker no toma el item antes de este momento (cierre de la ventana de coalescing o backoff de reintento)"
+    )
+    # Lease del worker que lo está procesando (recuperación ante caídas)
+    worker_id = models.CharField(
+        max_length=100,
+        blank=True,
+        default='',
+        help_text="Worker que tomó el item (host:pid:servicio:id)"
+    )
+    lease_expires_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="Si el worker no renueva el lease antes de este momento, el reaper devuelve el item a la cola"
+    )
+    attempts = models.PositiveIntegerField(default=0, help_text="Veces que un worker tomó este item")
+    last_error = models.TextField(
+        blank=True,
+        default='',
+        help_text="Motivo del último fallo (error, process_event falso o lease vencido)"
+    )
+    sort_key = models.FloatField(
+        default=0,
+        help_text="Orden de claim (ascendente) con aging de prioridad, ver compute_sort_key"
+    )
 
     # Timestamps
     processed_at = models.DateTimeField(null=True, blank=True, help_text="Momento en que se procesó el evento")
+    expires_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="Si sigue pendiente después de este momento se marca como expirado (max_age_seconds de la configuración)"
+    )
 
     class Meta:
         db_table = 'event_queue'
@@ -166,6 +296,10 @@ class EventQueue(BaseModel):
         indexes = [
             models.Index(fields=['service', 'status', '-priority', 'created_at']),
             models.Index(fields=['service', 'status']),
+            models.Index(fields=['service', 'status', 'expires_at']),
+            models.Index(fields=['service', 'status', 'sort_key']),
+            models.Index(fields=['service', 'status', 'coalesce_key']),
+            models.Index(fields=['service', 'status', 'lease_expires_at']),
             models.Index(fields=['live_event']),
         ]
 
@@ -190,7 +324,30 @@ class EventQueue(BaseModel):
         self.save(update_fields=['status', 'processed_at'])
 
     def mark_discarded(self):
-        """Marca el evento como descartado"""
+        """
+        Marca el evento como descartado (junto con los eventos agrupados en su lote)
+
+        Un solo UPDATE condicionado a que siga pendiente, para no pisar un item
+        que un worker acaba de tomar.
+
+        Returns:
+            bool: True si se descartó
+        """
+        now = timezone.now()
+        discarded = EventQueue.objects.filter(pk=self.pk, status='pending').update(
+            status='discarded', processed_at=now
+        )
+        if not discarded:
+            return False
+
         self.status = 'discarded'
-        self.processed_at = timezone.now()
-        self.save(update_fields=['status', 'processed_at'])
+        self.processed_at = now
+        if self.batch_size > 1:
+            self.finish_batch_items('discarded')
+        return True
+
+    def finish_batch_items(self, status):
+        """Propaga el estado final de la cabeza a los eventos agrupados en su lote"""
+        return self.batch_items.filter(
+            status__in=['coalesced', 'processing']
+        ).update(status=status, processed_at=timezone.now())
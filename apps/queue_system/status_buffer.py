@@ -0,0 +1,151 @@
+"""
+StatusBuffer - Transiciones de estado finales agrupadas
+
+Los workers no hacen un save() por cada item completado/fallido: registran
+la transición acá y un thread la vuelca cada STATUS_FLUSH_INTERVAL con un
+UPDATE por estado:
+
+    UPDATE event_queue
+       SET status = 'completed',
+           processed_at = CASE id WHEN 12 THEN ... WHEN 13 THEN ... END
+     WHERE id IN (12, 13, ...)
+
+processed_at conserva el momento real de cada item (CASE por id), así las
+latencias de completado no dependen del intervalo de flush. Los items de un
+lote (coalescing) reciben el estado de su cabeza en el mismo flush.
+
+Los reintentos usan el mismo camino: status 'pending' con available_at (fin
+del backoff) en lugar de processed_at, y el lease liberado. Los fallos
+(reintento, failed o dead) guardan además el motivo en last_error.
+"""
+
+import logging
+import threading
+from collections import defaultdict
+from django.db import close_old_connections
+from django.db.models import Case, DateTimeField, F, TextField, Value, When
+from django.utils import timezone
+from .models import EventQueue
+
+logger = logging.getLogger(__name__)
+
+
+class StatusBuffer:
+    """Acumula transiciones finales (id -> estado, processed_at) y las vuelca en bloque"""
+
+    def __init__(self, worker_id: str, flush_interval: float = 0.25):
+        self.worker_id = worker_id
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._pending = {}          # id -> (status, processed_at o available_at)
+        self._batch_heads = set()   # ids con items agrupados (coalescing)
+        self._errors = {}           # id -> motivo del fallo (last_error)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add(self, queue_item: EventQueue, status: str, has_batch: bool = False, available_at=None,
+            error: str = ''):
+        """
+        Registra la transición de un item (se escribe en el próximo flush)
+
+        Args:
+            status: Estado final, o 'pending' para reintentar
+            has_batch: Si el item es cabeza de un lote (coalescing)
+            available_at: Con status 'pending', momento desde el que puede volver a tomarse
+            error: Motivo del fallo (se guarda en last_error)
+        """
+        with self._lock:
+            self._pending[queue_item.id] = (status, available_at if status == 'pending' else timezone.now())
+            if has_batch:
+                self._batch_heads.add(queue_item.id)
+            if error:
+                self._errors[queue_item.id] = error
+        queue_item.status = status
+        if error:
+            queue_item.last_error = error
+
+    def flush(self) -> int:
+        """
+        Escribe las transiciones acumuladas
+
+        Returns:
+            int: Cantidad de items actualizados
+        """
+        with self._lock:
+            if not self._pending:
+                return 0
+            pending, self._pending = self._pending, {}
+            batch_heads, self._batch_heads = self._batch_heads, set()
+            errors, self._errors = self._errors, {}
+
+        try:
+            return self._write(pending, batch_heads, errors)
+        except Exception:
+            # Devolver al buffer para el próximo intervalo (sin pisar transiciones nuevas)
+            with self._lock:
+                for item_id, transition in pending.items():
+                    self._pending.setdefault(item_id, transition)
+                self._batch_heads |= batch_heads
+                for item_id, error in errors.items():
+                    self._errors.setdefault(item_id, error)
+            raise
+
+    def _write(self, pending, batch_heads, errors=None):
+        by_status = defaultdict(dict)
+        for item_id, (status, moment) in pending.items():
+            by_status[status][item_id] = moment
+
+        updated = 0
+        for status, items in by_status.items():
+            per_item = Case(
+                *[When(id=item_id, then=Value(moment)) for item_id, moment in items.items()],
+                output_field=DateTimeField()
+            )
+            if status == 'pending':
+                # Reintento: vuelve a la cola después del backoff, sin lease
+                fields = {'status': status, 'available_at': per_item, 'lease_expires_at': None}
+                member_fields = {'status': 'coalesced'}
+            else:
+                fields = {'status': status, 'processed_at': per_item}
+                member_fields = {'status': status, 'processed_at': timezone.now()}
+
+            item_errors = [(item_id, errors[item_id]) for item_id in items if errors and item_id in errors]
+            if item_errors:
+                fields['last_error'] = Case(
+                    *[When(id=item_id, then=Value(error)) for item_id, error in item_errors],
+                    default=F('last_error'),
+                    output_field=TextField()
+                )
+
+            # Solo items que siguen siendo de este worker (otro pudo retomarlos tras vencer el lease)
+            updated += EventQueue.objects.filter(id__in=list(items), worker_id=self.worker_id).update(**fields)
+
+            heads = [item_id for item_id in items if item_id in batch_heads]
+            if heads:
+                EventQueue.objects.filter(
+                    batch_parent_id__in=heads,
+                    status__in=['coalesced', 'processing']
+                ).update(**member_fields)
+
+        return updated
+
+    def start(self):
+        """Inicia el thread que vuelca el buffer periódicamente"""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Detiene el thread y hace el último flush"""
+        self._stop.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=2)
+        self.flush()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                close_old_connections()
+                self.flush()
+            except Exception as e:
+                logger.warning("[STATUS] ⚠️  Error volcando estados, se reintenta: %s", e)
@@ -0,0 +1,246 @@
+"""
+WorkerSupervisor - Un proceso por servicio (o grupo de servicios)
+
+En modo threads todos los ServiceWorker comparten el intérprete (y el GIL)
+con el loop asyncio de la captura: un servicio que usa mucha CPU retrasa la
+lectura del websocket y al resto de los servicios. En modo procesos cada
+grupo corre en su propio `run_queue_workers --service ...`:
+
+- El trabajo llega por la misma cola en la BD (no hay canal nuevo): el
+  dispatcher inserta en event_queue y el proceso del servicio hace el claim
+- Si un proceso muere se relanza con backoff exponencial; los items que
+  tenía en 'processing' los recupera el reaper de leases del nuevo proceso
+- Cada hijo escribe su get_status() en tmp/worker_stats/<grupo>.json y el
+  supervisor los junta para las estadísticas
+- Las métricas Prometheus son por proceso: con metrics_port cada hijo expone
+  las suyas en metrics_port + índice del grupo (mismo puerto al relanzarse)
+
+Grupos (Config worker_process_groups, separados por ';'):
+    dinochrome,music;tugofwar   -> dos procesos
+Los servicios activos que no aparecen en ningún grupo van en uno propio.
+"""
+
+import json
+import logging
+import os
+import signal
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+STATS_DIR = Path(settings.BASE_DIR) / 'tmp' / 'worker_stats'
+
+
+def parse_groups(spec: Optional[str], slugs: List[str]) -> List[List[str]]:
+    """
+    Arma los grupos de servicios a partir de la especificación de Config
+
+    Args:
+        spec: 'a,b;c' (grupos separados por ';', slugs por ',')
+        slugs: Slugs de los servicios activos
+
+    Returns:
+        list: Un grupo (lista de slugs) por proceso
+    """
+    groups, assigned = [], set()
+    for chunk in (spec or '').split(';'):
+        group = [slug.strip() for slug in chunk.split(',')
+                 if slug.strip() in slugs and slug.strip() not in assigned]
+        if group:
+            groups.append(group)
+            assigned.update(group)
+    groups.extend([slug] for slug in slugs if slug not in assigned)
+    return groups
+
+
+def write_stats(path: Path, statuses: List[Dict], key: str = 'workers'):
+    """Escribe el estado de los workers (o cuentas, key='accounts') de un proceso (reemplazo atómico)"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + '.tmp')
+    tmp_path.write_text(json.dumps({
+        'pid': os.getpid(),
+        'updated_at': time.time(),
+        key: statuses,
+    }), encoding='utf-8')
+    os.replace(tmp_path, path)
+
+
+def read_stats(path: Path) -> Optional[Dict]:
+    """Lee el archivo de estado de un proceso (None si no existe o está a medio escribir)"""
+    try:
+        return json.loads(path.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return None
+
+
+class WorkerProcess:
+    """Un proceso hijo `run_queue_workers` para un grupo de servicios"""
+
+    def __init__(self, slugs: List[str], metrics_port: int = 0):
+        self.slugs = slugs
+        self.name = ','.join(slugs)
+        self.stats_path = STATS_DIR / f"{'+'.join(slugs)}.json"
+        self.metrics_port = metrics_port
+        self.proc = None
+        self.started_at = 0.0
+        self.restarts = 0
+        self.next_start_at = 0.0
+        self.failures = 0  # caídas seguidas (para el backoff)
+
+    @property
+    def alive(self) -> bool:
+        return self.proc is not None and self.proc.poll() is None
+
+
+class WorkerSupervisor:
+    """
+    Lanza y vigila un proceso de workers por grupo de servicios
+
+    Uso:
+        supervisor = WorkerSupervisor([['dinochrome'], ['tugofwar', 'music']])
+        supervisor.start()
+        while running:
+            supervisor.poll()      # relanza procesos caídos
+        supervisor.stop()
+    """
+
+    # Backoff entre relanzamientos de un proceso que se cae (segundos)
+    RESTART_BASE_DELAY = 1
+    RESTART_MAX_DELAY = 30
+
+    # Si el proceso vivió más que esto, la caída no cuenta para el backoff
+    STABLE_SECONDS = 60
+
+    # Estado más viejo que esto se muestra como caído
+    STATS_MAX_AGE = 15
+
+    def __init__(self, groups: List[List[str]], verbose: bool = False, log_file: Optional[str] = None,
+                 metrics_port: int = 0):
+        """
+        Args:
+            groups: Un grupo de slugs por proceso
+            metrics_port: Puerto base de /metrics de los hijos (hijo i en metrics_port + i, 0 = sin métricas)
+        """
+        self.processes = [
+            WorkerProcess(slugs, metrics_port + index if metrics_port else 0)
+            for index, slugs in enumerate(groups)
+        ]
+        self.verbose = verbose
+        self.log_file = log_file
+        self.running = False
+
+    def _command(self, worker: WorkerProcess) -> List[str]:
+        command = [
+            sys.executable, str(Path(settings.BASE_DIR) / 'manage.py'), 'run_queue_workers',
+            '--service', worker.name,
+            '--stats-file', str(worker.stats_path),
+            '--parent-pid', str(os.getpid()),
+        ]
+        if self.verbose:
+            command.append('--verbose')
+        if self.log_file:
+            command.extend(['--log-file', self.log_file])
+        if worker.metrics_port:
+            command.extend(['--metrics-port', str(worker.metrics_port)])
+        return command
+
+    def _spawn(self, worker: WorkerProcess):
+        try:
+            worker.stats_path.unlink()
+        except FileNotFoundError:
+            pass
+        worker.proc = subprocess.Popen(self._command(worker), cwd=str(settings.BASE_DIR))
+        worker.started_at = time.time()
+        logger.info("[SUPERVISOR] 🚀 Proceso %s iniciado (pid %s)", worker.name, worker.proc.pid)
+
+    def start(self):
+        """Lanza un proceso por grupo"""
+        self.running = True
+        for worker in self.processes:
+            self._spawn(worker)
+
+    def poll(self):
+        """Revisa los procesos y relanza los caídos (llamar periódicamente)"""
+        if not self.running:
+            return
+        now = time.time()
+        for worker in self.processes:
+            if worker.proc is None:
+                if now >= worker.next_start_at:
+                    self._spawn(worker)
+                continue
+            code = worker.proc.poll()
+            if code is None:
+                continue
+
+            if now - worker.started_at >= self.STABLE_SECONDS:
+                worker.failures = 0
+            worker.failures += 1
+            delay = min(self.RESTART_MAX_DELAY, self.RESTART_BASE_DELAY * 2 ** (worker.failures - 1))
+            logger.warning(
+                "[SUPERVISOR] 💥 Proceso %s terminó (código %s), se relanza en %ss",
+                worker.name, code, delay
+            )
+            worker.proc = None
+            worker.restarts += 1
+            worker.next_start_at = now + delay
+
+    def stop(self, timeout: float = 10):
+        """Detiene todos los procesos (SIGTERM y, si no terminan, SIGKILL)"""
+        self.running = False
+        alive = [worker for worker in self.processes if worker.alive]
+        for worker in alive:
+            worker.proc.send_signal(signal.SIGTERM)
+
+        deadline = time.time() + timeout
+        for worker in alive:
+            try:
+                worker.proc.wait(timeout=max(0.1, deadline - time.time()))
+            except subprocess.TimeoutExpired:
+                logger.warning("[SUPERVISOR] ⚠️  Proceso %s no terminó, se mata", worker.name)
+                worker.proc.kill()
+                worker.proc.wait()
+
+        for worker in self.processes:
+            try:
+                worker.stats_path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def get_status(self) -> List[Dict]:
+        """
+        Estado de todos los workers de todos los procesos
+
+        Returns:
+            list: Mismo formato que ServiceWorker.get_status() más 'pid' y 'restarts'
+        """
+        statuses = []
+        now = time.time()
+        for worker in self.processes:
+            stats = read_stats(worker.stats_path) if worker.alive else None
+            fresh = bool(stats) and now - stats['updated_at'] <= self.STATS_MAX_AGE
+            if fresh:
+                for status in stats['workers']:
+                    status.update(pid=stats['pid'], restarts=worker.restarts)
+                    statuses.append(status)
+                continue
+
+            for slug in worker.slugs:
+                statuses.append({
+                    'service': slug,
+                    'running': False,
+                    'pending': 0,
+                    'processing': 0,
+                    'expired': 0,
+                    'reaped': 0,
+                    'async_threads': 0,
+                    'pid': worker.proc.pid if worker.alive else None,
+                    'restarts': worker.restarts,
+                })
+        return statuses
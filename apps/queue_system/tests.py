@@ -1,3 +1,534 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.db import OperationalError, connection
 from django.test import TestCase
+from django.utils import timezone
+
+from apps.queue_system.admission import TokenBucket, controller as admission_controller
+from apps.queue_system.base_service import BaseQueueService
+from apps.queue_system.dispatcher import EventDispatcher
+from apps.queue_system.models import EventQueue, Service, ServiceEventConfig, compute_sort_key
+from apps.queue_system.worker import LEASE_EXPIRED_ERROR, ServiceWorker
+from apps.tiktok_events.models import LiveEvent, LiveSession
+
+
+class StubService(BaseQueueService):
+    """Servicio de prueba: registra los eventos de cada item procesado"""
+
+    def __init__(self):
+        self.batches = []
+
+    def process_event(self, live_event, queue_item):
+        self.batches.append([live_event.id])
+        return True
+
+    def process_batch(self, live_events, queue_item):
+        self.batches.append([live_event.id for live_event in live_events])
+        return True
+
+
+class QueueTestCase(TestCase):
+    """Servicio, sesión y helpers comunes (el worker no se arranca: se llaman sus pasos)"""
+
+    def setUp(self):
+        admission_controller.reset()
+        self.service = Service.objects.create(
+            name='Test Service',
+            slug='test-service',
+            service_class='apps.queue_system.tests.StubService',
+            max_queue_size=2,
+            max_attempts=3,
+            retry_backoff_seconds=2.0,
+        )
+        self.session = LiveSession.objects.create(room_id=1, streamer_unique_id='streamer')
+
+    def tearDown(self):
+        admission_controller.reset()
+
+    def make_config(self, event_type, **kwargs):
+        return ServiceEventConfig.objects.create(service=self.service, event_type=event_type, **kwargs)
+
+    def make_event(self, event_type='LikeEvent', gift_name=None):
+        event_data = {'gift': {'name': gift_name}} if gift_name else {}
+        return LiveEvent.objects.create(
+            session=self.session,
+            event_type=event_type,
+            timestamp=timezone.now(),
+            room_id=1,
+            streamer_unique_id='streamer',
+            user_nickname='viewer',
+            streak_status='end' if event_type == 'GiftEvent' else None,
+            event_data=event_data,
+        )
+
+    def dispatch(self, config, event_type=None, gift_name=None):
+        live_event = self.make_event(event_type or config.event_type, gift_name)
+        return EventDispatcher._process_service_queue(live_event, config)
+
+    def make_worker(self):
+        worker = ServiceWorker(self.service, verbose=False)
+        worker.service_instance = worker._load_service_instance()
+        return worker
+
+    def claim(self, worker):
+        """Hace disponible todo lo pendiente (fin de ventanas/backoff) y toma el siguiente item"""
+        EventQueue.objects.filter(service=self.service, status='pending').update(
+            available_at=timezone.now() - timedelta(seconds=1)
+        )
+        items = worker._claim_next_events()
+        self.assertEqual(len(items), 1)
+        return items[0]
+
+
+class EvictionTests(QueueTestCase):
+    """Cola llena: desalojo del item descartable de menor prioridad"""
+
+    def setUp(self):
+        super().setUp()
+        self.likes = self.make_config('LikeEvent', priority=1, is_discardable=True)
+        self.gifts = self.make_config('GiftEvent', priority=8, is_discardable=False, is_stackable=True)
+
+    def test_higher_priority_evicts_discardable(self):
+        self.dispatch(self.likes)
+        self.dispatch(self.likes)
+
+        result = self.dispatch(self.gifts, gift_name='Galaxy')
+
+        self.assertEqual(result['status'], 'enqueued')
+        self.assertIsNotNone(result['discarded_event'])
+        self.assertEqual(EventQueue.objects.get(id=result['discarded_event']).status, 'discarded')
+        self.assertEqual(EventQueue.objects.filter(service=self.service, status='pending').count(), 2)
+
+    def test_full_of_non_discardable_rejects(self):
+        self.dispatch(self.gifts, gift_name='Galaxy')
+        self.dispatch(self.gifts, gift_name='Galaxy')
+
+        self.assertEqual(self.dispatch(self.gifts, gift_name='Galaxy')['status'], 'queue_full')
+        self.assertEqual(self.dispatch(self.likes)['status'], 'discarded')
+        self.assertEqual(EventQueue.objects.filter(service=self.service).count(), 2)
+
+
+class QueueLockTests(QueueTestCase):
+    """Transacción de encolado con la cola del servicio bloqueada"""
+
+    def test_lock_conflicts_are_retried(self):
+        func = mock.Mock(side_effect=[OperationalError('database is locked'), 'ok'])
+
+        with mock.patch('apps.queue_system.dispatcher.time.sleep'):
+            result = EventDispatcher._with_queue_lock(self.service, func, 1)
+
+        self.assertEqual(result, 'ok')
+        self.assertEqual(func.call_count, 2)
+
+    def test_lock_gives_up_after_retries(self):
+        func = mock.Mock(side_effect=OperationalError('deadlock'))
+
+        with mock.patch('apps.queue_system.dispatcher.time.sleep'):
+            with self.assertRaises(OperationalError):
+                EventDispatcher._with_queue_lock(self.service, func)
+
+        self.assertEqual(func.call_count, EventDispatcher.LOCK_RETRIES)
+
+    def test_sqlite_takes_write_lock_at_begin(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('Solo aplica a la BD local (sqlite)')
+        self.assertEqual(connection.transaction_mode, 'IMMEDIATE')
+        self.assertEqual(connection.settings_dict['OPTIONS']['timeout'], 20)
+
+
+class ExpiryTests(QueueTestCase):
+    """TTL de los items: los vencidos se marcan expired en vez de procesarse tarde"""
+
+    def setUp(self):
+        super().setUp()
+        self.config = self.make_config('CommentEvent', max_age_seconds=10)
+
+    def expire(self, item_id):
+        EventQueue.objects.filter(id=item_id).update(expires_at=timezone.now() - timedelta(seconds=1))
+
+    def test_enqueue_sets_expires_at(self):
+        before = timezone.now()
+        item = EventQueue.objects.get(id=self.dispatch(self.config)['queue_item_id'])
+        self.assertAlmostEqual((item.expires_at - before).total_seconds(), 10, delta=1)
+
+    def test_no_ttl_never_expires(self):
+        config = self.make_config('LikeEvent')
+        item = EventQueue.objects.get(id=self.dispatch(config)['queue_item_id'])
+        self.assertIsNone(item.expires_at)
+
+    def test_stale_items_are_expired_not_claimed(self):
+        stale_id = self.dispatch(self.config)['queue_item_id']
+        fresh_id = self.dispatch(self.config)['queue_item_id']
+        self.expire(stale_id)
+
+        worker = self.make_worker()
+        claimed = worker._claim_next_events()
+
+        self.assertEqual([item.id for item in claimed], [fresh_id])
+        self.assertEqual(EventQueue.objects.get(id=stale_id).status, 'expired')
+        self.assertEqual(worker.expired_count, 1)
+
+    def test_expired_batch_head_expires_members(self):
+        config = self.make_config('GiftEvent', is_stackable=True, coalesce_window_ms=5000, max_age_seconds=10)
+        head_id = self.dispatch(config, gift_name='Galaxy')['queue_item_id']
+        self.dispatch(config, gift_name='Galaxy')
+        self.expire(head_id)
+
+        self.make_worker()._claim_next_events()
+
+        self.assertEqual(EventQueue.objects.get(batch_parent_id=head_id).status, 'expired')
+
+
+class PriorityAgingTests(QueueTestCase):
+    """Orden de claim con y sin aging de prioridad"""
+
+    def test_strict_priority_without_aging(self):
+        old_low = compute_sort_key(5, 0, 0)
+        new_high = compute_sort_key(10, 3600, 0)
+        self.assertLess(new_high, old_low)
+
+    def test_aging_lets_old_items_pass(self):
+        old_low = compute_sort_key(5, 0, 0.1)
+        self.assertLess(old_low, compute_sort_key(10, 60, 0.1))
+        self.assertGreater(old_low, compute_sort_key(10, 40, 0.1))
+
+    def test_strict_is_the_default(self):
+        self.assertEqual(Service._meta.get_field('priority_aging_rate').default, 0)
+
+    def test_claim_follows_sort_key(self):
+        likes = self.make_config('LikeEvent', priority=1)
+        gifts = self.make_config('GiftEvent', priority=8, is_stackable=True)
+        low_id = self.dispatch(likes)['queue_item_id']
+        high_id = self.dispatch(gifts, gift_name='Galaxy')['queue_item_id']
+        worker = self.make_worker()
+
+        self.assertEqual(self.claim(worker).id, high_id)
+
+        # Con aging, el item viejo de baja prioridad termina pasando adelante
+        EventQueue.objects.filter(id=high_id).update(status='pending', sort_key=compute_sort_key(8, 100, 0.1))
+        EventQueue.objects.filter(id=low_id).update(sort_key=compute_sort_key(1, 0, 0.1))
+        self.assertEqual(self.claim(worker).id, low_id)
+
+
+class CoalescingTests(QueueTestCase):
+    """Lotes de coalescing: unión a la cabeza y propagación de estado a los miembros"""
+
+    def setUp(self):
+        super().setUp()
+        self.service.max_queue_size = 100
+        self.service.save()
+        self.config = self.make_config('GiftEvent', priority=5, is_stackable=True, coalesce_window_ms=5000)
+
+    def test_events_merge_into_open_batch(self):
+        first = self.dispatch(self.config, gift_name='Galaxy')
+        second = self.dispatch(self.config, gift_name='Galaxy')
+        other_gift = self.dispatch(self.config, gift_name='Lion')
+
+        head = EventQueue.objects.get(id=first['queue_item_id'])
+        self.assertEqual(second['coalesced_into'], head.id)
+        self.assertEqual(head.batch_size, 2)
+        self.assertEqual(head.batch_items.get().status, 'coalesced')
+        self.assertIsNone(other_gift.get('coalesced_into'))
+
+    def test_batch_members_follow_head_status(self):
+        head_id = self.dispatch(self.config, gift_name='Galaxy')['queue_item_id']
+        self.dispatch(self.config, gift_name='Galaxy')
+        self.dispatch(self.config, gift_name='Galaxy')
+
+        worker = self.make_worker()
+        head = self.claim(worker)
+        self.assertEqual(head.id, head_id)
+        worker._process_event_safe(head)
+        worker.status_buffer.flush()
+
+        self.assertEqual(len(worker.service_instance.batches), 1)
+        self.assertEqual(len(worker.service_instance.batches[0]), 3)
+        self.assertEqual(EventQueue.objects.get(id=head_id).status, 'completed')
+
+        statuses = set(EventQueue.objects.filter(batch_parent_id=head_id).values_list('status', flat=True))
+        self.assertEqual(statuses, {'completed'})
+
+    def test_discarded_head_discards_members(self):
+        head_id = self.dispatch(self.config, gift_name='Galaxy')['queue_item_id']
+        self.dispatch(self.config, gift_name='Galaxy')
+
+        self.assertTrue(EventQueue.objects.get(id=head_id).mark_discarded())
+        self.assertEqual(EventQueue.objects.get(batch_parent_id=head_id).status, 'discarded')
+
+
+class LeaseReaperTests(QueueTestCase):
+    """Items con lease vencido: vuelven a la cola o pasan a dead con max_attempts"""
+
+    def make_leased_item(self, attempts):
+        return EventQueue.objects.create(
+            service=self.service,
+            live_event=self.make_event(),
+            priority=5,
+            is_async=False,
+            status='processing',
+            worker_id='otro-host:1:test-service:abc123',
+            lease_expires_at=timezone.now() - timedelta(seconds=1),
+            attempts=attempts,
+        )
+
+    def test_expired_lease_requeues(self):
+        item = self.make_leased_item(attempts=1)
+
+        self.assertEqual(self.make_worker()._reap_expired_leases(), 1)
+
+        item.refresh_from_db()
+        self.assertEqual(item.status, 'pending')
+        self.assertIsNone(item.lease_expires_at)
+        self.assertEqual(item.last_error, LEASE_EXPIRED_ERROR)
+
+    def test_expired_lease_at_max_attempts_goes_dead(self):
+        item = self.make_leased_item(attempts=3)
+
+        self.make_worker()._reap_expired_leases()
+
+        item.refresh_from_db()
+        self.assertEqual(item.status, 'dead')
+        self.assertIsNotNone(item.processed_at)
+
+    def test_live_lease_is_untouched(self):
+        item = self.make_leased_item(attempts=1)
+        EventQueue.objects.filter(id=item.id).update(lease_expires_at=timezone.now() + timedelta(seconds=30))
+
+        self.assertEqual(self.make_worker()._reap_expired_leases(), 0)
+        item.refresh_from_db()
+        self.assertEqual(item.status, 'processing')
+
+    def test_heartbeat_renews_own_leases(self):
+        config = self.make_config('CommentEvent')
+        self.dispatch(config)
+        worker = self.make_worker()
+        item = self.claim(worker)
+        EventQueue.objects.filter(id=item.id).update(lease_expires_at=timezone.now() + timedelta(seconds=1))
+
+        self.assertEqual(worker._renew_leases(), 1)
+
+        lease = EventQueue.objects.get(id=item.id).lease_expires_at
+        self.assertGreater((lease - timezone.now()).total_seconds(), ServiceWorker.LEASE_SECONDS - 5)
+        self.assertEqual(worker._reap_expired_leases(), 0)
+
+
+class RetryTests(QueueTestCase):
+    """Reintentos con backoff exponencial hasta dead-letter"""
+
+    def setUp(self):
+        super().setUp()
+        self.config = self.make_config('CommentEvent')
+        self.item_id = self.dispatch(self.config)['queue_item_id']
+
+    def fail(self, worker, error='Boom'):
+        item = self.claim(worker)
+        before = timezone.now()
+        worker._retry_or_bury(item, error=error)
+        worker.status_buffer.flush()
+        item.refresh_from_db()
+        return item, before
+
+    def test_backoff_grows_until_dead(self):
+        worker = self.make_worker()
+
+        for attempt, base in ((1, 2.0), (2, 4.0)):
+            item, before = self.fail(worker)
+            self.assertEqual(item.status, 'pending')
+            self.assertEqual(item.attempts, attempt)
+            delay = (item.available_at - before).total_seconds()
+            self.assertGreaterEqual(delay, base * 0.8 - 0.1)
+            self.assertLessEqual(delay, base * 1.2 + 0.1)
+
+        item, _ = self.fail(worker, error='Boom final')
+        self.assertEqual(item.status, 'dead')
+        self.assertEqual(item.attempts, 3)
+        self.assertEqual(item.last_error, 'Boom final')
+
+    def test_backoff_is_capped(self):
+        self.service.retry_backoff_seconds = 1000
+        self.service.save()
+
+        item, before = self.fail(self.make_worker())
+
+        delay = (item.available_at - before).total_seconds()
+        self.assertLessEqual(delay, ServiceWorker.RETRY_MAX_DELAY * 1.2 + 0.1)
+
+    def test_pending_retry_is_not_claimed_before_backoff(self):
+        worker = self.make_worker()
+        item = self.claim(worker)
+        worker._retry_or_bury(item)
+        worker.status_buffer.flush()
+
+        self.assertEqual(worker._claim_next_events(), [])
+
+    def test_exception_is_retried_with_reason(self):
+        worker = self.make_worker()
+        worker.service_instance.process_event = mock.Mock(side_effect=ValueError('sin overlay'))
+
+        worker._process_event_safe(self.claim(worker))
+        worker.status_buffer.flush()
+
+        item = EventQueue.objects.get(id=self.item_id)
+        self.assertEqual(item.status, 'pending')
+        self.assertEqual(item.last_error, 'ValueError: sin overlay')
+
+
+class DispatchManyEvictionTests(QueueTestCase):
+    """dispatch_many: desalojos decididos en memoria para todo el lote"""
+
+    def setUp(self):
+        super().setUp()
+        self.likes = self.make_config('LikeEvent', priority=1, is_discardable=True)
+        self.gifts = self.make_config('GiftEvent', priority=8, is_discardable=False, is_stackable=True)
+
+    def test_dispatch_many_evicts_in_memory(self):
+        events = [self.make_event('LikeEvent') for _ in range(2)]
+        events += [self.make_event('GiftEvent', 'Galaxy') for _ in range(2)]
+        events.append(self.make_event('LikeEvent'))
+
+        totals = EventDispatcher.dispatch_many(events)
+
+        # Los dos likes iniciales dejan lugar a los regalos; el último like no entra
+        self.assertEqual(totals['discarded'], 3)
+        pending = EventQueue.objects.filter(service=self.service, status='pending')
+        self.assertEqual(sorted(pending.values_list('priority', flat=True)), [8, 8])
+
+    def taken_by_worker(self, count=1):
+        """mark_discarded que pierde la carrera con un worker en los primeros `count` desalojos"""
+        original = EventQueue.mark_discarded
+        taken = []
+
+        def mark_discarded(item):
+            if len(taken) < count:
+                taken.append(item.id)
+                EventQueue.objects.filter(id=item.id).update(status='processing')
+            return original(item)
+
+        return mock.patch.object(EventQueue, 'mark_discarded', mark_discarded), taken
+
+    def test_lost_race_takes_next_victim(self):
+        self.dispatch(self.likes)
+        second_like = self.dispatch(self.likes)['queue_item_id']
+        patch, taken = self.taken_by_worker()
+
+        with patch:
+            result = EventDispatcher.dispatch_many([self.make_event('GiftEvent', 'Galaxy')])
+
+        counts = result['services'][self.service.name]
+        self.assertEqual((counts['evicted'], counts['enqueued']), (1, 1))
+        self.assertEqual(EventQueue.objects.get(id=taken[0]).status, 'processing')
+        self.assertEqual(EventQueue.objects.get(id=second_like).status, 'discarded')
+        self.assertLessEqual(
+            EventQueue.objects.filter(service=self.service, status__in=['pending', 'processing']).count(),
+            self.service.max_queue_size
+        )
+
+    def test_lost_race_without_other_victim_rejects(self):
+        self.dispatch(self.likes)
+        self.dispatch(self.gifts, gift_name='Galaxy')
+        patch, _ = self.taken_by_worker()
+
+        with patch:
+            result = EventDispatcher.dispatch_many([self.make_event('GiftEvent', 'Galaxy')])
+
+        counts = result['services'][self.service.name]
+        self.assertEqual((counts['evicted'], counts['enqueued'], counts['queue_full']), (0, 0, 1))
+        self.assertEqual(EventQueue.objects.filter(service=self.service).count(), 2)
+
+
+class TokenBucketTests(TestCase):
+    """Token bucket con reloj explícito"""
+
+    def test_take_respects_burst_and_refill(self):
+        bucket = TokenBucket(rate=2, burst=2, now=0)
+
+        self.assertTrue(bucket.take(0))
+        self.assertTrue(bucket.take(0))
+        self.assertFalse(bucket.take(0))
+        self.assertTrue(bucket.take(0.5))
+        self.assertFalse(bucket.take(0.5))
+
+    def test_refill_never_exceeds_burst(self):
+        bucket = TokenBucket(rate=10, burst=3, now=0)
+        bucket.take(0)
+
+        bucket.take(100)
+        self.assertEqual(bucket.tokens, 2)
+
+    def test_reserve_queues_future_tokens(self):
+        bucket = TokenBucket(rate=1, burst=1, now=0)
+        bucket.take(0)
+
+        self.assertAlmostEqual(bucket.reserve(0, max_wait=10), 1.0)
+        self.assertAlmostEqual(bucket.reserve(0, max_wait=10), 2.0)
+        self.assertIsNone(bucket.reserve(0, max_wait=2.5))
+        self.assertAlmostEqual(bucket.tokens, -2.0)
+
+
+class RateLimitPolicyTests(QueueTestCase):
+    """Políticas del límite de tasa en el dispatcher: drop, coalesce y defer"""
+
+    def setUp(self):
+        super().setUp()
+        self.service.max_queue_size = 100
+        self.service.save()
+
+    def rate_limited_config(self, policy, **kwargs):
+        return self.make_config(
+            'GiftEvent', is_stackable=True, rate_limit_per_second=0.5, rate_limit_burst=1,
+            rate_limit_policy=policy, **kwargs
+        )
+
+    def test_drop_does_not_write(self):
+        config = self.rate_limited_config('drop')
+
+        self.assertEqual(self.dispatch(config, gift_name='Galaxy')['status'], 'enqueued')
+        self.assertEqual(self.dispatch(config, gift_name='Galaxy')['status'], 'rate_limited')
+        self.assertEqual(EventQueue.objects.filter(service=self.service).count(), 1)
+
+    def test_coalesce_joins_last_enqueued(self):
+        config = self.rate_limited_config('coalesce')
+
+        head_id = self.dispatch(config, gift_name='Galaxy')['queue_item_id']
+        result = self.dispatch(config, gift_name='Galaxy')
+
+        self.assertEqual(result['coalesced_into'], head_id)
+        self.assertEqual(EventQueue.objects.get(id=head_id).batch_size, 2)
+        # Otro regalo no tiene cabeza propia: se descarta
+        self.assertEqual(self.dispatch(config, gift_name='Lion')['status'], 'rate_limited')
+
+        # El worker procesa la cabeza con su miembro y los cierra a los dos
+        worker = self.make_worker()
+        worker._process_event_safe(self.claim(worker))
+        worker.status_buffer.flush()
+
+        self.assertEqual([len(batch) for batch in worker.service_instance.batches], [2])
+        self.assertEqual(EventQueue.objects.get(id=head_id).status, 'completed')
+        self.assertEqual(EventQueue.objects.get(batch_parent_id=head_id).status, 'completed')
+
+    def test_coalesce_drops_when_head_was_taken(self):
+        config = self.rate_limited_config('coalesce')
+        head_id = self.dispatch(config, gift_name='Galaxy')['queue_item_id']
+        EventQueue.objects.filter(id=head_id).update(status='processing')
+
+        self.assertEqual(self.dispatch(config, gift_name='Galaxy')['status'], 'rate_limited')
+        self.assertFalse(EventQueue.objects.filter(batch_parent_id=head_id, status='coalesced').exists())
+
+    def test_defer_enqueues_with_available_at(self):
+        config = self.rate_limited_config('defer')
+
+        self.dispatch(config, gift_name='Galaxy')
+        before = timezone.now()
+        result = self.dispatch(config, gift_name='Galaxy')
+
+        self.assertEqual(result['status'], 'enqueued')
+        self.assertAlmostEqual(result['deferred_seconds'], 2.0, delta=0.1)
+        item = EventQueue.objects.get(id=result['queue_item_id'])
+        self.assertAlmostEqual((item.available_at - before).total_seconds(), 2.0, delta=0.2)
+
+    def test_defer_beyond_ttl_drops(self):
+        config = self.rate_limited_config('defer', max_age_seconds=1)
 
-# Create your tests here.
+        self.dispatch(config, gift_name='Galaxy')
+        self.assertEqual(self.dispatch(config, gift_name='Galaxy')['status'], 'rate_limited')
@@ -0,0 +1,152 @@
+"""
+Tracing de latencia end-to-end: desde que TikTok envía el evento hasta que
+el overlay lo renderiza
+
+Cada LiveEvent tiene un trace_id. A lo largo del pipeline se acumulan
+timestamps (epoch en segundos) en un dict de traza:
+
+    received_at   -> TikTokEventCapture recibe el evento (LiveEvent.timestamp)
+    persisted_at  -> se guarda el LiveEvent (LiveEvent.created_at)
+    enqueued_at   -> EventDispatcher crea el EventQueue (EventQueue.created_at)
+    claimed_at    -> el worker toma el item de la cola
+    sent_at       -> send_dinochrome_event / send_tugofwar_event
+    delivered_at  -> el endpoint SSE lo envía al browser
+    rendered_at   -> llega el ack del browser (después del siguiente frame)
+    completed_at  -> process_event terminó (solo trazas del worker)
+
+Las duraciones por etapa se guardan en ring buffers por (servicio, tipo de
+evento) y se resumen como p50/p95/p99. El worker y el servidor web son
+procesos distintos: cada uno tiene su propio recorder (el web recibe las
+trazas completas vía ack, el worker registra las que terminan en el
+servicio, p.ej. TTS o música).
+"""
+
+import contextvars
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Any, Dict, Optional
+
+from .metrics import summarize
+
+
+# (etapa, timestamp inicial, timestamp final)
+STAGES = (
+    ('persist', 'received_at', 'persisted_at'),
+    ('dispatch', 'persisted_at', 'enqueued_at'),
+    ('queue_wait', 'enqueued_at', 'claimed_at'),
+    ('process', 'claimed_at', 'sent_at'),
+    ('deliver', 'sent_at', 'delivered_at'),
+    ('render', 'delivered_at', 'rendered_at'),
+)
+
+# Último timestamp disponible de la traza, para la duración total
+END_MARKS = ('rendered_at', 'delivered_at', 'sent_at', 'completed_at')
+
+
+def stage_durations(trace: Dict[str, Any]) -> Dict[str, float]:
+    """Calcula las duraciones (segundos) de las etapas presentes en la traza"""
+    durations = {}
+    for stage, start, end in STAGES:
+        if trace.get(start) is not None and trace.get(end) is not None:
+            durations[stage] = max(0.0, trace[end] - trace[start])
+
+    if trace.get('claimed_at') is not None and trace.get('completed_at') is not None:
+        durations['service'] = max(0.0, trace['completed_at'] - trace['claimed_at'])
+
+    received = trace.get('received_at')
+    end = next((trace[mark] for mark in END_MARKS if trace.get(mark) is not None), None)
+    if received is not None and end is not None:
+        durations['total'] = max(0.0, end - received)
+    return durations
+
+
+class TraceRecorder:
+    """Ring buffer de duraciones por etapa, por (servicio, tipo de evento)"""
+
+    def __init__(self, maxlen: int = 1000):
+        self.maxlen = maxlen
+        self._lock = threading.Lock()
+        self._samples = defaultdict(lambda: deque(maxlen=self.maxlen))
+
+    def record(self, trace: Dict[str, Any]) -> Dict[str, float]:
+        """Registra una traza y retorna sus duraciones por etapa"""
+        durations = stage_durations(trace)
+        if durations:
+            key = (trace.get('service') or 'unknown', trace.get('event_type') or 'unknown')
+            with self._lock:
+                self._samples[key].append(durations)
+        return durations
+
+    def summary(self) -> list:
+        """Percentiles por (servicio, tipo de evento) y etapa"""
+        with self._lock:
+            snapshot = {key: list(samples) for key, samples in self._samples.items()}
+
+        result = []
+        for (service, event_type), samples in sorted(snapshot.items()):
+            stages = defaultdict(list)
+            for durations in samples:
+                for stage, value in durations.items():
+                    stages[stage].append(value)
+            result.append({
+                'service': service,
+                'event_type': event_type,
+                'count': len(samples),
+                'stages': {stage: summarize(values) for stage, values in stages.items()},
+            })
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._samples.clear()
+
+
+# Recorder del proceso actual (worker o servidor web)
+recorder = TraceRecorder()
+
+# Traza del item que está procesando el thread (o la tarea asyncio) actual
+_current = contextvars.ContextVar('queue_trace', default=None)
+
+
+def start_trace(queue_item, service_name: str) -> Dict[str, Any]:
+    """Crea la traza de un item de la cola al ser tomado por el worker"""
+    live_event = queue_item.live_event
+    return {
+        'trace_id': live_event.trace_id,
+        'service': service_name,
+        'event_type': live_event.event_type,
+        'received_at': live_event.timestamp.timestamp(),
+        'persisted_at': live_event.created_at.timestamp(),
+        'enqueued_at': queue_item.created_at.timestamp(),
+        'claimed_at': time.time(),
+    }
+
+
+def set_current(trace: Optional[Dict[str, Any]]):
+    """Asocia una traza al thread o tarea actual (la usan los send_* de los overlays)"""
+    _current.set(trace)
+
+
+def get_current() -> Optional[Dict[str, Any]]:
+    return _current.get()
+
+
+def attach_to_payload(event: Dict[str, Any]):
+    """
+    Agrega la traza actual al payload SSE de un overlay
+
+    Solo el primer envío de cada item lleva la traza: mide cuándo aparece
+    algo en pantalla, no cada actualización posterior.
+    """
+    trace = get_current()
+    if not trace or trace.get('sent_at') is not None:
+        return
+    trace['sent_at'] = time.time()
+    event['trace'] = dict(trace)
+
+
+def mark_delivered(event: Dict[str, Any]):
+    """Marca el momento en que el SSE envía el evento al browser"""
+    if isinstance(event.get('trace'), dict):
+        event['trace']['delivered_at'] = time.time()
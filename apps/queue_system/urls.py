@@ -0,0 +1,13 @@
+from django.urls import path
+from . import views
+
+app_name = 'queue_system'
+
+urlpatterns = [
+    # Métricas Prometheus del proceso web
+    path('metrics/', views.metrics_view, name='metrics'),
+
+    # Tracing de latencia end-to-end
+    path('traces/', views.traces_summary, name='traces_summary'),
+    path('traces/ack/', views.traces_ack, name='traces_ack'),
+]
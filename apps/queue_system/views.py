@@ -1,3 +1,55 @@
-from django.shortcuts import render
+"""
+Views del sistema de colas
 
-# Create your views here.
+- traces_ack: el overlay confirma que renderizó un evento trazado
+- traces_summary: percentiles de latencia por servicio, tipo de evento y etapa
+- metrics_view: métricas del proceso web en formato Prometheus
+"""
+
+import json
+import time
+from django.http import HttpResponse, JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
+from . import metrics, tracing
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def traces_ack(request):
+    """
+    Recibe el ack de render del browser con la traza del evento
+
+    El browser lo envía en el siguiente frame después de mostrar el evento,
+    así que rendered_at incluye el render y el viaje de vuelta del ack.
+    """
+    try:
+        trace = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({'success': False, 'error': 'JSON inválido'}, status=400)
+
+    if not isinstance(trace, dict) or not trace.get('trace_id'):
+        return JsonResponse({'success': False, 'error': 'Falta trace_id'}, status=400)
+
+    trace['rendered_at'] = time.time()
+    durations = tracing.recorder.record(trace)
+    return JsonResponse({'success': True, 'stages': durations})
+
+
+@require_http_methods(["GET"])
+def traces_summary(request):
+    """Percentiles (segundos) de las trazas recibidas por este proceso"""
+    return JsonResponse({
+        'stages': [stage for stage, _, _ in tracing.STAGES] + ['total'],
+        'traces': tracing.recorder.summary(),
+    })
+
+
+@require_http_methods(["GET"])
+def metrics_view(request):
+    """
+    Métricas del proceso web (dispatch del simulador, etc.)
+
+    Los workers y la captura exponen las suyas en start_event_system --metrics-port.
+    """
+    return HttpResponse(metrics.registry.render(), content_type=metrics.CONTENT_TYPE)
@@ -2,17 +2,73 @@
 ServiceWorker - Worker que procesa la cola de un servicio
 
 Este módulo se encarga de:
-1. Sacar eventos de la cola por orden de prioridad
+1. Sacar eventos de la cola por orden de prioridad (con aging por tiempo de espera)
 2. Procesarlos usando la clase del servicio
 3. Manejar modo async vs sync
 4. Marcar eventos como completados/fallidos
+5. Expirar eventos que esperaron más que su max_age_seconds
+6. Renovar el lease de los items en proceso y recuperar los de workers caídos
+7. Reintentar eventos fallidos con backoff exponencial (dead-letter al agotar intentos)
+
+Los servicios que implementan aprocess_event usan AsyncServiceWorker: los
+items son tareas en un event loop propio del worker (create_worker elige).
 """
 
+import asyncio
+import functools
+import logging
+import os
+import random
+import socket
 import threading
 import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
 from importlib import import_module
 from django.db import close_old_connections
+from django.db.models import F, Q
+from django.utils import timezone
 from .models import Service, EventQueue
+from .status_buffer import StatusBuffer
+from . import metrics, tracing
+
+logger = logging.getLogger(__name__)
+
+# last_error de los items que el reaper recupera
+LEASE_EXPIRED_ERROR = 'Lease vencido (worker caído o colgado)'
+
+
+def load_service_class(service_class: str):
+    """
+    Importa la clase de un servicio a partir de su ruta completa
+
+    Ej: "apps.obs_overlay.services.OBSOverlayService"
+    """
+    module_path, class_name = service_class.rsplit('.', 1)
+    return getattr(import_module(module_path), class_name)
+
+
+def create_worker(service: Service, verbose: bool = True) -> 'ServiceWorker':
+    """Worker adecuado para el servicio: AsyncServiceWorker si implementa aprocess_event"""
+    worker_class = ServiceWorker
+    try:
+        if load_service_class(service.service_class).supports_async():
+            worker_class = AsyncServiceWorker
+    except (ImportError, AttributeError, ValueError):
+        pass  # start() reporta el error al cargar el servicio
+    return worker_class(service, verbose=verbose)
+
+
+def _pid_alive(pid: int) -> bool:
+    """Si existe un proceso con ese pid en esta máquina (solo POSIX)"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
 
 
 class ServiceWorker:
@@ -20,12 +76,36 @@ class ServiceWorker:
     Worker que procesa la cola de un servicio específico
 
     Funcionalidad:
-    - Obtiene eventos de la cola ordenados por prioridad
+    - Obtiene eventos de la cola ordenados por prioridad efectiva (con aging)
     - Procesa eventos SYNC (espera) o ASYNC (paralelo)
     - Maneja errores y marca estados
     - Ejecuta hooks del servicio (on_start, on_stop)
+    - Marca como expirados en bloque los items pendientes con TTL vencido
+    - Toma items ASYNC en lotes cuando la cola está profunda y agrupa las
+      escrituras de estado final (StatusBuffer)
+    - Cada claim lleva un lease (worker_id + lease_expires_at) que un thread
+      de heartbeat renueva; el mismo thread devuelve a la cola los items con
+      lease vencido (o los pasa a 'dead' tras Service.max_attempts)
+    - Un fallo no bloquea la cola: el item vuelve a 'pending' con available_at
+      en el futuro (backoff exponencial) hasta agotar Service.max_attempts
     """
 
+    # Cada cuánto barrer items expirados (segundos)
+    EXPIRY_SWEEP_INTERVAL = 0.5
+
+    # Máximo de items tomados por claim (solo ASYNC; crece mientras la cola esté llena)
+    CLAIM_BATCH_MAX = 8
+
+    # Cada cuánto se vuelcan los estados completed/failed a la DB (segundos)
+    STATUS_FLUSH_INTERVAL = 0.25
+
+    # Lease de los items en proceso: se renueva cada HEARTBEAT_INTERVAL segundos
+    LEASE_SECONDS = 30
+    HEARTBEAT_INTERVAL = 5
+
+    # Tope del backoff entre reintentos (segundos)
+    RETRY_MAX_DELAY = 60
+
     def __init__(self, service: Service, verbose: bool = True):
         """
         Inicializa el worker
@@ -40,6 +120,16 @@ class ServiceWorker:
         self.running = False
         self.thread = None
         self.async_threads = []  # Track async threads
+        self.expired_count = 0
+        self._last_expiry_sweep = 0.0
+        self._claim_size = 1
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{service.slug}:{uuid.uuid4().hex[:6]}"
+        self.status_buffer = StatusBuffer(self.worker_id, flush_interval=self.STATUS_FLUSH_INTERVAL)
+        self.heartbeat_thread = None
+        self._stopped = threading.Event()
+        self._inflight = set()  # IDs con lease de este worker
+        self._inflight_lock = threading.Lock()
+        self.reaped_count = 0
 
     def _load_service_instance(self):
         """
@@ -53,18 +143,7 @@ class ServiceWorker:
             AttributeError: Si la clase no existe en el módulo
         """
         try:
-            # Separar module_path y class_name
-            # Ej: "apps.obs_overlay.services.OBSOverlayService"
-            module_path, class_name = self.service.service_class.rsplit('.', 1)
-
-            # Importar el módulo
-            module = import_module(module_path)
-
-            # Obtener la clase
-            service_class = getattr(module, class_name)
-
-            # Instanciar
-            return service_class()
+            return load_service_class(self.service.service_class)()
 
         except (ImportError, AttributeError) as e:
             self._log(f"❌ Error cargando servicio {self.service.name}: {e}", force=True)
@@ -84,8 +163,15 @@ class ServiceWorker:
             # Ejecutar hook on_start
             self.service_instance.on_start()
 
+            # Recuperar lo que dejaron en 'processing' workers caídos
+            self._recover_orphans()
+
             # Iniciar thread
             self.running = True
+            self._stopped.clear()
+            self.status_buffer.start()
+            self.heartbeat_thread = threading.Thread(target=self._heartbeat_loop, daemon=True)
+            self.heartbeat_thread.start()
             self.thread = threading.Thread(target=self._run_loop, daemon=True)
             self.thread.start()
 
@@ -114,6 +200,12 @@ class ServiceWorker:
             if thread.is_alive():
                 thread.join(timeout=2)
 
+        # Volcar estados pendientes de escribir y soltar el heartbeat
+        self.status_buffer.stop()
+        self._stopped.set()
+        if self.heartbeat_thread and self.heartbeat_thread.is_alive():
+            self.heartbeat_thread.join(timeout=2)
+
         # Ejecutar hook on_stop
         if self.service_instance:
             self.service_instance.on_stop()
@@ -129,133 +221,431 @@ class ServiceWorker:
                 # Cerrar conexiones viejas de Django
                 close_old_connections()
 
-                # Obtener siguiente evento de la cola
-                queue_item = self._get_next_event()
+                # Obtener siguientes eventos de la cola (ya marcados como processing)
+                queue_items = self._claim_next_events()
 
-                if not queue_item:
+                if not queue_items:
                     # No hay eventos, esperar un poco
                     time.sleep(0.1)
                     continue
 
-                # LOG: Evento obtenido de la cola
-                self._log(
-                    f"📥 [{self.service.name}] Obtenido de cola: {queue_item.live_event.event_type} "
-                    f"(P:{queue_item.priority}, ID:{queue_item.id})"
-                )
-
-                # Marcar como procesando
-                queue_item.mark_processing()
-
-                # Procesar según modo (async o sync)
-                if queue_item.is_async:
-                    # ASYNC: Procesar en thread separado (no esperar)
-                    self._log(f"🔀 [{self.service.name}] Procesando ASYNC (ID:{queue_item.id})")
-                    thread = threading.Thread(
-                        target=self._process_event_safe,
-                        args=(queue_item,),
-                        daemon=True
-                    )
-                    thread.start()
-                    self.async_threads.append(thread)
-
-                    # Limpiar threads terminados
-                    self.async_threads = [t for t in self.async_threads if t.is_alive()]
-
-                else:
-                    # SYNC: Procesar y esperar
-                    self._log(f"⏳ [{self.service.name}] Procesando SYNC (ID:{queue_item.id})")
-                    self._process_event_safe(queue_item)
+                for queue_item in queue_items:
+                    self._start_item(queue_item)
 
             except Exception as e:
-                self._log(f"❌ Error en loop: {e}", force=True)
+                self._log("❌ Error en loop: %s", e, force=True)
                 time.sleep(1)  # Esperar antes de reintentar
 
         self._log(f"🛑 Loop terminado para {self.service.name}")
 
-    def _get_next_event(self):
+    def _begin_item(self, queue_item: EventQueue) -> dict:
+        """Log y traza de un item recién tomado de la cola"""
+        # LOG: Evento obtenido de la cola
+        self._log(
+            "📥 [%s] Obtenido de cola: %s (P:%s, ID:%s)",
+            self.service.name, queue_item.live_event.event_type, queue_item.priority, queue_item.id
+        )
+
+        # Inicio de la etapa del servicio en la traza
+        trace = tracing.start_trace(queue_item, self.service.name)
+        metrics.CLAIM_WAIT_SECONDS.observe(
+            trace['claimed_at'] - trace['enqueued_at'], service=self.service.name
+        )
+        return trace
+
+    def _start_item(self, queue_item: EventQueue):
+        """Arranca el procesamiento de un item ya tomado (async en thread, sync en línea)"""
+        trace = self._begin_item(queue_item)
+
+        # Procesar según modo (async o sync)
+        if queue_item.is_async:
+            # ASYNC: Procesar en thread separado (no esperar)
+            self._log("🔀 [%s] Procesando ASYNC (ID:%s)", self.service.name, queue_item.id)
+            thread = threading.Thread(
+                target=self._process_event_safe,
+                args=(queue_item, trace),
+                daemon=True
+            )
+            thread.start()
+            self.async_threads.append(thread)
+
+            # Limpiar threads terminados
+            self.async_threads = [t for t in self.async_threads if t.is_alive()]
+
+        else:
+            # SYNC: Procesar y esperar
+            self._log("⏳ [%s] Procesando SYNC (ID:%s)", self.service.name, queue_item.id)
+            self._process_event_safe(queue_item, trace)
+
+    def _expire_stale(self, now):
+        """
+        Marca como expirados todos los items pendientes con expires_at vencido
+
+        Un solo UPDATE por barrido: tras un burst el backlog viejo se vacía de
+        golpe en vez de reproducirse reacciones con minutos de atraso.
         """
-        Obtiene el siguiente evento de la cola
+        if time.monotonic() - self._last_expiry_sweep < self.EXPIRY_SWEEP_INTERVAL:
+            return
+        self._last_expiry_sweep = time.monotonic()
+
+        expired = EventQueue.objects.filter(
+            service=self.service,
+            status='pending',
+            expires_at__lte=now
+        ).update(status='expired', processed_at=now)
+
+        if expired:
+            # Los eventos agrupados en lotes expirados corren la misma suerte
+            expired += EventQueue.objects.filter(
+                service=self.service,
+                status='coalesced',
+                batch_parent__status='expired'
+            ).update(status='expired', processed_at=now)
+            self.expired_count += expired
+            metrics.EVENTS_EXPIRED.inc(expired, service=self.service.name)
+            self._log("⌛ [%s] %s evento(s) expirados sin procesar", self.service.name, expired)
+
+    def _claim_next_events(self, limit: int = None):
+        """
+        Toma los siguientes eventos de la cola (saltando los expirados)
+
+        Con la cola profunda toma varios items ASYNC de una vez (el tamaño del
+        claim se duplica mientras la consulta devuelva lotes completos, hasta
+        CLAIM_BATCH_MAX) y los marca como processing con un solo UPDATE. Un item
+        SYNC corta el lote: si no, los eventos que lleguen mientras se procesa
+        quedarían detrás de items ya reservados.
+
+        Args:
+            limit: Máximo de items a tomar además del tamaño adaptativo (lugares libres del worker async)
 
         Returns:
-            EventQueue o None si no hay eventos
+            list: Items de EventQueue tomados (vacía si no hay eventos)
         """
-        return EventQueue.objects.filter(
+        now = timezone.now()
+        self._expire_stale(now)
+
+        candidates = list(EventQueue.objects.filter(
+            Q(expires_at__isnull=True) | Q(expires_at__gt=now),
+            Q(available_at__isnull=True) | Q(available_at__lte=now),
             service=self.service,
             status='pending'
         ).select_related('live_event', 'session').order_by(
-            '-priority',  # Mayor prioridad primero
-            'created_at'  # Más viejo primero (FIFO dentro de misma prioridad)
-        ).first()
+            'sort_key',  # Mayor prioridad efectiva primero (prioridad + aging por espera)
+            'id'
+        )[:min(self._claim_size, limit or self._claim_size)])
+
+        if not candidates:
+            self._claim_size = 1
+            return []
+
+        if len(candidates) == self._claim_size:
+            self._claim_size = min(self._claim_size * 2, self.CLAIM_BATCH_MAX)
+        else:
+            self._claim_size = max(1, len(candidates))
+
+        batch = [candidates[0]]
+        if candidates[0].is_async:
+            for item in candidates[1:]:
+                if not item.is_async:
+                    break
+                batch.append(item)
+
+        ids = [item.id for item in batch]
+        claimed = EventQueue.objects.filter(id__in=ids, status='pending').update(
+            status='processing',
+            worker_id=self.worker_id,
+            lease_expires_at=now + timedelta(seconds=self.LEASE_SECONDS),
+            attempts=F('attempts') + 1
+        )
+        if claimed < len(ids):
+            # Alguno fue descartado (o tomado por otro worker) mientras tanto
+            still_ours = set(EventQueue.objects.filter(
+                id__in=ids, status='processing', worker_id=self.worker_id
+            ).values_list('id', flat=True))
+            batch = [item for item in batch if item.id in still_ours]
+
+        with self._inflight_lock:
+            self._inflight.update(item.id for item in batch)
+        for item in batch:
+            item.status = 'processing'
+            item.worker_id = self.worker_id
+            item.attempts += 1
+        return batch
+
+    def _heartbeat_loop(self):
+        """Renueva los leases propios y recupera los vencidos de otros workers"""
+        while not self._stopped.wait(self.HEARTBEAT_INTERVAL):
+            try:
+                close_old_connections()
+                self._renew_leases()
+                self._reap_expired_leases()
+            except Exception as e:
+                self._log("❌ Error en heartbeat: %s", e, force=True)
+
+    def _renew_leases(self):
+        """Extiende el lease de los items que este worker está procesando"""
+        with self._inflight_lock:
+            ids = list(self._inflight)
+        if not ids:
+            return 0
+        return EventQueue.objects.filter(
+            id__in=ids, status='processing', worker_id=self.worker_id
+        ).update(lease_expires_at=timezone.now() + timedelta(seconds=self.LEASE_SECONDS))
 
-    def _process_event_safe(self, queue_item: EventQueue):
+    def _reap_expired_leases(self):
+        """
+        Devuelve a 'pending' los items con lease vencido, o los pasa a 'dead'
+        si ya se tomaron Service.max_attempts veces
+
+        Los UPDATE repiten la condición del lease: si el dueño lo renovó entre
+        la consulta y el update, el item no se toca (sin doble procesamiento).
+        """
+        now = timezone.now()
+        lease_expired = Q(lease_expires_at__lt=now) | Q(lease_expires_at__isnull=True)
+        expired = list(EventQueue.objects.filter(
+            lease_expired,
+            service=self.service,
+            status='processing',
+            batch_parent__isnull=True
+        ).values_list('id', 'attempts'))
+        if not expired:
+            return 0
+
+        to_fail = [item_id for item_id, attempts in expired if attempts >= self.service.max_attempts]
+        to_retry = [item_id for item_id, attempts in expired if attempts < self.service.max_attempts]
+
+        requeued = failed = 0
+        if to_retry:
+            requeued = EventQueue.objects.filter(lease_expired, id__in=to_retry, status='processing').update(
+                status='pending', lease_expires_at=None, last_error=LEASE_EXPIRED_ERROR
+            )
+            EventQueue.objects.filter(batch_parent_id__in=to_retry, status='processing').update(status='coalesced')
+        if to_fail:
+            failed = EventQueue.objects.filter(lease_expired, id__in=to_fail, status='processing').update(
+                status='dead', processed_at=now, last_error=LEASE_EXPIRED_ERROR
+            )
+            EventQueue.objects.filter(
+                batch_parent_id__in=to_fail, status__in=['coalesced', 'processing']
+            ).update(status='dead', processed_at=now)
+
+        if requeued:
+            metrics.LEASES_REAPED.inc(requeued, service=self.service.name, outcome='requeued')
+        if failed:
+            metrics.LEASES_REAPED.inc(failed, service=self.service.name, outcome='dead')
+        self.reaped_count += requeued + failed
+        if requeued or failed:
+            self._log(
+                "♻️  [%s] Leases vencidos: %s devueltos a la cola, %s a dead-letter (max_attempts=%s)",
+                self.service.name, requeued, failed, self.service.max_attempts, force=True
+            )
+        return requeued + failed
+
+    def _recover_orphans(self):
+        """
+        Al arrancar, vence los leases de workers de esta máquina cuyo proceso
+        ya no existe y los recupera, sin esperar LEASE_SECONDS
+        """
+        if os.name == 'posix':
+            host_prefix = f"{socket.gethostname()}:"
+            orphans = []
+            rows = EventQueue.objects.filter(
+                service=self.service,
+                status='processing',
+                worker_id__startswith=host_prefix
+            ).values_list('id', 'worker_id')
+            for item_id, worker_id in rows:
+                try:
+                    pid = int(worker_id.split(':')[1])
+                except (IndexError, ValueError):
+                    continue
+                if pid != os.getpid() and not _pid_alive(pid):
+                    orphans.append(item_id)
+
+            if orphans:
+                EventQueue.objects.filter(id__in=orphans, status='processing').update(lease_expires_at=timezone.now())
+
+        self._reap_expired_leases()
+
+    def _claim_batch(self, queue_item: EventQueue):
+        """
+        Toma los eventos agrupados en el lote de queue_item
+
+        Primero los pasa a 'processing' con un UPDATE (así el dispatcher ya no
+        puede liberarlos como items sueltos) y después los lee.
+
+        Returns:
+            list: LiveEvents del lote, empezando por el de la cabeza
+        """
+        live_events = [queue_item.live_event]
+        if not queue_item.coalesce_key:
+            return live_events
+
+        claimed = EventQueue.objects.filter(
+            batch_parent=queue_item, status='coalesced'
+        ).update(status='processing')
+        if claimed:
+            members = EventQueue.objects.filter(
+                batch_parent=queue_item, status='processing'
+            ).select_related('live_event').order_by('id')
+            live_events.extend(member.live_event for member in members)
+        return live_events
+
+    def _process_event_safe(self, queue_item: EventQueue, trace: dict = None):
         """
         Procesa un evento con manejo de errores
 
         Args:
             queue_item: El item de la cola a procesar
+            trace: Traza de latencia del item (ver tracing.py)
         """
         start_time = time.time()
+        live_event, username, extra_info = self._describe(queue_item)
+
+        metrics.PROCESSING_INFLIGHT.inc(service=self.service.name)
+        try:
+            batch = self._prepare_item(queue_item)
+
+            # Procesar el evento (los send_* de overlays toman la traza del thread)
+            tracing.set_current(trace)
+            try:
+                if len(batch) > 1:
+                    success = self.service_instance.process_batch(batch, queue_item)
+                else:
+                    success = self.service_instance.process_event(live_event, queue_item)
+            finally:
+                tracing.set_current(None)
+
+            self._finish_item(queue_item, trace, batch, success, start_time, extra_info, username)
+
+        except Exception as e:
+            self._fail_item(queue_item, e, start_time, extra_info, username)
+        finally:
+            self._release_item(queue_item)
+
+    def _describe(self, queue_item: EventQueue):
+        """Evento, usuario y detalle (regalo) de un item para los logs"""
         live_event = queue_item.live_event
-        event_type = live_event.event_type
         username = live_event.user_nickname or live_event.user_unique_id or 'Unknown'
 
         # Info adicional para GiftEvent
         extra_info = ""
-        if event_type == 'GiftEvent':
+        if live_event.event_type == 'GiftEvent':
             gift_name = live_event.event_data.get('gift', {}).get('name', '')
             extra_info = f"[{gift_name}] "
+        return live_event, username, extra_info
 
-        try:
-            # Cerrar conexiones viejas (importante en threads)
-            close_old_connections()
-
-            # Hook: antes de procesar
-            self.service_instance.on_event_received(live_event, queue_item)
-
-            # Procesar el evento
-            success = self.service_instance.process_event(live_event, queue_item)
+    def _prepare_item(self, queue_item: EventQueue):
+        """
+        Hook on_event_received y carga del lote (coalescing)
 
-            # Calcular tiempo
-            elapsed = (time.time() - start_time) * 1000
+        Returns:
+            list: LiveEvents a procesar (más de uno si es un lote agrupado)
+        """
+        # Cerrar conexiones viejas (importante en threads)
+        close_old_connections()
 
-            # Marcar resultado
-            if success:
-                queue_item.mark_completed()
-                self._log(
-                    f"✅ [{self.service.name}] {event_type}{extra_info}de @{username} "
-                    f"(P:{queue_item.priority}) completado en {elapsed:.0f}ms"
-                )
-            else:
-                queue_item.mark_failed()
-                self._log(
-                    f"❌ [{self.service.name}] {event_type}{extra_info}de @{username} "
-                    f"(P:{queue_item.priority}) falló en {elapsed:.0f}ms",
-                    force=True
-                )
+        # Hook: antes de procesar
+        self.service_instance.on_event_received(queue_item.live_event, queue_item)
 
-            # Hook: después de procesar
-            self.service_instance.on_event_processed(live_event, queue_item, success)
+        # Lote agrupado por coalescing: un solo process_batch para todos
+        return self._claim_batch(queue_item)
 
-        except Exception as e:
-            elapsed = (time.time() - start_time) * 1000
-            # Error crítico, marcar como fallido
-            queue_item.mark_failed()
+    def _finish_item(self, queue_item, trace, batch, success, start_time, extra_info, username):
+        """Registra el resultado de un item procesado (traza, métricas, estado y hook)"""
+        live_event = queue_item.live_event
+        event_type = live_event.event_type
+        if len(batch) > 1:
+            extra_info += f"(lote x{len(batch)}) "
+
+        if trace:
+            trace['completed_at'] = time.time()
+            tracing.recorder.record(trace)
+
+        # Calcular tiempo
+        elapsed = (time.time() - start_time) * 1000
+        metrics.PROCESSING_SECONDS.observe(
+            elapsed / 1000, service=self.service.name, result='completed' if success else 'failed'
+        )
+
+        # Marcar resultado
+        if success:
+            self.status_buffer.add(queue_item, 'completed', has_batch=len(batch) > 1)
+            self._log(
+                "✅ [%s] %s%sde @%s (P:%s) completado en %.0fms",
+                self.service.name, event_type, extra_info, username, queue_item.priority, elapsed
+            )
+        else:
+            outcome = self._retry_or_bury(queue_item, has_batch=len(batch) > 1, error='process_event retornó False')
             self._log(
-                f"💥 [{self.service.name}] Error procesando {event_type}{extra_info}"
-                f"de @{username}: {e} ({elapsed:.0f}ms)",
+                "❌ [%s] %s%sde @%s (P:%s) falló en %.0fms (intento %s/%s, %s)",
+                self.service.name, event_type, extra_info, username, queue_item.priority, elapsed,
+                queue_item.attempts, self.service.max_attempts, outcome,
                 force=True
             )
 
-    def _log(self, message: str, force: bool = False):
+        # Hook: después de procesar
+        self.service_instance.on_event_processed(live_event, queue_item, success)
+
+    def _fail_item(self, queue_item, error, start_time, extra_info, username):
+        """Error crítico procesando un item: reintentar (con su lote si lo tiene) o dead-letter"""
+        elapsed = (time.time() - start_time) * 1000
+        metrics.PROCESSING_SECONDS.observe(elapsed / 1000, service=self.service.name, result='error')
+        outcome = self._retry_or_bury(
+            queue_item, has_batch=bool(queue_item.coalesce_key), error=f'{type(error).__name__}: {error}'
+        )
+        self._log(
+            "💥 [%s] Error procesando %s%sde @%s: %s (%.0fms, intento %s/%s, %s)",
+            self.service.name, queue_item.live_event.event_type, extra_info, username, error, elapsed,
+            queue_item.attempts, self.service.max_attempts, outcome,
+            force=True
+        )
+
+    def _release_item(self, queue_item):
+        metrics.PROCESSING_INFLIGHT.dec(service=self.service.name)
+        with self._inflight_lock:
+            self._inflight.discard(queue_item.id)
+
+    def _retry_or_bury(self, queue_item: EventQueue, has_batch: bool = False, error: str = ''):
+        """
+        Decide qué pasa con un item fallido
+
+        Si le quedan intentos vuelve a 'pending' con available_at = ahora +
+        backoff (retry_backoff_seconds * 2^(intento-1), con jitter y tope
+        RETRY_MAX_DELAY); el worker sigue con el resto de la cola mientras
+        tanto. Si no, pasa a 'dead' para revisarlo/reencolarlo desde el admin.
+
+        Returns:
+            str: Descripción del resultado para el log
+        """
+        if queue_item.attempts < self.service.max_attempts:
+            delay = self.service.retry_backoff_seconds * (2 ** max(0, queue_item.attempts - 1))
+            delay = min(delay, self.RETRY_MAX_DELAY) * random.uniform(0.8, 1.2)
+            self.status_buffer.add(
+                queue_item, 'pending', has_batch=has_batch,
+                available_at=timezone.now() + timedelta(seconds=delay), error=error
+            )
+            metrics.RETRIES.inc(service=self.service.name, outcome='retry')
+            return f"reintento en {delay:.1f}s"
+
+        self.status_buffer.add(queue_item, 'dead', has_batch=has_batch, error=error)
+        metrics.RETRIES.inc(service=self.service.name, outcome='dead')
+        return "dead-letter"
+
+    def _log(self, message: str, *args, force: bool = False):
         """
-        Log helper
+        Log helper (formateo lazy: el mensaje solo se arma si el nivel está activo)
 
         Args:
-            message: Mensaje a imprimir
-            force: Si debe imprimir aunque verbose=False
+            message: Mensaje con placeholders estilo %
+            args: Valores para los placeholders
+            force: Si debe loguearse aunque verbose=False (errores, nivel WARNING)
         """
-        if self.verbose or force:
-            print(message)
+        if force:
+            level = logging.WARNING
+        else:
+            level = logging.INFO if self.verbose else logging.DEBUG
+        if logger.isEnabledFor(level):
+            logger.log(level, message, *args)
 
     def get_status(self):
         """
@@ -279,5 +669,112 @@ class ServiceWorker:
             'running': self.running,
             'pending': pending,
             'processing': processing,
+            'expired': self.expired_count,
+            'reaped': self.reaped_count,
             'async_threads': len([t for t in self.async_threads if t.is_alive()])
         }
+
+
+class AsyncServiceWorker(ServiceWorker):
+    """
+    Worker para servicios que implementan aprocess_event
+
+    Un solo thread corre un event loop: cada item ASYNC es una tarea, con
+    hasta Service.max_concurrency en vuelo (el claim pide solo los lugares
+    libres). Un item SYNC se espera antes de tomar el siguiente, igual que en
+    ServiceWorker. El claim, los hooks y la carga de lotes usan la BD, así que
+    corren en un pool chico de threads y no bloquean el loop. El lease, el
+    StatusBuffer y los reintentos son los del worker normal.
+    """
+
+    # Threads para las operaciones de BD del loop (claim, hooks, lotes)
+    DB_THREADS = 2
+
+    # Cuánto esperar a las tareas en vuelo al detener (el resto lo recupera el reaper)
+    STOP_GRACE_SECONDS = 4
+
+    def __init__(self, service: Service, verbose: bool = True):
+        super().__init__(service, verbose=verbose)
+        self.tasks = set()
+        self._db_executor = None
+
+    def _run_loop(self):
+        """Loop principal del worker: un event loop en el thread del worker"""
+        self._db_executor = ThreadPoolExecutor(self.DB_THREADS, thread_name_prefix=f'{self.service.slug}-db')
+        try:
+            asyncio.run(self._main())
+        finally:
+            self._db_executor.shutdown(wait=False)
+        self._log(f"🛑 Loop terminado para {self.service.name}")
+
+    async def _db(self, func, *args):
+        """Ejecuta una función con acceso a la BD fuera del loop"""
+        return await asyncio.get_running_loop().run_in_executor(self._db_executor, functools.partial(func, *args))
+
+    def _claim_for_loop(self, limit):
+        close_old_connections()
+        return self._claim_next_events(limit=limit)
+
+    async def _main(self):
+        self._log(
+            "🔄 Loop async iniciado para %s (hasta %s eventos en vuelo)",
+            self.service.name, self.service.max_concurrency
+        )
+
+        while self.running:
+            free = self.service.max_concurrency - len(self.tasks)
+            if free <= 0:
+                await asyncio.wait(self.tasks, return_when=asyncio.FIRST_COMPLETED)
+                continue
+
+            try:
+                queue_items = await self._db(self._claim_for_loop, free)
+            except Exception as e:
+                self._log("❌ Error en loop: %s", e, force=True)
+                await asyncio.sleep(1)
+                continue
+
+            if not queue_items:
+                await asyncio.sleep(0.1)
+                continue
+
+            for queue_item in queue_items:
+                trace = self._begin_item(queue_item)
+                if queue_item.is_async:
+                    task = asyncio.create_task(self._aprocess_event_safe(queue_item, trace))
+                    self.tasks.add(task)
+                    task.add_done_callback(self.tasks.discard)
+                else:
+                    self._log("⏳ [%s] Procesando SYNC (ID:%s)", self.service.name, queue_item.id)
+                    await self._aprocess_event_safe(queue_item, trace)
+
+        if self.tasks:
+            await asyncio.wait(self.tasks, timeout=self.STOP_GRACE_SECONDS)
+
+    async def _aprocess_event_safe(self, queue_item: EventQueue, trace: dict = None):
+        """Versión async de _process_event_safe (una tarea por item)"""
+        start_time = time.time()
+        live_event, username, extra_info = self._describe(queue_item)
+
+        metrics.PROCESSING_INFLIGHT.inc(service=self.service.name)
+        try:
+            batch = await self._db(self._prepare_item, queue_item)
+
+            # La traza vive en el contexto de esta tarea (no se mezcla con otras)
+            tracing.set_current(trace)
+            if len(batch) > 1:
+                success = await self.service_instance.aprocess_batch(batch, queue_item)
+            else:
+                success = await self.service_instance.aprocess_event(live_event, queue_item)
+
+            await self._db(self._finish_item, queue_item, trace, batch, success, start_time, extra_info, username)
+
+        except Exception as e:
+            self._fail_item(queue_item, e, start_time, extra_info, username)
+        finally:
+            self._release_item(queue_item)
+
+    def get_status(self):
+        status = super().get_status()
+        status['async_tasks'] = len(self.tasks)
+        return status
@@ -10,6 +10,7 @@ Concurrencia:
 - Rosa: maxima prioridad, secuencial entre si, interrumpe Rose
 """
 
+import logging
 import os
 import random
 import time
@@ -22,9 +23,14 @@ from apps.integrations.elevenlabs.client import ElevenLabsClient
 from apps.integrations.llm.client import LLMClient
 from apps.services.dinochrome.overlays.views import send_dinochrome_event, AVAILABLE_GIFS
 
+logger = logging.getLogger(__name__)
+
 
 class DinoChromeService(BaseQueueService):
 
+    # Regalos que muestran un GIF bailando
+    GIF_GIFT_KEYWORDS = ['ice cream', 'cone', 'awesome', "you're awesome", 'enjoy music', 'music']
+
     def __init__(self):
         self.session_start = None
         self.elevenlabs = ElevenLabsClient()
@@ -68,19 +74,38 @@ class DinoChromeService(BaseQueueService):
         except Exception:
             return False
 
+    def process_batch(self, live_events, queue_item):
+        """
+        Lote de regalos iguales (coalescing): los GIFs de toda la ráfaga viajan
+        en un solo mensaje SSE; el resto se procesa evento por evento.
+        """
+        first = live_events[0]
+        gift_name = first.event_data.get('gift', {}).get('name', '').lower()
+
+        if first.event_type == 'GiftEvent' and self._is_gif_gift(gift_name):
+            to_show = [ev for ev in live_events if ev.streak_status not in ('start', 'continue')]
+            if to_show:
+                self._send_dancing_gifs(to_show)
+            return True
+
+        return super().process_batch(live_events, queue_item)
+
+    def _is_gif_gift(self, gift_name):
+        return any(kw in gift_name for kw in self.GIF_GIFT_KEYWORDS)
+
     def _process_gift(self, live_event, queue_item):
         try:
             event_data = live_event.event_data
             gift_name = event_data.get('gift', {}).get('name', '').lower()
             username = live_event.user_nickname or live_event.user_unique_id or 'alguien'
 
-            print(f"[DINOCHROME] Gift: {gift_name} de @{username} (streak: {live_event.streak_status}, Queue ID: {queue_item.id})")
+            logger.info("[DINOCHROME] Gift: %s de @%s (streak: %s, Queue ID: %s)", gift_name, username, live_event.streak_status, queue_item.id)
 
             # === ICE CREAM / GIFs: paralelo, uno por racha (end/None) ===
-            if any(kw in gift_name for kw in ['ice cream', 'cone', 'awesome', "you're awesome", 'enjoy music', 'music']):
+            if self._is_gif_gift(gift_name):
                 if live_event.streak_status in ('start', 'continue'):
                     return True
-                self._send_dancing_gif(live_event)
+                self._send_dancing_gifs([live_event])
                 return True
 
             # === GG: paralelo, uno por racha (end/None) ===
@@ -105,11 +130,11 @@ class DinoChromeService(BaseQueueService):
                 return self._process_rose(username, event_data, queue_item)
 
             # Otro regalo
-            print(f"[DINOCHROME] Regalo '{gift_name}' de @{username}")
+            logger.info("[DINOCHROME] Regalo '%s' de @%s", gift_name, username)
             return True
 
         except Exception as e:
-            print(f"[DINOCHROME] Error critico: {e} (Queue ID: {queue_item.id})")
+            logger.error("[DINOCHROME] Error critico: %s (Queue ID: %s)", e, queue_item.id)
             import traceback
             traceback.print_exc()
             return False
@@ -126,7 +151,7 @@ class DinoChromeService(BaseQueueService):
             self.rosa_pending += 1
         self.rose_interrupted.set()
 
-        print(f"[DINOCHROME] ROSA de @{username} - prioridad maxima (pendientes: {self.rosa_pending})")
+        logger.info("[DINOCHROME] ROSA de @%s - prioridad maxima (pendientes: %s)", username, self.rosa_pending)
 
         # Generar LLM + TTS FUERA del lock (en paralelo mientras otra Rosa reproduce)
         ai_response, audio_file = self._generate_rosa_audio(username)
@@ -148,7 +173,7 @@ class DinoChromeService(BaseQueueService):
         # Si hay Rosa pendiente, no ejecutar Rose
         with self.rosa_pending_lock:
             if self.rosa_pending > 0:
-                print(f"[DINOCHROME] Rose de @{username} ABORTADA - Rosa pendiente")
+                logger.info("[DINOCHROME] Rose de @%s ABORTADA - Rosa pendiente", username)
                 return True
 
         # Adquirir lock TTS
@@ -156,7 +181,7 @@ class DinoChromeService(BaseQueueService):
             # Verificar de nuevo dentro del lock
             with self.rosa_pending_lock:
                 if self.rosa_pending > 0:
-                    print(f"[DINOCHROME] Rose de @{username} ABORTADA - Rosa pendiente")
+                    logger.info("[DINOCHROME] Rose de @%s ABORTADA - Rosa pendiente", username)
                     return True
 
             return self._handle_rose(username, event_data, queue_item)
@@ -183,7 +208,7 @@ class DinoChromeService(BaseQueueService):
 
             # Verificar interrupcion antes de reproducir
             if self.rose_interrupted.is_set():
-                print(f"[DINOCHROME] Rose INTERRUMPIDA por Rosa antes de audio")
+                logger.info("[DINOCHROME] Rose INTERRUMPIDA por Rosa antes de audio")
                 return True
 
             if audio_file:
@@ -194,15 +219,15 @@ class DinoChromeService(BaseQueueService):
                 elapsed = 0
                 while elapsed < duration:
                     if self.rose_interrupted.is_set():
-                        print(f"[DINOCHROME] Rose INTERRUMPIDA por Rosa durante audio")
+                        logger.info("[DINOCHROME] Rose INTERRUMPIDA por Rosa durante audio")
                         return True
                     time.sleep(min(0.5, duration - elapsed))
                     elapsed += 0.5
 
                 total_time = time.time() - rose_start
-                print(f"[DINOCHROME] Rose completado en {total_time:.1f}s")
+                logger.info("[DINOCHROME] Rose completado en %.1fs", total_time)
         except Exception as e:
-            print(f"[DINOCHROME] Error en correccion: {e}")
+            logger.error("[DINOCHROME] Error en correccion: %s", e)
 
         return True
 
@@ -231,9 +256,9 @@ class DinoChromeService(BaseQueueService):
                 temperature=0.9
             )
             llm_time = time.time() - llm_start
-            print(f"[DINOCHROME] LLM respondio en {llm_time:.2f}s: '{ai_response}'")
+            logger.info("[DINOCHROME] LLM respondio en %.2fs: '%s'", llm_time, ai_response)
         except Exception as e:
-            print(f"[DINOCHROME] Error LLM: {e}")
+            logger.error("[DINOCHROME] Error LLM: %s", e)
 
         if not ai_response:
             ai_response = f"Ay {username}, me reiniciaste el juego con esa rosa!"
@@ -248,7 +273,7 @@ class DinoChromeService(BaseQueueService):
                 wait=False
             )
         except Exception as e:
-            print(f"[DINOCHROME] Error ElevenLabs: {e}")
+            logger.error("[DINOCHROME] Error ElevenLabs: %s", e)
 
         return ai_response, audio_file
 
@@ -264,13 +289,13 @@ class DinoChromeService(BaseQueueService):
 
                 duration = self._get_audio_duration(audio_file)
                 if duration > 0:
-                    print(f"[DINOCHROME] Rosa: esperando {duration:.1f}s audio...")
+                    logger.info("[DINOCHROME] Rosa: esperando %.1fs audio...", duration)
                     time.sleep(duration)
 
                 total_time = time.time() - rosa_start
-                print(f"[DINOCHROME] Rosa de @{username} completado en {total_time:.1f}s")
+                logger.info("[DINOCHROME] Rosa de @%s completado en %.1fs", username, total_time)
         except Exception as e:
-            print(f"[DINOCHROME] Error reproduciendo Rosa: {e}")
+            logger.error("[DINOCHROME] Error reproduciendo Rosa: %s", e)
             return False
 
         return True
@@ -286,28 +311,31 @@ class DinoChromeService(BaseQueueService):
             )
             if audio_file:
                 self._send_tts_audio(audio_file)
-            print(f"[DINOCHROME] GG de @{username} - TTS enviado")
+            logger.info("[DINOCHROME] GG de @%s - TTS enviado", username)
         except Exception as e:
-            print(f"[DINOCHROME] Error en GG TTS: {e}")
+            logger.error("[DINOCHROME] Error en GG TTS: %s", e)
 
-    def _send_dancing_gif(self, live_event):
-        """Envia un GIF bailando con posicion aleatoria (ilimitado)"""
+    def _send_dancing_gifs(self, live_events):
+        """Envia GIFs bailando con posicion aleatoria (ilimitado), uno por evento en un solo mensaje"""
         try:
-            gif_index = self.gif_counter % len(AVAILABLE_GIFS)
-            gif_filename = AVAILABLE_GIFS[gif_index]
-            self.gif_counter += 1
-
-            username = live_event.user_nickname or live_event.user_unique_id or 'Anonimo'
-
-            send_dinochrome_event('dancing_gif', {
-                'username': username,
-                'gif_filename': gif_filename,
-            })
-
-            print(f"[DINOCHROME] GIF: {gif_filename} ({username})")
+            gifs = []
+            for live_event in live_events:
+                gif_filename = AVAILABLE_GIFS[self.gif_counter % len(AVAILABLE_GIFS)]
+                self.gif_counter += 1
+                gifs.append({
+                    'username': live_event.user_nickname or live_event.user_unique_id or 'Anonimo',
+                    'gif_filename': gif_filename,
+                })
+
+            if len(gifs) == 1:
+                send_dinochrome_event('dancing_gif', gifs[0])
+                logger.info("[DINOCHROME] GIF: %s (%s)", gifs[0]['gif_filename'], gifs[0]['username'])
+            else:
+                send_dinochrome_event('dancing_gif_batch', {'gifs': gifs})
+                logger.info("[DINOCHROME] GIFs: %s en lote", len(gifs))
 
         except Exception as e:
-            print(f"[DINOCHROME] Error enviando GIF: {e}")
+            logger.error("[DINOCHROME] Error enviando GIF: %s", e)
 
     def _get_audio_duration(self, audio_file):
         """Calcula la duracion de un archivo MP3 en segundos"""
@@ -317,7 +345,7 @@ class DinoChromeService(BaseQueueService):
             estimated_duration = file_size / (128000 / 8)
             return estimated_duration + 0.5
         except Exception as e:
-            print(f"[DINOCHROME] Error calculando duracion audio: {e}")
+            logger.error("[DINOCHROME] Error calculando duracion audio: %s", e)
             return 3.0
 
     def _send_tts_audio(self, audio_file):
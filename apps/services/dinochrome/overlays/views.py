@@ -9,6 +9,7 @@ from django.conf import settings
 import json
 import time
 from pathlib import Path
+from apps.queue_system import tracing
 
 
 # Directorio para eventos compartidos entre procesos
@@ -75,6 +76,7 @@ def dinochrome_events(request):
                             with open(event_file, 'r') as f:
                                 event_data = json.load(f)
 
+                            tracing.mark_delivered(event_data)
                             yield f"data: {json.dumps(event_data)}\n\n"
                             processed_files.add(event_file.name)
                             event_file.unlink()
@@ -110,7 +112,7 @@ def send_dinochrome_event(event_type, data):
     Envia un evento al frontend de DinoChrome via SSE
 
     Args:
-        event_type: 'rose_gift' | 'dancing_gif' | 'game_restart' | 'tts_audio'
+        event_type: 'rose_gift' | 'dancing_gif' | 'dancing_gif_batch' | 'game_restart' | 'tts_audio'
         data: dict con los datos del evento
     """
     try:
@@ -123,6 +125,8 @@ def send_dinochrome_event(event_type, data):
             'data': data,
             'timestamp': timestamp
         }
+        # Traza de latencia del item de cola que está procesando este thread
+        tracing.attach_to_payload(event)
 
         with open(filepath, 'w') as f:
             json.dump(event, f)
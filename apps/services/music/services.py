@@ -7,6 +7,7 @@ Este servicio maneja:
 - Reproduccion automatica continua como musica de fondo
 """
 
+import logging
 import os
 import random
 import threading
@@ -16,6 +17,8 @@ from django.conf import settings
 from apps.queue_system.base_service import BaseQueueService
 from apps.services.music.player import MusicPlayer
 
+logger = logging.getLogger(__name__)
+
 
 class MusicService(BaseQueueService):
     """
@@ -42,7 +45,7 @@ class MusicService(BaseQueueService):
 
         if not os.path.exists(self.MUSIC_DIR):
             os.makedirs(self.MUSIC_DIR, exist_ok=True)
-            print(f"[MUSIC] Directorio creado: {self.MUSIC_DIR}")
+            logger.info("[MUSIC] Directorio creado: %s", self.MUSIC_DIR)
             return
 
         for root, dirs, files in os.walk(self.MUSIC_DIR):
@@ -53,21 +56,21 @@ class MusicService(BaseQueueService):
         self.tracks.sort()
         random.shuffle(self.tracks)
         self.current_index = 0
-        print(f"[MUSIC] {len(self.tracks)} tracks cargados desde {self.MUSIC_DIR}")
+        logger.info("[MUSIC] %s tracks cargados desde %s", len(self.tracks), self.MUSIC_DIR)
 
     def on_start(self):
         """Se ejecuta al iniciar el worker"""
-        print("[MUSIC] Servicio de musica iniciado")
+        logger.info("[MUSIC] Servicio de musica iniciado")
         self._load_tracks()
 
         if self.tracks:
             self._start_background_music()
         else:
-            print("[MUSIC] No hay tracks en media/music/ - servicio en espera")
+            logger.info("[MUSIC] No hay tracks en media/music/ - servicio en espera")
 
     def on_stop(self):
         """Se ejecuta al detener el worker"""
-        print("[MUSIC] Deteniendo servicio de musica...")
+        logger.info("[MUSIC] Deteniendo servicio de musica...")
         self.background_running = False
         if self.background_thread:
             self.background_thread.join(timeout=5)
@@ -81,7 +84,7 @@ class MusicService(BaseQueueService):
                 return self._process_gift(live_event)
             return True
         except Exception as e:
-            print(f"[MUSIC] Error procesando evento: {str(e)}")
+            logger.error("[MUSIC] Error procesando evento: %s", str(e))
             return False
 
     def _process_gift(self, live_event):
@@ -93,7 +96,7 @@ class MusicService(BaseQueueService):
             return True
 
         nickname = live_event.user_nickname or live_event.user_unique_id
-        print(f"[MUSIC] ⏭️ @{nickname} envio GG - saltando cancion")
+        logger.info("[MUSIC] ⏭️ @%s envio GG - saltando cancion", nickname)
 
         self._play_next()
         return True
@@ -107,13 +110,13 @@ class MusicService(BaseQueueService):
         if self.current_index >= len(self.tracks):
             random.shuffle(self.tracks)
             self.current_index = 0
-            print("[MUSIC] Playlist reiniciada y barajada")
+            logger.info("[MUSIC] Playlist reiniciada y barajada")
 
         track_path = self.tracks[self.current_index]
         self.current_index += 1
 
         filename = os.path.basename(track_path)
-        print(f"[MUSIC] ▶️ [{self.current_index}/{len(self.tracks)}] {filename}")
+        logger.info("[MUSIC] ▶️ [%s/%s] %s", self.current_index, len(self.tracks), filename)
 
         self.player.play(
             track_path,
@@ -136,7 +139,7 @@ class MusicService(BaseQueueService):
 
     def _background_music_loop(self):
         """Loop inicial que arranca la primera cancion"""
-        print("[MUSIC] Reproduccion automatica iniciada")
+        logger.info("[MUSIC] Reproduccion automatica iniciada")
         # Esperar un momento antes de empezar
         time.sleep(2)
 
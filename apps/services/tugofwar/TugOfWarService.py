@@ -5,8 +5,12 @@ Mapea regalos de TikTok a equipos y envia eventos al frontend via SSE.
 El frontend muestra el juego en un browser source de OBS.
 """
 
+import logging
+
 from apps.queue_system.base_service import BaseQueueService
 
+logger = logging.getLogger(__name__)
+
 
 class TugOfWarService(BaseQueueService):
     """
@@ -36,10 +40,10 @@ class TugOfWarService(BaseQueueService):
     }
 
     def on_start(self):
-        print("[TUGOFWAR] Servicio Tug of War iniciado")
+        logger.info("[TUGOFWAR] Servicio Tug of War iniciado")
 
     def on_stop(self):
-        print("[TUGOFWAR] Servicio Tug of War detenido")
+        logger.info("[TUGOFWAR] Servicio Tug of War detenido")
 
     def process_event(self, live_event, queue_item):
         try:
@@ -52,7 +56,7 @@ class TugOfWarService(BaseQueueService):
             return True
 
         except Exception as e:
-            print(f"[TUGOFWAR] Error procesando evento: {e}")
+            logger.error("[TUGOFWAR] Error procesando evento: %s", e)
             return False
 
     def _process_gift(self, live_event, queue_item):
@@ -72,7 +76,7 @@ class TugOfWarService(BaseQueueService):
             team_info = self.GIFT_TEAM_MAP.get(gift_name)
 
             if not team_info:
-                print(f"[TUGOFWAR] Regalo '{gift_name}' no mapeado, ignorando")
+                logger.info("[TUGOFWAR] Regalo '%s' no mapeado, ignorando", gift_name)
                 return True
 
             team, amount = team_info
@@ -84,11 +88,11 @@ class TugOfWarService(BaseQueueService):
                 'gift_name': gift_name,
             })
 
-            print(f"[TUGOFWAR] {username} dono {gift_name} -> {team} +{amount}")
+            logger.info("[TUGOFWAR] %s dono %s -> %s +%s", username, gift_name, team, amount)
             return True
 
         except Exception as e:
-            print(f"[TUGOFWAR] Error procesando regalo: {e}")
+            logger.error("[TUGOFWAR] Error procesando regalo: %s", e)
             import traceback
             traceback.print_exc()
             return False
@@ -2103,6 +2103,18 @@ document.addEventListener('keydown', function initKey(e) {
 });
 
 // ─── SSE: RECIBIR EVENTOS DE TIKTOK LIVE ───
+// Ack de render para el tracing de latencia (después del siguiente frame)
+function ackTrace(trace) {
+    requestAnimationFrame(function() {
+        fetch('/queue/traces/ack/', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify(trace),
+            keepalive: true
+        }).catch(function() {});
+    });
+}
+
 (function connectSSE() {
     const evtSource = new EventSource('/tugofwar/events/');
 
@@ -2115,6 +2127,7 @@ document.addEventListener('keydown', function initKey(e) {
                 if (startScreen.parentNode) startGame();
                 donate(d.team, d.amount, d.username);
             }
+            if (evt.trace) ackTrace(evt.trace);
         } catch (e) {
             console.error('[SSE] Error parsing event:', e);
         }
@@ -4,6 +4,7 @@ from django.conf import settings
 import json
 import time
 from pathlib import Path
+from apps.queue_system import tracing
 
 
 EVENTS_DIR = Path(settings.BASE_DIR) / 'tmp' / 'tugofwar_events'
@@ -30,6 +31,7 @@ def game_events(request):
                             with open(event_file, 'r') as f:
                                 event_data = json.load(f)
 
+                            tracing.mark_delivered(event_data)
                             yield f"data: {json.dumps(event_data)}\n\n"
                             processed_files.add(event_file.name)
                             event_file.unlink()
@@ -78,6 +80,8 @@ def send_tugofwar_event(event_type, data):
             'data': data,
             'timestamp': timestamp
         }
+        # Traza de latencia del item de cola que está procesando este thread
+        tracing.attach_to_payload(event)
 
         with open(filepath, 'w') as f:
             json.dump(event, f)
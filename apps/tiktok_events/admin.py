@@ -68,10 +68,13 @@ class LiveSessionAdmin(admin.ModelAdmin):
         'started_at',
         'ended_at',
         'duration_display',
-        'total_events'
+        'total_events',
+        'disconnects',
+        'archived_at'
     ]
     list_filter = [
         'status',
+        ('archived_at', admin.EmptyFieldListFilter),
         'game_type',
         'account__country',
         'started_at',
@@ -88,7 +91,11 @@ class LiveSessionAdmin(admin.ModelAdmin):
         'id',
         'started_at',
         'total_events',
-        'duration_display'
+        'disconnects',
+        'disconnected_seconds',
+        'duration_display',
+        'archived_at',
+        'archive_path'
     ]
     ordering = ['-started_at']
     date_hierarchy = 'started_at'
@@ -129,7 +136,11 @@ class LiveSessionAdmin(admin.ModelAdmin):
             'fields': ('started_at', 'ended_at', 'duration_display')
         }),
         ('Estadísticas', {
-            'fields': ('total_events',)
+            'fields': ('total_events', 'disconnects', 'disconnected_seconds')
+        }),
+        ('Archivo', {
+            'fields': ('archived_at', 'archive_path'),
+            'classes': ('collapse',)
         }),
         ('Notas', {
             'fields': ('notes',),
@@ -0,0 +1,205 @@
+"""
+Agregadores en memoria para eventos de alto volumen
+
+TikTok envía un LikeEvent casi por cada tap y un JoinEvent por cada viewer
+que entra. En lugar de persistir y distribuir cada uno, el capturador los
+acumula en memoria y guarda registros resumidos:
+- Likes: un registro por usuario y ventana de tiempo con el conteo sumado
+- Joins: un rollup por minuto con el conteo exacto y usuarios distintos estimados
+"""
+
+import hashlib
+import math
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional
+from django.utils import timezone
+
+
+class LikeAggregator:
+    """
+    Agrupa likes por usuario (dentro de la sesión del capturador) en ventanas de tiempo
+
+    Un bucket se vacía cuando:
+    - Expira su ventana (window_seconds desde el primer like)
+    - El conteo acumulado alcanza el umbral (threshold)
+    """
+
+    def __init__(self, window_seconds: float = 5.0, threshold: int = 50):
+        self.window_seconds = window_seconds
+        self.threshold = threshold
+        # Se desactiva si algún servicio necesita cada tap individual
+        self.enabled = True
+        self.buckets: Dict[str, Dict[str, Any]] = {}
+
+    def add(self, fields: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Agrega un like a su bucket
+
+        Args:
+            fields: campos del LiveEvent por tap (user_id, user_unique_id, user_nickname, event_data)
+
+        Returns:
+            El bucket cerrado si se alcanzó el umbral, None si sigue acumulando
+        """
+        event_data = fields['event_data']
+        key = str(fields.get('user_id') or fields.get('user_unique_id'))
+        now = fields.get('timestamp') or timezone.now()
+        bucket = self.buckets.get(key)
+
+        if bucket is None:
+            bucket = {
+                'user_id': fields.get('user_id'),
+                'user_unique_id': fields.get('user_unique_id'),
+                'user_nickname': fields.get('user_nickname'),
+                'user': event_data.get('user'),
+                'like_count': 0,
+                'taps': 0,
+                'total_likes': None,
+                'first_timestamp': now,
+                'last_timestamp': now,
+                'expires_at': time.monotonic() + self.window_seconds,
+            }
+            self.buckets[key] = bucket
+
+        bucket['like_count'] += event_data.get('like_count') or 1
+        bucket['taps'] += 1
+        bucket['last_timestamp'] = now
+        if event_data.get('total_likes') is not None:
+            bucket['total_likes'] = event_data['total_likes']
+
+        if bucket['like_count'] >= self.threshold:
+            return self.buckets.pop(key)
+        return None
+
+    def pop_expired(self) -> List[Dict[str, Any]]:
+        """Retorna (y elimina) los buckets cuya ventana ya expiró"""
+        now = time.monotonic()
+        expired = [key for key, bucket in self.buckets.items() if bucket['expires_at'] <= now]
+        return [self.buckets.pop(key) for key in expired]
+
+    def pop_all(self) -> List[Dict[str, Any]]:
+        """Retorna (y elimina) todos los buckets pendientes (al cerrar la sesión)"""
+        buckets = list(self.buckets.values())
+        self.buckets.clear()
+        return buckets
+
+    @staticmethod
+    def build_event_fields(bucket: Dict[str, Any]) -> Dict[str, Any]:
+        """Convierte un bucket en los campos de un LiveEvent agregado"""
+        return {
+            'event_type': 'LikeEvent',
+            'timestamp': bucket['first_timestamp'],
+            'user_id': bucket['user_id'],
+            'user_unique_id': bucket['user_unique_id'],
+            'user_nickname': bucket['user_nickname'],
+            'event_data': {
+                'like_count': bucket['like_count'],
+                'total_likes': bucket['total_likes'],
+                'user': bucket['user'],
+                'aggregated': {
+                    'taps': bucket['taps'],
+                    'first_timestamp': bucket['first_timestamp'].isoformat(),
+                    'last_timestamp': bucket['last_timestamp'].isoformat(),
+                },
+            },
+        }
+
+
+class HyperLogLog:
+    """
+    Sketch HyperLogLog para estimar usuarios distintos con memoria acotada
+
+    Con precision=10 usa 1024 registros (1 KB) y tiene ~3% de error típico,
+    sin importar cuántos usuarios se agreguen.
+    """
+
+    def __init__(self, precision: int = 10):
+        self.precision = precision
+        self.num_registers = 1 << precision
+        self.registers = bytearray(self.num_registers)
+        self._alpha = 0.7213 / (1 + 1.079 / self.num_registers)
+
+    def add(self, value) -> None:
+        """Agrega un valor (se hashea con blake2b, estable entre procesos)"""
+        digest = hashlib.blake2b(str(value).encode('utf-8'), digest_size=8).digest()
+        hashed = int.from_bytes(digest, 'big')
+        index = hashed >> (64 - self.precision)
+        remaining = hashed & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - remaining.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def estimate(self) -> int:
+        """Retorna la cantidad estimada de valores distintos"""
+        m = self.num_registers
+        raw = self._alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        # Corrección para rangos pequeños (linear counting)
+        if raw <= 2.5 * m and zeros:
+            return int(round(m * math.log(m / zeros)))
+        return int(round(raw))
+
+
+class JoinRollup:
+    """
+    Contador exacto de joins por ventana + sketch de usuarios distintos de la sesión
+
+    Las ventanas cerradas se devuelven como rollups para persistir como
+    JoinRollupEvent (un registro por ventana en lugar de uno por join). La
+    ventana es de un minuto; con backpressure la captura la ensancha
+    (bucket_seconds) y vuelve al minuto cuando baja la presión.
+    """
+
+    BUCKET_SECONDS = 60
+
+    def __init__(self, precision: int = 10):
+        self.bucket_seconds = self.BUCKET_SECONDS
+        self.minutes: Dict[datetime, int] = {}
+        self._ends: Dict[datetime, datetime] = {}
+        self.distinct_users = HyperLogLog(precision)
+
+    def add(self, user_key) -> None:
+        """Registra un join"""
+        now = timezone.now()
+        start = now - timedelta(seconds=now.timestamp() % self.bucket_seconds)
+        start = start.replace(microsecond=0)
+        if start not in self.minutes:
+            self.minutes[start] = 0
+            self._ends[start] = start + timedelta(seconds=self.bucket_seconds)
+        self.minutes[start] += 1
+        if user_key:
+            self.distinct_users.add(user_key)
+
+    def pop_closed(self) -> List[Dict[str, Any]]:
+        """Retorna (y elimina) las ventanas ya cerradas"""
+        now = timezone.now()
+        closed = sorted(start for start in self.minutes if self._ends[start] <= now)
+        return [self._rollup(start) for start in closed]
+
+    def pop_all(self) -> List[Dict[str, Any]]:
+        """Retorna (y elimina) todas las ventanas, incluida la actual (al cerrar la sesión)"""
+        return [self._rollup(start) for start in sorted(self.minutes)]
+
+    def _rollup(self, start: datetime) -> Dict[str, Any]:
+        end = self._ends.pop(start)
+        return {
+            'minute': start,
+            'window_seconds': int((end - start).total_seconds()),
+            'joins': self.minutes.pop(start),
+            'distinct_users': self.distinct_users.estimate(),
+        }
+
+    @staticmethod
+    def build_event_fields(rollup: Dict[str, Any]) -> Dict[str, Any]:
+        """Convierte un rollup en los campos de un LiveEvent JoinRollupEvent"""
+        return {
+            'event_type': 'JoinRollupEvent',
+            'timestamp': rollup['minute'],
+            'event_data': {
+                'minute': rollup['minute'].isoformat(),
+                'window_seconds': rollup.get('window_seconds', JoinRollup.BUCKET_SECONDS),
+                'joins': rollup['joins'],
+                'distinct_users_estimate': rollup['distinct_users'],
+            },
+        }
@@ -0,0 +1,269 @@
+"""
+Archivo de sesiones - Mueve eventos viejos de la BD a archivos comprimidos
+
+Las sesiones terminadas hace más de N días se exportan a un archivo por
+sesión (mismo formato con prefijo de longitud que el journal, en gzip) y
+sus filas de `live_events` y `event_queue` se borran en lotes chicos, cada
+uno en su propia transacción corta, para no bloquear al dispatcher ni a los
+workers. Solo se borran los ids que quedaron en el archivo: una fila que entre
+después de exportar sigue en la BD y la sesión se vuelve a archivar en la
+próxima corrida (el archivo existente se conserva y se le agregan las nuevas).
+La fila de LiveSession se conserva (marcada con archived_at) y la sesión puede
+restaurarse a la BD cuando haga falta.
+
+Los items 'dead' se guardan completos (intentos, last_error, available_at,
+expires_at): al restaurar la sesión vuelven como 'dead' y se pueden reencolar
+desde el admin igual que antes de archivar.
+
+Estructura en disco:
+    archive/session_<id>.jsonl.gz
+
+Registros del archivo (uno por línea):
+    {"kind": "session", ...}   <- primera línea, datos de la sesión
+    {"kind": "event", ...}     <- un LiveEvent (con su id original)
+    {"kind": "queue", ...}     <- un EventQueue de esos eventos
+"""
+
+import gzip
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from apps.queue_system.models import EventQueue, Service
+from .journal import LIVE_EVENT_FIELDS, encode_record, iter_file
+from .models import LiveEvent, LiveSession
+
+
+ARCHIVE_DIR = Path(settings.BASE_DIR) / 'archive'
+
+# Estados de EventQueue que ya no necesita ningún worker
+TERMINAL_QUEUE_STATUSES = ('completed', 'failed', 'discarded', 'expired')
+
+# Campos de EventQueue que se guardan en el archivo
+QUEUE_FIELDS = (
+    'id', 'live_event_id', 'status', 'priority', 'is_async', 'processed_at',
+    'attempts', 'last_error', 'available_at', 'expires_at',
+    'batch_parent_id', 'batch_size', 'coalesce_key', 'sort_key',
+)
+
+# Campos de fecha de QUEUE_FIELDS (se parsean al restaurar)
+QUEUE_DATETIME_FIELDS = ('processed_at', 'available_at', 'expires_at')
+
+SESSION_FIELDS = (
+    'name', 'game_type', 'started_at', 'ended_at', 'status', 'room_id',
+    'streamer_unique_id', 'total_events', 'notes',
+)
+
+
+def archive_path(session_id: int, directory: Optional[Path] = None) -> Path:
+    """Archivo de una sesión archivada"""
+    return Path(directory or ARCHIVE_DIR) / f'session_{session_id}.jsonl.gz'
+
+
+def _parse_dt(value):
+    return parse_datetime(value) if isinstance(value, str) else value
+
+
+def _delete_ids_in_batches(model, ids, batch_size: int, pause: float) -> int:
+    """Borra las filas con esos ids en lotes de batch_size (una transacción corta por lote)"""
+    deleted = 0
+    for start in range(0, len(ids), batch_size):
+        with transaction.atomic():
+            deleted += model.objects.filter(id__in=ids[start:start + batch_size]).delete()[0]
+        if pause:
+            time.sleep(pause)
+    return deleted
+
+
+def _delete_in_batches(queryset, batch_size: int, pause: float) -> int:
+    """Borra las filas del queryset en lotes de batch_size (una transacción corta por lote)"""
+    deleted = 0
+    while True:
+        ids = list(queryset.values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        with transaction.atomic():
+            deleted += queryset.model.objects.filter(id__in=ids).delete()[0]
+        if pause:
+            time.sleep(pause)
+
+
+def archive_session(session: LiveSession, directory: Optional[Path] = None,
+                    batch_size: int = 1000, pause: float = 0.05) -> Dict[str, int]:
+    """
+    Exporta una sesión a su archivo comprimido y borra sus filas de la BD
+
+    El archivo se escribe en un .tmp y se renombra al final: si el proceso
+    se corta a mitad de camino, la BD queda intacta y se reintenta en la
+    próxima corrida. Se borran exactamente los ids escritos en el archivo; si
+    después quedan filas de la sesión (entraron durante el archivo) no se
+    marca como archivada y la próxima corrida las agrega al mismo archivo.
+
+    Returns:
+        dict: {'events': N, 'queue_items': M}
+    """
+    path = archive_path(session.id, directory)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + '.tmp')
+
+    events = LiveEvent.objects.filter(session=session).order_by('id')
+    queue_items = EventQueue.objects.filter(live_event__session=session).select_related('service').order_by('id')
+
+    written = {'events': 0, 'queue_items': 0}
+    event_ids, queue_ids = [], []
+    with gzip.open(tmp_path, 'wb') as f:
+        header = {'kind': 'session', 'id': session.id}
+        header.update({field: getattr(session, field) for field in SESSION_FIELDS})
+        f.write(encode_record(header))
+
+        # Corrida anterior que no terminó de vaciar la sesión: conservar lo ya archivado
+        previous = {'event': [], 'queue': []}
+        if path.exists():
+            for record in iter_file(path):
+                if record.get('kind') in previous:
+                    previous[record['kind']].append(record)
+        archived_ids = {kind: {record['id'] for record in records} for kind, records in previous.items()}
+        for record in previous['event']:
+            f.write(encode_record(record))
+
+        # Lo que sigue en la BD se borra aunque ya estuviera en el archivo (se corta antes de borrar)
+        for event in events.iterator(chunk_size=2000):
+            event_ids.append(event.id)
+            if event.id in archived_ids['event']:
+                continue
+            record = {'kind': 'event', 'id': event.id, 'created_at': event.created_at}
+            record.update({field: getattr(event, field) for field in LIVE_EVENT_FIELDS})
+            f.write(encode_record(record))
+            written['events'] += 1
+
+        for record in previous['queue']:
+            f.write(encode_record(record))
+
+        for item in queue_items.iterator(chunk_size=2000):
+            queue_ids.append(item.id)
+            if item.id in archived_ids['queue']:
+                continue
+            record = {'kind': 'queue', 'service': item.service.slug, 'created_at': item.created_at}
+            record.update({field: getattr(item, field) for field in QUEUE_FIELDS})
+            f.write(encode_record(record))
+            written['queue_items'] += 1
+
+    written['events'] += len(previous['event'])
+    written['queue_items'] += len(previous['queue'])
+    os.replace(tmp_path, path)
+
+    # Solo lo exportado: primero la cola (referencia a los eventos), después los eventos.
+    # Los items de cola de otros eventos que apunten a estos caen por CASCADE: se
+    # evita borrando los eventos que todavía tienen items sin archivar.
+    _delete_ids_in_batches(EventQueue, queue_ids, batch_size, pause)
+    kept = set(EventQueue.objects.filter(live_event_id__in=event_ids).values_list('live_event_id', flat=True))
+    _delete_ids_in_batches(LiveEvent, [event_id for event_id in event_ids if event_id not in kept], batch_size, pause)
+
+    if kept or events.exists() or queue_items.exists():
+        # Entraron filas durante el archivo: quedan para la próxima corrida
+        raise RuntimeError(f"La sesión #{session.id} cambió durante el archivo, se completa en la próxima corrida")
+
+    session.archived_at = timezone.now()
+    session.archive_path = str(path)
+    session.save(update_fields=['archived_at', 'archive_path'])
+    return written
+
+
+def restore_session(session_id: int, directory: Optional[Path] = None, batch_size: int = 1000) -> Dict[str, int]:
+    """
+    Vuelve a cargar en la BD una sesión archivada (con sus ids originales)
+
+    Si la fila de LiveSession ya no existe se recrea desde el archivo. Los
+    items de cola de servicios que ya no existen se omiten.
+
+    Returns:
+        dict: {'events': N, 'queue_items': M}
+    """
+    path = archive_path(session_id, directory)
+    session = LiveSession.objects.filter(id=session_id).first()
+    if session and not session.archived_at:
+        raise ValueError(f"La sesión #{session_id} no está archivada")
+    if session and session.archive_path:
+        path = Path(session.archive_path)
+    if not path.exists():
+        raise FileNotFoundError(f"No existe el archivo de la sesión #{session_id}: {path}")
+
+    services = {service.slug: service.id for service in Service.objects.all()}
+    restored = {'events': 0, 'queue_items': 0}
+    events, queue_items, created_at = [], [], {}
+
+    def flush_events():
+        LiveEvent.objects.bulk_create(events, batch_size=batch_size)
+        # created_at es auto_now_add: se reescribe con el valor original
+        for event in events:
+            event.created_at = created_at.pop(event.id)
+        LiveEvent.objects.bulk_update(events, ['created_at'], batch_size=batch_size)
+        restored['events'] += len(events)
+        events.clear()
+
+    with transaction.atomic():
+        for record in iter_file(path):
+            kind = record.pop('kind', None)
+
+            if kind == 'session':
+                if session is None:
+                    fields = {field: record.get(field) for field in SESSION_FIELDS}
+                    for field in ('started_at', 'ended_at'):
+                        fields[field] = _parse_dt(fields[field])
+                    session = LiveSession.objects.create(id=record['id'], **fields)
+                    # started_at es auto_now_add
+                    LiveSession.objects.filter(id=session.id).update(started_at=fields['started_at'])
+
+            elif kind == 'event':
+                event_created = _parse_dt(record.pop('created_at'))
+                record['timestamp'] = _parse_dt(record['timestamp'])
+                event = LiveEvent(session_id=session_id, **record)
+                created_at[event.id] = event_created
+                events.append(event)
+                if len(events) >= batch_size:
+                    flush_events()
+
+            elif kind == 'queue':
+                if events:
+                    flush_events()
+                service_id = services.get(record.pop('service'))
+                if service_id is None:
+                    continue
+                record['created_at'] = _parse_dt(record['created_at'])
+                for field in QUEUE_DATETIME_FIELDS:
+                    record[field] = _parse_dt(record.get(field))
+                queue_items.append(EventQueue(service_id=service_id, session_id=session_id, **record))
+
+        if events:
+            flush_events()
+
+        # Las cabezas de lote primero (los miembros las referencian)
+        queue_items.sort(key=lambda item: item.batch_parent_id is not None)
+        originals = [item.created_at for item in queue_items]
+        EventQueue.objects.bulk_create(queue_items, batch_size=batch_size)
+        for item, original in zip(queue_items, originals):
+            item.created_at = original
+        EventQueue.objects.bulk_update(queue_items, ['created_at'], batch_size=batch_size)
+        restored['queue_items'] = len(queue_items)
+
+        LiveSession.objects.filter(id=session_id).update(archived_at=None)
+
+    return restored
+
+
+def purge_queue(before: datetime, batch_size: int = 1000, pause: float = 0.05) -> int:
+    """
+    Borra items de cola ya terminados (completed/failed/discarded/expired)
+    anteriores a `before`, en lotes
+
+    Los 'dead' se conservan para poder reencolarlos desde el admin.
+    """
+    terminal = EventQueue.objects.filter(status__in=TERMINAL_QUEUE_STATUSES, created_at__lt=before)
+    return _delete_in_batches(terminal, batch_size, pause)
@@ -0,0 +1,306 @@
+"""
+CaptureManager - Varias cuentas de TikTok Live en un mismo proceso
+
+Para la granja de cuentas (TikTokAccount): un TikTokEventCapture por cuenta,
+todos en un único loop asyncio (las conexiones son I/O, no CPU). Cada cuenta
+tiene su LiveSession, su journal y sus agregadores; lo que sí se comparte es
+el guardado: todas escriben en el mismo sink (BatchWriter en este proceso o
+EventChannelClient hacia start_event_system), que guarda en lotes.
+
+Por cuenta se lleva el estado de la conexión:
+- connecting / live / reconnecting (corte del websocket: la captura reconecta
+  sola sobre la misma sesión, ver TikTokEventCapture.run_supervised) / offline
+  (no está en vivo, se vuelve a probar cada OFFLINE_POLL_SECONDS) / error
+  (reintento con backoff exponencial y sesión nueva) / stopped
+- eventos recibidos, antigüedad del último evento, reconexiones, último error
+
+Para muchas cuentas se puede repartir en procesos: start_event_system
+--accounts all --capture-process --capture-shards 4 lanza 4 procesos
+`capture_tiktok_live --accounts ...` que mandan todo por el canal.
+
+Uso:
+    manager = CaptureManager(['cuenta1', 'cuenta2'], sink=writer)
+    manager.start()           # loop en un thread
+    manager.get_status()
+    manager.stop()            # cierra las sesiones
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from TikTokLive.client.errors import UserNotFoundError, UserOfflineError
+
+from apps.queue_system.supervisor import read_stats, write_stats
+from .models import TikTokAccount
+from .services import TikTokEventCapture
+
+logger = logging.getLogger(__name__)
+
+STATS_DIR = Path(settings.BASE_DIR) / 'tmp' / 'capture_stats'
+
+
+def resolve_accounts(spec: str) -> List[str]:
+    """
+    Lista de usernames a capturar
+
+    Args:
+        spec: 'all' (cuentas activas de TikTokAccount) o usernames separados por ','
+    """
+    if spec.strip().lower() == 'all':
+        return [
+            unique_id.lstrip('@') for unique_id in
+            TikTokAccount.objects.filter(is_active=True).values_list('unique_id', flat=True)
+        ]
+    return [name.strip().lstrip('@') for name in spec.split(',') if name.strip()]
+
+
+def shard_accounts(usernames: List[str], shards: int) -> List[List[str]]:
+    """Reparte las cuentas en `shards` grupos (round-robin, sin grupos vacíos)"""
+    shards = max(1, min(shards, len(usernames)))
+    return [usernames[index::shards] for index in range(shards)]
+
+
+def read_capture_stats(paths) -> List[Dict]:
+    """Estado de las cuentas escrito por procesos de captura (ignora archivos viejos o faltantes)"""
+    statuses = []
+    now = time.time()
+    for path in paths:
+        stats = read_stats(Path(path))
+        if stats and now - stats['updated_at'] <= CaptureManager.STATS_MAX_AGE:
+            statuses.extend(stats['accounts'])
+    return statuses
+
+
+class AccountCapture:
+    """Una cuenta dentro del manager: su captura y el estado de la conexión"""
+
+    def __init__(self, username: str, capture: TikTokEventCapture):
+        self.username = username
+        self.capture = capture
+        self.status = 'idle'
+        self.status_since = time.time()
+        self.connected_at = None
+        self.failures = 0  # errores seguidos (para el backoff)
+        self.last_error = ''
+        self.next_attempt_at = None
+
+    def set_status(self, status: str, error: str = ''):
+        if status != self.status:
+            self.status = status
+            self.status_since = time.time()
+        if error:
+            self.last_error = error
+
+    def get_status(self) -> Dict:
+        now = time.time()
+        capture = self.capture
+        status = self.status
+        if status == 'live' and capture.disconnected_at is not None:
+            status = 'reconnecting'
+        return {
+            'username': self.username,
+            'status': status,
+            'status_seconds': round(now - self.status_since),
+            'session_id': capture.session.id if capture.session else None,
+            'events': capture.events_received,
+            'last_event_age': round(now - capture.last_event_at, 1) if capture.last_event_at else None,
+            'reconnects': capture.reconnects,
+            'disconnected_for': round(now - capture.disconnected_at) if capture.disconnected_at else None,
+            'last_error': self.last_error,
+            'next_attempt_in': max(0, round(self.next_attempt_at - now)) if self.next_attempt_at else None,
+            'pressure_level': capture.pressure.level,
+        }
+
+
+class CaptureManager:
+    """Corre un TikTokEventCapture por cuenta en un solo loop asyncio"""
+
+    # Espera entre chequeos de una cuenta que no está en vivo (segundos)
+    OFFLINE_POLL_SECONDS = 60
+
+    # Backoff ante errores de conexión (segundos)
+    RETRY_BASE_DELAY = 5
+    RETRY_MAX_DELAY = 300
+
+    # Una conexión que duró más que esto resetea el backoff
+    STABLE_SECONDS = 60
+
+    # Separación entre las primeras conexiones (no pedir decenas de rooms a la vez)
+    CONNECT_STAGGER_SECONDS = 0.5
+
+    # Escritura del archivo de estado y antigüedad máxima al leerlo
+    STATS_INTERVAL = 5
+    STATS_MAX_AGE = 30
+
+    def __init__(self, usernames: List[str], sink, session_name: Optional[str] = None,
+                 stats_path: Optional[Path] = None):
+        """
+        Args:
+            usernames: Cuentas a capturar (sin @)
+            sink: Destino compartido de los eventos (BatchWriter o EventChannelClient)
+            session_name: Nombre de las sesiones (se agrega el @username)
+            stats_path: Archivo donde publicar get_status() (modo proceso)
+        """
+        self.sink = sink
+        self.stats_path = Path(stats_path) if stats_path else None
+        self.accounts = [
+            AccountCapture(username, TikTokEventCapture(
+                username,
+                session_name=f'{session_name} @{username}' if session_name else None,
+                channel=sink,
+            ))
+            for username in dict.fromkeys(usernames)
+        ]
+        self.running = False
+        self._loop = None
+        self._stop_event = None
+        self._thread = None
+
+    # ------------------------------------------------------------------ control
+
+    def start(self):
+        """Corre el loop de las capturas en un thread"""
+        self.running = True
+        self._thread = threading.Thread(target=asyncio.run, args=(self._main(),), daemon=True,
+                                        name='capture-manager')
+        self._thread.start()
+
+    @property
+    def alive(self) -> bool:
+        return bool(self._thread and self._thread.is_alive())
+
+    def run(self):
+        """Corre el loop en el thread actual hasta stop()"""
+        self.running = True
+        asyncio.run(self._main())
+
+    def stop(self, timeout: float = 30):
+        """Desconecta todas las cuentas y cierra sus sesiones"""
+        self.running = False
+        if self._loop and self._stop_event:
+            self._loop.call_soon_threadsafe(self._stop_event.set)
+        if self._thread:
+            self._thread.join(timeout=timeout)
+            if self._thread.is_alive():
+                logger.warning("[CAPTURE] ⚠️  El loop de capturas no terminó en %ss", timeout)
+        if self.stats_path:
+            try:
+                self.stats_path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def get_status(self) -> List[Dict]:
+        """Estado de cada cuenta"""
+        return [account.get_status() for account in self.accounts]
+
+    # ------------------------------------------------------------------ loop
+
+    async def _main(self):
+        self._loop = asyncio.get_running_loop()
+        self._stop_event = asyncio.Event()
+        if not self.running:
+            return
+
+        logger.info("[CAPTURE] 🛰️  Capturando %s cuentas en un solo loop", len(self.accounts))
+        tasks = [
+            asyncio.create_task(self._run_account(account, index * self.CONNECT_STAGGER_SECONDS))
+            for index, account in enumerate(self.accounts)
+        ]
+        if self.stats_path:
+            tasks.append(asyncio.create_task(self._stats_loop()))
+
+        await self._stop_event.wait()
+
+        # Cortar las conexiones: cada _run_account cierra su sesión al salir de run_supervised()
+        for account in self.accounts:
+            if account.status in ('connecting', 'live'):
+                try:
+                    await account.capture.stop()
+                except Exception as e:
+                    logger.debug("[CAPTURE] %s: error al desconectar: %s", account.username, e)
+
+        _, pending = await asyncio.wait(tasks, timeout=15)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+        # Sesiones que quedaron abiertas (tareas canceladas)
+        for account in self.accounts:
+            if account.capture.session:
+                await sync_to_async(account.capture.finish_session)('completed')
+            account.set_status('stopped')
+
+    async def _sleep(self, seconds: float) -> bool:
+        """Espera (interrumpible por stop); False si hay que terminar"""
+        try:
+            await asyncio.wait_for(self._stop_event.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+        return self.running
+
+    async def _run_account(self, account: AccountCapture, initial_delay: float):
+        """
+        Conecta una cuenta y la mantiene conectada
+
+        Los cortes durante un live los resuelve la captura (misma sesión); acá
+        se sondea si no está en vivo y se reintenta si falla la conexión inicial
+        o se agotan las reconexiones (sesión nueva).
+        """
+        if initial_delay and not await self._sleep(initial_delay):
+            return
+
+        while self.running:
+            account.set_status('connecting')
+            account.next_attempt_at = None
+
+            def on_connected():
+                account.set_status('live')
+                account.connected_at = time.time()
+                logger.info("[CAPTURE] 🟢 @%s en vivo", account.username)
+
+            delay = self.OFFLINE_POLL_SECONDS
+            session_status = 'completed'
+            try:
+                await account.capture.run_supervised(on_connected=on_connected)
+                logger.info("[CAPTURE] ⏹️  @%s: el live terminó", account.username)
+                account.set_status('offline')
+            except (UserOfflineError, UserNotFoundError) as e:
+                account.set_status('offline', '' if isinstance(e, UserOfflineError) else 'Usuario no encontrado')
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                session_status = 'aborted'
+                if account.connected_at and time.time() - account.connected_at >= self.STABLE_SECONDS:
+                    account.failures = 0
+                account.failures += 1
+                delay = min(self.RETRY_MAX_DELAY, self.RETRY_BASE_DELAY * 2 ** (account.failures - 1))
+                account.set_status('error', str(e) or type(e).__name__)
+                logger.warning("[CAPTURE] 🔴 @%s: %s (reintento en %ss)", account.username, account.last_error, delay)
+            finally:
+                if account.capture.session:
+                    try:
+                        await sync_to_async(account.capture.finish_session)(session_status)
+                    except Exception as e:
+                        logger.error("[CAPTURE] ❌ @%s: error cerrando la sesión: %s", account.username, e)
+
+            account.connected_at = None
+            if account.status == 'offline':
+                account.failures = 0
+            account.next_attempt_at = time.time() + delay
+            if not await self._sleep(delay):
+                return
+
+    async def _stats_loop(self):
+        while self.running:
+            try:
+                write_stats(self.stats_path, self.get_status(), key='accounts')
+            except OSError as e:
+                logger.debug("[CAPTURE] No se pudo escribir %s: %s", self.stats_path, e)
+            if not await self._sleep(self.STATS_INTERVAL):
+                return
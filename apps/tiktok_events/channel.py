@@ -0,0 +1,361 @@
+"""
+Canal de eventos entre el proceso de captura y el proceso que persiste
+
+Con `start_event_system --capture-process` la conexión a TikTok Live corre
+en su propio proceso (`capture_tiktok_live --channel <socket>`): los
+handlers solo serializan cada evento y lo dejan en un buffer en memoria, y
+un thread lo envía por un socket Unix. El proceso principal recibe los
+eventos, los guarda en lotes (una transacción por lote) y los distribuye a
+las colas. Un dispatch lento o una BD cargada ya no frenan la lectura del
+websocket (y TikTok no corta la conexión).
+
+Formato en el socket: el mismo registro con prefijo de longitud del journal
+
+    <bytes>:<json>\n
+
+Cada registro es un LiveEvent de la sesión más 'session_id' y 'dispatch', y
+'sender'/'seq' (id del cliente y número de secuencia): si un sendall falla a
+mitad de lote el cliente reenvía el lote entero, y el servidor descarta los
+registros que ya había recibido de ese cliente (sin filas ni dispatch dobles).
+El guardado en lotes es BatchWriter, que también usa directamente el
+CaptureManager cuando las capturas corren en el mismo proceso.
+Si el consumidor no está, el cliente reintenta la conexión y acumula hasta
+max_buffer registros (después descarta los más viejos; el journal los
+conserva para replay_session).
+"""
+
+import json
+import logging
+import os
+import queue
+import socket
+import threading
+import time
+import uuid
+from collections import deque
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from apps.queue_system import metrics
+from apps.queue_system.dispatcher import EventDispatcher
+from .journal import build_live_event_kwargs, encode_record
+from .models import LiveEvent
+
+logger = logging.getLogger(__name__)
+
+SOCKET_PATH = Path(settings.BASE_DIR) / 'tmp' / 'capture.sock'
+
+
+def iter_stream(sock: socket.socket) -> Iterator[Dict[str, Any]]:
+    """
+    Itera los registros con prefijo de longitud que llegan por un socket hasta que se cierra
+
+    Los registros de cada recv se leen avanzando un offset; el buffer se
+    recorta una sola vez por recv (queda solo el registro incompleto).
+    """
+    buffer = bytearray()
+    while True:
+        chunk = sock.recv(65536)
+        if not chunk:
+            return
+        buffer += chunk
+        offset = 0
+        while True:
+            sep = buffer.find(b':', offset)
+            if sep < 0:
+                break
+            start = sep + 1
+            end = start + int(buffer[offset:sep])
+            if len(buffer) <= end:  # falta el payload o el '\n' final
+                break
+            yield json.loads(buffer[start:end])
+            offset = end + 1
+        del buffer[:offset]
+
+
+class EventChannelClient:
+    """Lado de la captura: send() no bloquea, un thread escribe al socket"""
+
+    # Registros por escritura al socket
+    SEND_BATCH = 500
+
+    def __init__(self, path=SOCKET_PATH, max_buffer: int = 100_000):
+        self.path = str(path)
+        self.max_buffer = max_buffer
+        self.dropped = 0
+        self.sender = f'{os.getpid()}-{uuid.uuid4().hex[:8]}'
+        self._seq = 0
+        self._buffer = deque()
+        self._cond = threading.Condition()
+        self._closing = False
+        self._sock = None
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True, name='capture-channel')
+        self._thread.start()
+
+    def send(self, record: Dict[str, Any]):
+        """Encola un registro para enviar (llamado desde el loop asyncio de la captura)"""
+        with self._cond:
+            if len(self._buffer) >= self.max_buffer:
+                self._buffer.popleft()
+                self.dropped += 1
+                metrics.CHANNEL_DROPPED.inc()
+                if self.dropped % 1000 == 1:
+                    logger.warning("[CHANNEL] ⚠️  Buffer lleno, %s eventos descartados (quedan en el journal)", self.dropped)
+            self._seq += 1
+            record['sender'] = self.sender
+            record['seq'] = self._seq
+            self._buffer.append(record)
+            self._cond.notify()
+
+    def close(self, timeout: float = 10):
+        """Envía lo pendiente (hasta timeout segundos) y cierra el socket"""
+        with self._cond:
+            self._closing = True
+            self._cond.notify()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+        if self._buffer:
+            logger.warning("[CHANNEL] ⚠️  %s eventos sin enviar al cerrar", len(self._buffer))
+        if self._sock:
+            self._sock.close()
+            self._sock = None
+
+    def _connect(self) -> bool:
+        try:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.connect(self.path)
+        except OSError:
+            return False
+        self._sock = sock
+        logger.info("[CHANNEL] 🔌 Conectado a %s", self.path)
+        return True
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._buffer and not self._closing:
+                    self._cond.wait()
+                if not self._buffer:
+                    return
+                batch = [self._buffer.popleft() for _ in range(min(self.SEND_BATCH, len(self._buffer)))]
+
+            if self._sock is None and not self._connect():
+                self._requeue(batch)
+                if self._closing:
+                    return
+                time.sleep(0.5)
+                continue
+
+            try:
+                self._sock.sendall(b''.join(encode_record(record) for record in batch))
+            except OSError as e:
+                logger.warning("[CHANNEL] ⚠️  Conexión perdida (%s), reintentando", e)
+                self._sock.close()
+                self._sock = None
+                self._requeue(batch)
+
+    def _requeue(self, batch: List[Dict[str, Any]]):
+        with self._cond:
+            self._buffer.extendleft(reversed(batch))
+
+
+def store_records(records: List[Dict[str, Any]]) -> List[LiveEvent]:
+    """
+    Guarda un lote de registros del canal (una transacción) y los distribuye
+    con EventDispatcher.dispatch_many (un bulk_create por servicio)
+
+    Si el lote falla, se reintenta registro por registro para no perder los
+    válidos por uno malo.
+    """
+    try:
+        with transaction.atomic():
+            stored = [
+                (LiveEvent.objects.create(session_id=record['session_id'], **build_live_event_kwargs(record)),
+                 record.get('dispatch', True))
+                for record in records
+            ]
+    except Exception as e:
+        if len(records) == 1:
+            logger.error("[CHANNEL] ❌ Evento descartado: %s", e)
+            return []
+        logger.warning("[CHANNEL] ⚠️  Lote de %s falló (%s), guardando uno por uno", len(records), e)
+        return [event for record in records for event in store_records([record])]
+
+    # LiveSession.total_events lo lleva la captura (igual que sin canal)
+    for live_event, _ in stored:
+        metrics.EVENTS_STORED.inc(event_type=live_event.event_type)
+    EventDispatcher.dispatch_many([live_event for live_event, dispatch in stored if dispatch])
+    return [live_event for live_event, _ in stored]
+
+
+class BatchWriter:
+    """
+    Guarda registros en lotes desde un único thread
+
+    send() no bloquea (mismo contrato que EventChannelClient); el thread
+    junta hasta batch_size registros (o lo que llegó en max_wait) y llama a
+    handler(records).
+    """
+
+    def __init__(self, handler: Callable[[List[Dict[str, Any]]], Any] = store_records,
+                 batch_size: int = 200, max_wait: float = 0.05):
+        self.handler = handler
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.received = 0
+        self.stored = 0
+        self._queue = queue.Queue()
+        self._running = False
+        self._thread = None
+        # Mientras devuelva True el thread sigue aunque esté detenido (productores vivos)
+        self.producers_alive: Callable[[], bool] = lambda: False
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True, name='channel-ingest')
+        self._thread.start()
+
+    def send(self, record: Dict[str, Any]):
+        self.received += 1
+        self._queue.put(record)
+
+    @property
+    def backlog(self) -> int:
+        """Registros recibidos que aún no se guardaron"""
+        return self._queue.qsize()
+
+    def stop(self, timeout: float = 60):
+        """Guarda lo pendiente (hasta timeout segundos) y detiene el thread"""
+        self._running = False
+        if self._thread:
+            self._thread.join(timeout=timeout)
+        if self.backlog:
+            logger.warning("[CHANNEL] ⚠️  %s eventos sin guardar al detener (quedan en el journal)", self.backlog)
+
+    def _run(self):
+        # Sigue mientras haya productores vivos o registros sin guardar
+        while self._running or not self._queue.empty() or self.producers_alive():
+            try:
+                batch = [self._queue.get(timeout=0.2)]
+            except queue.Empty:
+                continue
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            try:
+                close_old_connections()
+                self.handler(batch)
+                self.stored += len(batch)
+            except Exception as e:
+                logger.error("[CHANNEL] ❌ Error guardando lote de %s eventos: %s", len(batch), e)
+
+
+class EventChannelServer:
+    """
+    Lado del consumidor: acepta conexiones de captura y guarda en lotes
+
+    Un thread por conexión lee y parsea registros y los pasa a un BatchWriter.
+    """
+
+    def __init__(self, path=SOCKET_PATH, handler: Callable[[List[Dict[str, Any]]], Any] = store_records,
+                 batch_size: int = 200, max_wait: float = 0.05):
+        self.path = str(path)
+        self.writer = BatchWriter(handler, batch_size=batch_size, max_wait=max_wait)
+        self.writer.producers_alive = lambda: any(thread.is_alive() for thread in self._threads)
+        self.duplicates = 0
+        self._last_seq: Dict[str, int] = {}  # sender -> último seq recibido
+        self._seq_lock = threading.Lock()
+        self._running = False
+        self._sock = None
+        self._threads = []
+
+    @property
+    def received(self) -> int:
+        return self.writer.received
+
+    @property
+    def stored(self) -> int:
+        return self.writer.stored
+
+    def start(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        if os.path.exists(self.path):
+            os.remove(self.path)  # socket de una corrida anterior
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.bind(self.path)
+        self._sock.listen()
+        self._sock.settimeout(0.5)
+        self._running = True
+
+        self.writer.start()
+        thread = threading.Thread(target=self._accept_loop, daemon=True, name='channel-accept')
+        thread.start()
+        self._threads.append(thread)
+        logger.info("[CHANNEL] 📡 Escuchando eventos de captura en %s", self.path)
+
+    @property
+    def backlog(self) -> int:
+        """Registros recibidos que aún no se guardaron"""
+        return self.writer.backlog
+
+    def stop(self, timeout: float = 60):
+        """Deja de aceptar, espera a que se cierren las conexiones y guarda lo recibido"""
+        self._running = False
+        deadline = time.time() + timeout
+        for thread in list(self._threads):
+            thread.join(timeout=max(0.1, deadline - time.time()))
+        self.writer.stop(timeout=max(0.1, deadline - time.time()))
+        if self._sock:
+            self._sock.close()
+            self._sock = None
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def _accept_loop(self):
+        while self._running:
+            try:
+                conn, _ = self._sock.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            conn.settimeout(None)
+            thread = threading.Thread(target=self._read_loop, args=(conn,), daemon=True, name='channel-read')
+            thread.start()
+            self._threads.append(thread)
+
+    def _read_loop(self, conn: socket.socket):
+        with conn:
+            try:
+                for record in iter_stream(conn):
+                    if self._is_duplicate(record):
+                        continue
+                    self.writer.send(record)
+            except (OSError, ValueError) as e:
+                logger.warning("[CHANNEL] ⚠️  Conexión de captura cerrada con error: %s", e)
+
+    def _is_duplicate(self, record: Dict[str, Any]) -> bool:
+        """Registro reenviado por el cliente tras un envío parcial (ya recibido)"""
+        sender = record.get('sender')
+        if sender is None:
+            return False
+        with self._seq_lock:
+            if record['seq'] <= self._last_seq.get(sender, 0):
+                self.duplicates += 1
+                metrics.CHANNEL_DUPLICATES.inc()
+                return True
+            self._last_seq[sender] = record['seq']
+        return False
@@ -0,0 +1,178 @@
+"""
+EventJournal - Journal append-only de eventos recibidos por sesión
+
+Cada evento recibido de TikTok Live se escribe (antes de agregarse o
+persistirse) como una línea JSON con prefijo de longitud:
+
+    <bytes>:<json>\n
+
+Los segmentos rotan por tamaño y los cerrados se comprimen con gzip en un
+thread en segundo plano. El journal es una fuente de verdad independiente
+de la BD: permite reproducir una sesión y reconstruir `live_events`.
+
+Estructura en disco:
+    journal/session_<id>/segment_000001.jsonl.gz
+    journal/session_<id>/segment_000002.jsonl      <- segmento activo
+"""
+
+import gzip
+import json
+import os
+import shutil
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+
+from django.conf import settings
+from django.utils.dateparse import parse_datetime
+
+
+JOURNAL_DIR = Path(settings.BASE_DIR) / 'journal'
+
+# Campos de LiveEvent que se guardan en cada registro
+LIVE_EVENT_FIELDS = (
+    'event_type', 'timestamp', 'trace_id', 'room_id', 'streamer_unique_id',
+    'user_id', 'user_unique_id', 'user_nickname',
+    'is_streaking', 'streak_id', 'streak_status', 'event_data',
+)
+
+
+def _json_default(value):
+    """Serializa datetimes (timestamp de los eventos) en ISO 8601"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def encode_record(record: Dict[str, Any]) -> bytes:
+    """Codifica un registro como línea con prefijo de longitud"""
+    payload = json.dumps(record, default=_json_default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return str(len(payload)).encode('ascii') + b':' + payload + b'\n'
+
+
+def session_dir(session_id: int, directory: Optional[Path] = None) -> Path:
+    """Directorio del journal de una sesión"""
+    return Path(directory or JOURNAL_DIR) / f'session_{session_id}'
+
+
+class EventJournal:
+    """Escritor append-only con rotación por tamaño y compresión en segundo plano"""
+
+    def __init__(self, session_id: int, max_bytes: int = 64 * 1024 * 1024, directory: Optional[Path] = None):
+        self.session_id = session_id
+        self.max_bytes = max_bytes
+        self.directory = session_dir(session_id, directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._compress_threads = []
+
+        # Continuar después del último segmento existente (reconexiones)
+        self._segment_index = max(
+            (int(p.name[8:14]) for p in self.directory.iterdir() if p.name.startswith('segment_')),
+            default=0
+        )
+        self._file = None
+        self._size = 0
+        self._open_next_segment()
+
+    def _open_next_segment(self):
+        self._segment_index += 1
+        self.path = self.directory / f'segment_{self._segment_index:06d}.jsonl'
+        self._file = open(self.path, 'ab')
+        self._size = self.path.stat().st_size
+
+    def append(self, record: Dict[str, Any]):
+        """Agrega un registro al segmento activo (rota si supera max_bytes)"""
+        line = encode_record(record)
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(line)
+            self._size += len(line)
+            if self._size >= self.max_bytes:
+                self._rotate()
+
+    def flush(self):
+        """Fuerza la escritura del buffer a disco"""
+        with self._lock:
+            if self._file:
+                self._file.flush()
+
+    def _rotate(self):
+        """Cierra el segmento activo, lo comprime en background y abre el siguiente"""
+        self._file.close()
+        closed_path = self.path
+        thread = threading.Thread(target=self._compress, args=(closed_path,), daemon=True)
+        thread.start()
+        self._compress_threads = [t for t in self._compress_threads if t.is_alive()] + [thread]
+        self._open_next_segment()
+
+    @staticmethod
+    def _compress(path: Path):
+        """Comprime un segmento cerrado con gzip y elimina el original"""
+        try:
+            with open(path, 'rb') as src, gzip.open(f'{path}.gz', 'wb') as dst:
+                shutil.copyfileobj(src, dst)
+            os.remove(path)
+        except Exception as e:
+            print(f"❌ [JOURNAL] Error comprimiendo {path.name}: {e}")
+
+    def close(self):
+        """Cierra el journal comprimiendo el último segmento"""
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.close()
+            self._file = None
+            if self._size > 0:
+                self._compress(self.path)
+            else:
+                os.remove(self.path)
+        for thread in self._compress_threads:
+            thread.join(timeout=30)
+
+
+def iter_records(session_id: int, directory: Optional[Path] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Itera los registros del journal de una sesión en orden
+
+    Las líneas truncadas (p.ej. por un corte a mitad de escritura) se ignoran.
+    """
+    path = session_dir(session_id, directory)
+    if not path.exists():
+        return
+
+    segments = sorted(p for p in path.iterdir() if p.name.startswith('segment_'))
+    names = {p.name for p in segments}
+    for segment in segments:
+        # Si el .gz aún se está escribiendo, el original sigue existiendo
+        if segment.suffix == '.gz' and segment.name[:-3] in names:
+            continue
+        yield from iter_file(segment)
+
+
+def iter_file(path: Path) -> Iterator[Dict[str, Any]]:
+    """Itera los registros de un archivo con prefijo de longitud (.jsonl o .jsonl.gz)"""
+    opener = gzip.open if path.suffix == '.gz' else open
+    with opener(path, 'rb') as f:
+        for line in f:
+            length, sep, payload = line.rstrip(b'\n').partition(b':')
+            if not sep or not length.isdigit() or int(length) != len(payload):
+                continue
+            yield json.loads(payload)
+
+
+def build_live_event_kwargs(record: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Convierte un registro del journal en kwargs para LiveEvent (sin sesión)
+
+    Los registros de control (ConnectEvent) no corresponden a filas de live_events
+    y deben filtrarse antes de llamar a esta función.
+    """
+    kwargs = {field: record[field] for field in LIVE_EVENT_FIELDS if field in record}
+    if isinstance(kwargs.get('timestamp'), str):
+        kwargs['timestamp'] = parse_datetime(kwargs['timestamp'])
+    kwargs.setdefault('event_data', {})
+    return kwargs
@@ -0,0 +1,184 @@
+"""
+Comando para archivar sesiones viejas y purgar la cola de eventos terminados
+
+Mantiene chicas las tablas `live_events` y `event_queue` (los COUNT y ORDER BY
+del dispatcher y los workers dependen de su tamaño):
+
+1. Borra items de cola terminados (completed/failed/discarded/expired) más
+   viejos que --queue-retention-hours
+2. Exporta cada sesión terminada hace más de --retention-days a
+   archive/session_<id>.jsonl.gz y borra sus filas en lotes chicos
+
+Uso:
+    python manage.py archive_events
+    python manage.py archive_events --retention-days 7 --dry-run
+    python manage.py archive_events --every 60          # scheduler: cada 60 minutos
+    python manage.py archive_events --restore 42        # volver a cargar la sesión #42
+
+Defaults configurables en Config:
+    archive_retention_days        (default: 14)
+    queue_retention_hours         (default: 24)
+"""
+
+import signal
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from django.utils import timezone
+from apps.app_config.models import Config
+from apps.queue_system.models import EventQueue
+from apps.tiktok_events.archive import (
+    TERMINAL_QUEUE_STATUSES, archive_session, purge_queue, restore_session,
+)
+from apps.tiktok_events.models import LiveSession
+
+
+class Command(BaseCommand):
+    help = 'Archiva sesiones viejas en archivos comprimidos y purga la cola de eventos terminados'
+
+    def __init__(self):
+        super().__init__()
+        self.running = True
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--retention-days',
+            type=float,
+            help='Archivar sesiones terminadas hace más de N días (default: Config archive_retention_days o 14)'
+        )
+        parser.add_argument(
+            '--queue-retention-hours',
+            type=float,
+            help='Borrar items de cola terminados hace más de N horas (default: Config queue_retention_hours o 24)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Filas por DELETE (default: 1000)'
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=0.05,
+            help='Segundos de pausa entre lotes para no competir con los workers (default: 0.05)'
+        )
+        parser.add_argument(
+            '--every',
+            type=float,
+            help='Modo scheduler: repetir cada N minutos hasta Ctrl+C'
+        )
+        parser.add_argument(
+            '--restore',
+            type=int,
+            metavar='SESSION_ID',
+            help='Restaurar a la BD una sesión archivada'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Solo mostrar qué se archivaría/borraría'
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] <= 0:
+            raise CommandError('--batch-size debe ser mayor a 0')
+
+        if options.get('restore') is not None:
+            self._restore(options['restore'], options['batch_size'])
+            return
+
+        every = options.get('every')
+        if not every:
+            self._run_once(options)
+            return
+
+        signal.signal(signal.SIGINT, self._signal_handler)
+        signal.signal(signal.SIGTERM, self._signal_handler)
+        self.stdout.write(self.style.SUCCESS(f'🗄️  Scheduler de archivo: cada {every:g} minutos (Ctrl+C para detener)'))
+
+        while self.running:
+            close_old_connections()
+            try:
+                self._run_once(options)
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f'❌ Error en la corrida: {e}'))
+
+            next_run = time.time() + every * 60
+            while self.running and time.time() < next_run:
+                time.sleep(1)
+
+    def _signal_handler(self, signum, frame):
+        self.stdout.write(self.style.WARNING('\n⚠️  Deteniendo scheduler de archivo...'))
+        self.running = False
+
+    def _run_once(self, options):
+        retention_days = options.get('retention_days')
+        if retention_days is None:
+            retention_days = Config.get_float('archive_retention_days', 14)
+        queue_hours = options.get('queue_retention_hours')
+        if queue_hours is None:
+            queue_hours = Config.get_float('queue_retention_hours', 24)
+
+        now = timezone.now()
+        dry_run = options['dry_run']
+        batch_size = options['batch_size']
+        pause = options['pause']
+
+        self.stdout.write('')
+        self.stdout.write(self.style.SUCCESS('=' * 60))
+        self.stdout.write(self.style.SUCCESS(f'🗄️  ARCHIVO DE EVENTOS{" (dry-run)" if dry_run else ""}'))
+        self.stdout.write(self.style.SUCCESS('=' * 60))
+
+        # 1. Cola: items terminados
+        queue_before = now - timedelta(hours=queue_hours)
+        if dry_run:
+            count = EventQueue.objects.filter(
+                status__in=TERMINAL_QUEUE_STATUSES, created_at__lt=queue_before
+            ).count()
+            self.stdout.write(f'🧹 Cola: se borrarían {count} items terminados (> {queue_hours:g}h)')
+        else:
+            start = time.time()
+            deleted = purge_queue(queue_before, batch_size=batch_size, pause=pause)
+            self.stdout.write(f'🧹 Cola: {deleted} items terminados borrados (> {queue_hours:g}h) en {time.time() - start:.1f}s')
+
+        # 2. Sesiones terminadas
+        sessions_before = now - timedelta(days=retention_days)
+        sessions = LiveSession.objects.filter(
+            status__in=['completed', 'aborted'],
+            ended_at__lt=sessions_before,
+            archived_at__isnull=True
+        ).order_by('ended_at')
+
+        if not sessions.exists():
+            self.stdout.write(f'📭 Sin sesiones para archivar (terminadas hace > {retention_days:g} días)')
+            return
+
+        for session in sessions:
+            if not self.running:
+                break
+            if dry_run:
+                self.stdout.write(f'📦 Se archivaría sesión #{session.id} ({session.streamer_unique_id}, {session.events.count()} eventos)')
+                continue
+
+            start = time.time()
+            try:
+                result = archive_session(session, batch_size=batch_size, pause=pause)
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f'❌ Sesión #{session.id}: {e}'))
+                continue
+            self.stdout.write(
+                f"📦 Sesión #{session.id} ({session.streamer_unique_id}): {result['events']} eventos, "
+                f"{result['queue_items']} items de cola → {session.archive_path} ({time.time() - start:.1f}s)"
+            )
+
+    def _restore(self, session_id, batch_size):
+        self.stdout.write(f'📂 Restaurando sesión #{session_id}...')
+        try:
+            result = restore_session(session_id, batch_size=batch_size)
+        except (FileNotFoundError, ValueError) as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Sesión #{session_id} restaurada: {result['events']} eventos, {result['queue_items']} items de cola"
+        ))
@@ -1,7 +1,15 @@
 import os
+import sys
+import time
+import signal
+import logging
 import django
 from django.core.management.base import BaseCommand
 from apps.tiktok_events.services import TikTokEventCapture
+from apps.tiktok_events.channel import SOCKET_PATH, BatchWriter, EventChannelClient
+from apps.tiktok_events.capture_manager import CaptureManager, resolve_accounts
+from apps.queue_system import metrics
+from apps.queue_system.log_setup import setup_queue_logging
 from apps.app_config.models import Config
 
 
@@ -21,8 +29,41 @@ class Command(BaseCommand):
             help='Nombre opcional para identificar esta sesión',
             required=False
         )
+        parser.add_argument(
+            '--accounts',
+            type=str,
+            help='Capturar varias cuentas en este proceso: "all" (TikTokAccount activas) '
+                 'o usernames separados por coma'
+        )
+        parser.add_argument(
+            '--stats-file',
+            type=str,
+            help='Con --accounts: publicar el estado de cada cuenta en este archivo JSON '
+                 '(lo lee start_event_system)'
+        )
+        parser.add_argument(
+            '--channel',
+            nargs='?',
+            const=str(SOCKET_PATH),
+            help='No guardar en este proceso: enviar los eventos al consumidor por este socket Unix '
+                 '(lo usa start_event_system --capture-process)'
+        )
+        parser.add_argument(
+            '--log-file',
+            type=str,
+            help='Agregar los logs a este archivo además de la consola'
+        )
+        parser.add_argument(
+            '--metrics-port',
+            type=int,
+            default=0,
+            help='Puerto HTTP para las métricas de captura de este proceso (0 = desactivado)'
+        )
 
     def handle(self, *args, **options):
+        if options.get('accounts'):
+            return self._handle_accounts(options)
+
         # Obtener username del argumento o de la configuración
         username = options.get('username')
         session_name = options.get('session_name')
@@ -57,8 +98,28 @@ class Command(BaseCommand):
                 self.style.SUCCESS(f'📝 Nombre de sesión: {session_name}')
             )
 
+        channel = None
+        if options.get('channel'):
+            handlers = [logging.StreamHandler(sys.stdout)]
+            if options.get('log_file'):
+                handlers.append(logging.FileHandler(options['log_file'], encoding='utf-8'))
+            log_listener = setup_queue_logging(handlers=handlers)
+
+            # SIGTERM del proceso padre: cerrar la sesión igual que con Ctrl+C
+            signal.signal(signal.SIGTERM, self._raise_interrupt)
+
+            channel = EventChannelClient(
+                options['channel'],
+                max_buffer=int(Config.get_float('capture_channel_buffer', 100000))
+            )
+            channel.start()
+            self.stdout.write(self.style.SUCCESS(f'🔌 Enviando eventos por {options["channel"]}'))
+
+        if options.get('metrics_port'):
+            metrics.start_http_server(options['metrics_port'])
+
         try:
-            capture = TikTokEventCapture(username, session_name=session_name)
+            capture = TikTokEventCapture(username, session_name=session_name, channel=channel)
             capture.start()
         except KeyboardInterrupt:
             self.stdout.write(
@@ -68,3 +129,62 @@ class Command(BaseCommand):
             self.stdout.write(
                 self.style.ERROR(f'❌ Error: {str(e)}')
             )
+        finally:
+            if channel:
+                channel.close()
+                log_listener.stop()
+
+    def _handle_accounts(self, options):
+        """Varias cuentas en un solo loop (CaptureManager)"""
+        usernames = resolve_accounts(options['accounts'])
+        if not usernames:
+            self.stdout.write(self.style.ERROR('❌ Error: No hay cuentas para capturar'))
+            return
+
+        handlers = [logging.StreamHandler(sys.stdout)]
+        if options.get('log_file'):
+            handlers.append(logging.FileHandler(options['log_file'], encoding='utf-8'))
+        log_listener = setup_queue_logging(handlers=handlers)
+        signal.signal(signal.SIGTERM, self._raise_interrupt)
+
+        # Un único sink para todas las cuentas: el canal o un BatchWriter local
+        if options.get('channel'):
+            sink = EventChannelClient(
+                options['channel'],
+                max_buffer=int(Config.get_float('capture_channel_buffer', 100000))
+            )
+            self.stdout.write(self.style.SUCCESS(f'🔌 Enviando eventos por {options["channel"]}'))
+        else:
+            sink = BatchWriter(batch_size=int(Config.get_float('capture_channel_batch_size', 200)))
+        sink.start()
+
+        if options.get('metrics_port'):
+            metrics.start_http_server(options['metrics_port'])
+
+        self.stdout.write(
+            self.style.SUCCESS(f'📡 Iniciando captura de {len(usernames)} cuentas: '
+                               + ', '.join(f'@{name}' for name in usernames))
+        )
+        manager = CaptureManager(
+            usernames,
+            sink=sink,
+            session_name=options.get('session_name'),
+            stats_path=options.get('stats_file'),
+        )
+        try:
+            manager.start()
+            while manager.alive:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING('\n⏹️ Captura detenida por el usuario'))
+        finally:
+            manager.stop()
+            if options.get('channel'):
+                sink.close()
+            else:
+                sink.stop()
+            log_listener.stop()
+
+    @staticmethod
+    def _raise_interrupt(signum, frame):
+        raise KeyboardInterrupt
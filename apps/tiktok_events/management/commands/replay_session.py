@@ -0,0 +1,335 @@
+"""
+Comando para reproducir una sesión grabada a través del EventDispatcher
+
+Re-emite los eventos de una sesión (desde live_events o desde su journal)
+en una sesión nueva, respetando el timing original, a N× velocidad o tan
+rápido como sea posible. Sirve para pruebas de carga y latencia con el
+tráfico real de un live.
+
+Uso:
+    python manage.py replay_session 42
+    python manage.py replay_session 42 --speed 4
+    python manage.py replay_session 42 --fast --source journal
+    python manage.py replay_session 42 --event-types GiftEvent,CommentEvent
+
+Requiere los workers corriendo en otro proceso para medir latencias:
+    python manage.py start_event_system --simulator
+
+Reporte:
+    - Throughput de emisión (eventos/s) y tiempo de dispatch
+    - Profundidad de colas por servicio (muestreada cada segundo)
+    - Latencia de completado por servicio (p50/p95/p99) desde que se encola
+"""
+
+import signal
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from django.utils import timezone
+from apps.tiktok_events.models import LiveSession, LiveEvent
+from apps.tiktok_events.journal import iter_records, build_live_event_kwargs
+from apps.queue_system.dispatcher import EventDispatcher
+from apps.queue_system.metrics import summarize
+from apps.queue_system.models import Service, EventQueue
+
+
+# Eventos que se guardan pero no se distribuyen (ningún servicio los procesa)
+STORE_ONLY_TYPES = {'ViewerCountEvent', 'JoinRollupEvent'}
+
+
+class Command(BaseCommand):
+    help = 'Reproduce una sesión grabada (BD o journal) a través del EventDispatcher'
+
+    def __init__(self):
+        super().__init__()
+        self.running = True
+        self.replay_session = None
+        self.depth_samples = defaultdict(list)
+        self.dispatch_times = []
+        self.stats = {
+            'emitted': 0,
+            'dispatched': 0,
+            'enqueued': 0,
+            'skipped': 0,
+            'discarded': 0,
+            'queue_full': 0,
+            'rate_limited': 0,
+        }
+
+    def add_arguments(self, parser):
+        parser.add_argument('session_id', type=int, help='ID de la sesión a reproducir')
+        parser.add_argument(
+            '--source',
+            choices=['db', 'journal'],
+            default='db',
+            help='Origen de los eventos: tabla live_events (db) o journal de la sesión'
+        )
+        parser.add_argument(
+            '--speed',
+            type=float,
+            default=1.0,
+            help='Multiplicador de velocidad respecto al timing original (default: 1.0)'
+        )
+        parser.add_argument(
+            '--fast',
+            action='store_true',
+            help='Emitir tan rápido como sea posible (ignora el timing original)'
+        )
+        parser.add_argument(
+            '--event-types',
+            type=str,
+            help='Solo reproducir estos tipos (separados por coma, ej: GiftEvent,CommentEvent)'
+        )
+        parser.add_argument(
+            '--drain-timeout',
+            type=float,
+            default=60.0,
+            help='Segundos máximos esperando que las colas terminen al final (default: 60)'
+        )
+
+    def handle(self, *args, **options):
+        signal.signal(signal.SIGINT, self._signal_handler)
+        signal.signal(signal.SIGTERM, self._signal_handler)
+
+        session_id = options['session_id']
+        source = options['source']
+        speed = options['speed']
+        fast = options['fast']
+        event_types = None
+        if options.get('event_types'):
+            event_types = {t.strip() for t in options['event_types'].split(',') if t.strip()}
+
+        if speed <= 0:
+            raise CommandError('--speed debe ser mayor a 0')
+
+        try:
+            original = LiveSession.objects.get(id=session_id)
+        except LiveSession.DoesNotExist:
+            raise CommandError(f'Sesión #{session_id} no encontrada')
+
+        if original.archived_at and source == 'db':
+            raise CommandError(
+                f'La sesión #{session_id} está archivada: restaurarla con '
+                f'"python manage.py archive_events --restore {session_id}" o usar --source journal'
+            )
+
+        records = self._load_records(original, source, event_types)
+        if not records:
+            raise CommandError(f'La sesión #{session_id} no tiene eventos para reproducir ({source})')
+
+        self._show_banner(original, source, len(records), speed, fast)
+        self.replay_session = self._create_session(original)
+
+        # Muestreo de profundidad de colas en background
+        sampler = threading.Thread(target=self._sample_queue_depths, daemon=True)
+        sampler.start()
+
+        start_time = time.time()
+        self._emit(records, speed, fast)
+        emit_elapsed = time.time() - start_time
+
+        self._wait_for_drain(options['drain_timeout'])
+        self.running = False
+        sampler.join(timeout=2)
+
+        self.replay_session.end_session(status='completed')
+        self._show_summary(emit_elapsed)
+
+    def _signal_handler(self, signum, frame):
+        self.stdout.write("\n⚠️  Deteniendo replay...")
+        self.running = False
+
+    def _load_records(self, session, source, event_types):
+        """
+        Carga los eventos a reproducir como (offset_segundos, kwargs de LiveEvent)
+        """
+        records = []
+
+        if source == 'journal':
+            for record in iter_records(session.id):
+                if record.get('event_type') == 'ConnectEvent':
+                    continue
+                if event_types and record.get('event_type') not in event_types:
+                    continue
+                records.append((record.get('received_at', 0.0), build_live_event_kwargs(record)))
+        else:
+            events = LiveEvent.objects.filter(session=session).order_by('timestamp', 'id')
+            if event_types:
+                events = events.filter(event_type__in=event_types)
+            for event in events.iterator():
+                records.append((event.timestamp.timestamp(), {
+                    'event_type': event.event_type,
+                    'user_id': event.user_id,
+                    'user_unique_id': event.user_unique_id,
+                    'user_nickname': event.user_nickname,
+                    'is_streaking': event.is_streaking,
+                    'streak_id': event.streak_id,
+                    'streak_status': event.streak_status,
+                    'event_data': event.event_data,
+                }))
+
+        if not records:
+            return []
+
+        records.sort(key=lambda r: r[0])
+        first = records[0][0]
+        return [(ts - first, kwargs) for ts, kwargs in records]
+
+    def _create_session(self, original):
+        """Crea la sesión donde se guardan los eventos reproducidos"""
+        session = LiveSession.objects.create(
+            name=f"[REPLAY] Sesión #{original.id} - {datetime.now().strftime('%Y-%m-%d %H:%M')}",
+            status='active',
+            room_id=original.room_id,
+            streamer_unique_id=original.streamer_unique_id,
+            notes=f'Replay de la sesión #{original.id} generado por replay_session'
+        )
+        self.stdout.write(f"📋 Sesión de replay creada: ID {session.id}")
+        self.stdout.write("-" * 60)
+        return session
+
+    def _emit(self, records, speed, fast):
+        """Re-emite los eventos respetando el timing (open-loop: no espera a los workers)"""
+        start = time.monotonic()
+        total = len(records)
+
+        for offset, kwargs in records:
+            if not self.running:
+                break
+
+            if not fast:
+                delay = start + offset / speed - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+
+            kwargs = dict(kwargs)
+            kwargs.pop('room_id', None)
+            kwargs.pop('streamer_unique_id', None)
+            kwargs.pop('trace_id', None)
+            kwargs['timestamp'] = timezone.now()
+
+            event = LiveEvent.objects.create(
+                session=self.replay_session,
+                room_id=self.replay_session.room_id,
+                streamer_unique_id=self.replay_session.streamer_unique_id,
+                **kwargs
+            )
+            self.stats['emitted'] += 1
+
+            if event.event_type not in STORE_ONLY_TYPES:
+                dispatch_start = time.perf_counter()
+                result = EventDispatcher.dispatch(event)
+                self.dispatch_times.append(time.perf_counter() - dispatch_start)
+                self.stats['dispatched'] += 1
+                for outcome in ('enqueued', 'skipped', 'discarded', 'queue_full', 'rate_limited'):
+                    self.stats[outcome] += len(result.get(outcome, []))
+
+            if self.stats['emitted'] % 50 == 0 or self.stats['emitted'] == total:
+                progress = self.stats['emitted'] / total * 100
+                print(f"\r  Emitidos: {self.stats['emitted']}/{total} ({progress:.0f}%)  ", end='', flush=True)
+
+        self.replay_session.total_events = self.stats['emitted']
+        self.replay_session.save(update_fields=['total_events'])
+        self.stdout.write("")
+
+    def _sample_queue_depths(self):
+        """Muestrea la cantidad de pendientes por servicio cada segundo"""
+        services = list(Service.objects.filter(is_active=True))
+        while self.running:
+            close_old_connections()
+            for service in services:
+                pending = EventQueue.objects.filter(service=service, status='pending').count()
+                self.depth_samples[service.name].append(pending)
+            time.sleep(1)
+
+    def _wait_for_drain(self, timeout):
+        """Espera a que los items del replay dejen de estar pendientes/en proceso"""
+        if timeout <= 0:
+            return
+
+        self.stdout.write("⏳ Esperando que las colas terminen...")
+        deadline = time.time() + timeout
+        while self.running and time.time() < deadline:
+            remaining = EventQueue.objects.filter(
+                session=self.replay_session,
+                status__in=['pending', 'processing']
+            ).count()
+            if remaining == 0:
+                return
+            time.sleep(0.5)
+
+        self.stdout.write(self.style.WARNING("⚠️  Timeout esperando colas (¿están corriendo los workers?)"))
+
+    def _show_banner(self, session, source, total, speed, fast):
+        self.stdout.write("")
+        self.stdout.write(self.style.SUCCESS("=" * 60))
+        self.stdout.write(self.style.SUCCESS("🔁 REPLAY DE SESIÓN"))
+        self.stdout.write(self.style.SUCCESS("=" * 60))
+        self.stdout.write("")
+        self.stdout.write(f"📼 Sesión original: #{session.id} ({session.streamer_unique_id})")
+        self.stdout.write(f"📂 Origen: {source}")
+        self.stdout.write(f"📦 Eventos: {total}")
+        self.stdout.write(f"⏩ Velocidad: {'máxima' if fast else f'{speed}x'}")
+        self.stdout.write("")
+        self.stdout.write(self.style.WARNING("💡 Los workers deben estar corriendo (start_event_system --simulator)"))
+        self.stdout.write("-" * 60)
+
+    def _show_summary(self, emit_elapsed):
+        self.stdout.write("")
+        self.stdout.write(self.style.SUCCESS("=" * 60))
+        self.stdout.write(self.style.SUCCESS("📊 RESUMEN DE REPLAY"))
+        self.stdout.write(self.style.SUCCESS("=" * 60))
+        self.stdout.write("")
+
+        throughput = self.stats['emitted'] / emit_elapsed if emit_elapsed > 0 else 0
+        self.stdout.write(f"⏱️  Tiempo de emisión: {emit_elapsed:.1f}s")
+        self.stdout.write(f"📦 Eventos emitidos: {self.stats['emitted']} ({throughput:.1f} ev/s)")
+        self.stdout.write(
+            f"📨 Dispatch: {self.stats['enqueued']} encolados | {self.stats['skipped']} saltados | "
+            f"{self.stats['discarded']} descartados | {self.stats['queue_full']} cola llena | "
+            f"{self.stats['rate_limited']} limitados"
+        )
+
+        if self.dispatch_times:
+            d = summarize(self.dispatch_times)
+            self.stdout.write(
+                f"⚡ Latencia de dispatch: p50 {d['p50'] * 1000:.1f}ms | "
+                f"p95 {d['p95'] * 1000:.1f}ms | p99 {d['p99'] * 1000:.1f}ms"
+            )
+
+        if self.depth_samples:
+            self.stdout.write("")
+            self.stdout.write("📥 Profundidad de colas (pendientes):")
+            for service_name, samples in self.depth_samples.items():
+                if samples:
+                    avg = sum(samples) / len(samples)
+                    self.stdout.write(f"   • {service_name}: máx {max(samples)} | prom {avg:.1f}")
+
+        # Latencia de completado por servicio: desde que se encola hasta processed_at
+        latencies = defaultdict(list)
+        statuses = defaultdict(lambda: defaultdict(int))
+        items = EventQueue.objects.filter(session=self.replay_session).select_related('service')
+        for item in items:
+            statuses[item.service.name][item.status] += 1
+            if item.status == 'completed' and item.processed_at:
+                latencies[item.service.name].append((item.processed_at - item.created_at).total_seconds())
+
+        if statuses:
+            self.stdout.write("")
+            self.stdout.write("🏁 Latencia de completado por servicio:")
+            for service_name, counts in statuses.items():
+                summary = summarize(latencies[service_name])
+                counts_display = ', '.join(f"{status}: {n}" for status, n in sorted(counts.items()))
+                self.stdout.write(f"   • {service_name} ({counts_display})")
+                if summary['count']:
+                    self.stdout.write(
+                        f"     p50 {summary['p50']:.2f}s | p95 {summary['p95']:.2f}s | "
+                        f"p99 {summary['p99']:.2f}s | máx {summary['max']:.2f}s"
+                    )
+
+        self.stdout.write("")
+        self.stdout.write(f"📋 Session ID del replay: {self.replay_session.id}")
+        self.stdout.write(self.style.SUCCESS("=" * 60))
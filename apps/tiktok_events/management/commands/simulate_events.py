@@ -6,6 +6,10 @@ Uso:
     python manage.py simulate_events --duration 60 --interval 2 --verbose
     python manage.py simulate_events --forever --interval 5
 
+Modo carga (N productores concurrentes a una tasa objetivo):
+    python manage.py simulate_events --rate 200 --producers 8 --duration 60
+    python manage.py simulate_events --rate 500 --producers 16 --mix like_flood --warmup 10
+
 Eventos simulados:
     - Ice Cream Cone: LLM + TTS + restart (P:10)
     - Rose: TTS simple (P:9)
@@ -14,6 +18,18 @@ Eventos simulados:
     - Comentarios !cancion: Solicitud de música
     - Enjoy Music: GIF overlay (P:8)
 
+Mezclas para modo carga (--mix):
+    - default: usa --weights (regalos + !cancion)
+    - viral: likes y joins dominan, con chat y regalos esporádicos
+    - like_flood / join_flood: inundación de likes / joins
+
+El modo carga usa pacing open-loop: cada productor tiene un calendario fijo
+de envíos y no espera a que el dispatch anterior termine para agendar el
+siguiente (si se atrasa, envía de inmediato). Así la latencia medida no se
+esconde bajando la tasa. El resumen muestra la latencia de respuesta (desde el
+momento agendado hasta que termina el dispatch, incluye el atraso de los
+productores) y la de servicio (solo el dispatch).
+
 Validación:
     Revisar logs/event_system.log para verificar:
     - [DISPATCHER] Regalo 'X' → Prioridad: Y
@@ -27,11 +43,25 @@ import time
 import random
 import signal
 import sys
+import threading
+from collections import defaultdict
 from datetime import datetime
 from django.core.management.base import BaseCommand
 from django.utils import timezone
 from apps.tiktok_events.models import LiveSession, LiveEvent
 from apps.queue_system.dispatcher import EventDispatcher
+from apps.queue_system.metrics import summarize
+
+
+# Mezclas de eventos para el modo carga (pesos relativos)
+MIX_PRESETS = {
+    'viral': {
+        'like': 60, 'join': 20, 'chat': 10, 'rose': 4, 'awesome': 2,
+        'gg': 1, 'ice_cream': 1, 'music_comment': 1, 'enjoy_music': 1,
+    },
+    'like_flood': {'like': 90, 'join': 5, 'chat': 3, 'rose': 2},
+    'join_flood': {'join': 85, 'like': 10, 'chat': 3, 'rose': 2},
+}
 
 
 class Command(BaseCommand):
@@ -48,8 +78,20 @@ class Command(BaseCommand):
             'gg': 0,
             'music_comment': 0,
             'enjoy_music': 0,
+            'like': 0,
+            'join': 0,
+            'chat': 0,
             'total': 0,
         }
+        # Modo carga: estado compartido entre productores
+        self.load_mode = False
+        self.stats_lock = threading.Lock()
+        self.dispatch_times = []
+        self.response_times = []  # desde el envío agendado (sin omisión coordinada)
+        self.service_stats = defaultdict(lambda: defaultdict(int))
+        self.late_sends = 0
+        self.measured_events = 0
+        self.errors = 0
         # Nombres de usuario aleatorios para simular variedad
         self.usernames = [
             'Carlos_Gaming', 'Maria_Live', 'Pedro_TikTok', 'Ana_Streamer',
@@ -92,6 +134,30 @@ class Command(BaseCommand):
             default='ice_cream:1,rose:3,awesome:4,gg:2,music:1,enjoy:2',
             help='Pesos de probabilidad para cada tipo de evento'
         )
+        parser.add_argument(
+            '--rate',
+            type=float,
+            default=0,
+            help='Modo carga: eventos por segundo objetivo (total entre productores)'
+        )
+        parser.add_argument(
+            '--producers',
+            type=int,
+            default=4,
+            help='Modo carga: cantidad de productores concurrentes (default: 4)'
+        )
+        parser.add_argument(
+            '--mix',
+            choices=['default'] + list(MIX_PRESETS),
+            default='default',
+            help='Modo carga: mezcla de tipos de evento (default: usa --weights)'
+        )
+        parser.add_argument(
+            '--warmup',
+            type=float,
+            default=0,
+            help='Modo carga: segundos iniciales excluidos de las métricas (default: 0)'
+        )
 
     def handle(self, *args, **options):
         # Configurar señal para Ctrl+C
@@ -106,6 +172,12 @@ class Command(BaseCommand):
         # Parsear pesos
         weights = self._parse_weights(options['weights'])
 
+        if options['rate'] > 0:
+            if options['mix'] != 'default':
+                weights = MIX_PRESETS[options['mix']]
+            self._run_load(options, weights)
+            return
+
         # Banner
         self._show_banner(duration, interval, forever, weights)
 
@@ -264,6 +336,16 @@ class Command(BaseCommand):
         elif event_type == 'music_comment':
             song = random.choice(self.songs)
             return self._create_comment_event(song, username, user_id)
+        elif event_type == 'chat':
+            comment = random.choice(['🔥🔥🔥', 'hola!', 'jajaja', 'saludos desde MX', 'GG'])
+            return self._create_comment_event(comment, username, user_id)
+        elif event_type == 'like':
+            return self._create_user_event('LikeEvent', username, user_id, {
+                'like_count': random.choice([1, 1, 1, 5, 15]),
+                'total_likes': random.randint(1000, 500000),
+            })
+        elif event_type == 'join':
+            return self._create_user_event('JoinEvent', username, user_id, {})
 
         return None
 
@@ -295,7 +377,7 @@ class Command(BaseCommand):
                 }
             }
         )
-        self.session.increment_events()
+        self._count_event()
         return event
 
     def _create_comment_event(self, comment, username, user_id):
@@ -318,9 +400,215 @@ class Command(BaseCommand):
                 }
             }
         )
-        self.session.increment_events()
+        self._count_event()
+        return event
+
+    def _create_user_event(self, event_type, username, user_id, extra_data):
+        """Crea un evento simple de usuario (LikeEvent, JoinEvent)"""
+        event = LiveEvent.objects.create(
+            session=self.session,
+            event_type=event_type,
+            timestamp=timezone.now(),
+            room_id=self.session.room_id,
+            streamer_unique_id=self.session.streamer_unique_id,
+            user_id=user_id,
+            user_unique_id=username.lower().replace(' ', '_'),
+            user_nickname=username,
+            event_data={
+                **extra_data,
+                'user': {
+                    'unique_id': username.lower().replace(' ', '_'),
+                    'nickname': username,
+                    'user_id': user_id,
+                }
+            }
+        )
+        self._count_event()
         return event
 
+    def _count_event(self):
+        """
+        Incrementa el contador de la sesión
+
+        En modo carga los productores comparten la sesión, así que el total
+        se guarda una sola vez al final en lugar de un UPDATE por evento.
+        """
+        if not self.load_mode:
+            self.session.increment_events()
+
+    # ========================================
+    # MODO CARGA
+    # ========================================
+
+    def _run_load(self, options, weights):
+        """Ejecuta N productores concurrentes a una tasa objetivo"""
+        self.load_mode = True
+        rate = options['rate']
+        producers = max(1, options['producers'])
+        duration = options['duration']
+        warmup = max(0.0, options['warmup'])
+
+        self._show_load_banner(rate, producers, duration, warmup, options['mix'], weights)
+        self.session = self._create_session()
+
+        start = time.monotonic()
+        measure_from = start + warmup
+        end = None if options['forever'] else start + warmup + duration
+
+        threads = [
+            threading.Thread(
+                target=self._producer_loop,
+                args=(index, rate / producers, start + index / rate, measure_from, end, weights),
+                daemon=True,
+                name=f'producer-{index}'
+            )
+            for index in range(producers)
+        ]
+        for thread in threads:
+            thread.start()
+
+        try:
+            while self.running and any(t.is_alive() for t in threads):
+                elapsed = time.monotonic() - start
+                phase = 'warmup' if time.monotonic() < measure_from else 'midiendo'
+                self.stdout.write(f"\r  [{phase}] {elapsed:.0f}s | Eventos: {self.stats['total']}  ", ending='')
+                self.stdout.flush()
+                time.sleep(0.5)
+        except KeyboardInterrupt:
+            self.running = False
+
+        for thread in threads:
+            thread.join(timeout=10)
+
+        stop = time.monotonic()
+        if end:
+            stop = min(stop, end)
+        measured_elapsed = max(0.0, stop - measure_from)
+        self.session.total_events = self.stats['total']
+        self.session.save(update_fields=['total_events'])
+        self._show_load_summary(rate, measured_elapsed)
+
+    def _producer_loop(self, index, producer_rate, first_send, measure_from, end, weights):
+        """
+        Productor con pacing open-loop
+
+        El envío N está agendado en first_send + N / producer_rate (cada
+        productor arranca desfasado para no enviar todos a la vez), sin
+        importar cuánto tardaron los envíos anteriores.
+        """
+        from django.db import close_old_connections
+
+        interval = 1.0 / producer_rate
+        next_send = first_send
+        try:
+            while self.running:
+                now = time.monotonic()
+                if end and now >= end:
+                    break
+
+                if next_send > now:
+                    time.sleep(next_send - now)
+                elif now - next_send > interval:
+                    with self.stats_lock:
+                        self.late_sends += 1
+
+                scheduled = next_send
+                next_send += interval
+                measuring = scheduled >= measure_from
+
+                event_type = self._choose_event_type(weights)
+                try:
+                    event = self._create_event(event_type, False)
+                    dispatch_start = time.perf_counter()
+                    result = EventDispatcher.dispatch(event)
+                    dispatch_time = time.perf_counter() - dispatch_start
+                    # Latencia de respuesta: desde el envío agendado, no desde que el productor pudo enviarlo
+                    response_time = time.monotonic() - scheduled
+                except Exception as e:
+                    with self.stats_lock:
+                        self.errors += 1
+                    self.stdout.write(self.style.ERROR(f"\n❌ [SIMULATE] Productor {index}: {e}"))
+                    continue
+
+                with self.stats_lock:
+                    self.stats['total'] += 1
+                    self.stats[event_type] += 1
+                    if measuring:
+                        self.measured_events += 1
+                        self.dispatch_times.append(dispatch_time)
+                        self.response_times.append(response_time)
+                        for outcome in ('enqueued', 'skipped', 'discarded', 'queue_full', 'rate_limited'):
+                            for entry in result.get(outcome, []):
+                                self.service_stats[entry['service']][outcome] += 1
+                                if entry.get('discarded_event'):
+                                    self.service_stats[entry['service']]['displaced'] += 1
+        finally:
+            close_old_connections()
+
+    def _show_load_banner(self, rate, producers, duration, warmup, mix, weights):
+        self.stdout.write("")
+        self.stdout.write(self.style.SUCCESS("=" * 60))
+        self.stdout.write(self.style.SUCCESS("🚀 GENERADOR DE CARGA DE EVENTOS TIKTOK"))
+        self.stdout.write(self.style.SUCCESS("=" * 60))
+        self.stdout.write("")
+        self.stdout.write(f"🎯 Tasa objetivo: {rate:.0f} eventos/s ({producers} productores)")
+        self.stdout.write(f"🔥 Warmup: {warmup:.0f}s | Medición: {duration}s")
+        self.stdout.write(f"🎲 Mezcla: {mix}")
+        total_weight = sum(weights.values())
+        for event_type, weight in weights.items():
+            self.stdout.write(f"   • {event_type}: {weight / total_weight * 100:.0f}%")
+        self.stdout.write("")
+        self.stdout.write(self.style.WARNING("💡 Presiona Ctrl+C para detener"))
+        self.stdout.write("-" * 60)
+
+    def _show_load_summary(self, target_rate, measured_elapsed):
+        self.stdout.write("")
+        self.stdout.write("")
+        self.stdout.write(self.style.SUCCESS("=" * 60))
+        self.stdout.write(self.style.SUCCESS("📊 RESUMEN DE CARGA"))
+        self.stdout.write(self.style.SUCCESS("=" * 60))
+        self.stdout.write("")
+
+        achieved = self.measured_events / measured_elapsed if measured_elapsed > 0 else 0
+        self.stdout.write(f"📦 Total eventos: {self.stats['total']} ({self.measured_events} medidos)")
+        self.stdout.write(f"🎯 Tasa lograda: {achieved:.1f} ev/s (objetivo {target_rate:.0f} ev/s)")
+        self.stdout.write(f"🐢 Envíos atrasados más de un intervalo: {self.late_sends}")
+        if self.errors:
+            self.stdout.write(self.style.ERROR(f"❌ Errores: {self.errors}"))
+
+        if self.response_times:
+            r = summarize(self.response_times)
+            self.stdout.write(
+                f"⏱️  Latencia de respuesta (desde el envío agendado): p50 {r['p50'] * 1000:.1f}ms | "
+                f"p95 {r['p95'] * 1000:.1f}ms | p99 {r['p99'] * 1000:.1f}ms | máx {r['max'] * 1000:.1f}ms"
+            )
+        if self.dispatch_times:
+            d = summarize(self.dispatch_times)
+            self.stdout.write(
+                f"⚡ Latencia de servicio (solo dispatch): p50 {d['p50'] * 1000:.1f}ms | p95 {d['p95'] * 1000:.1f}ms | "
+                f"p99 {d['p99'] * 1000:.1f}ms | máx {d['max'] * 1000:.1f}ms"
+            )
+
+        self.stdout.write("")
+        self.stdout.write("📈 Desglose por tipo:")
+        for event_type in sorted(k for k in self.stats if k != 'total' and self.stats[k]):
+            self.stdout.write(f"   • {event_type}: {self.stats[event_type]}")
+
+        if self.service_stats:
+            self.stdout.write("")
+            self.stdout.write("🧩 Resultado por servicio (periodo medido):")
+            for service_name, counts in sorted(self.service_stats.items()):
+                self.stdout.write(
+                    f"   • {service_name}: {counts['enqueued']} encolados | "
+                    f"{counts['displaced']} desplazados | {counts['discarded']} descartados | "
+                    f"{counts['queue_full']} cola llena | {counts['skipped']} saltados | "
+                    f"{counts['rate_limited']} limitados"
+                )
+
+        self.stdout.write("")
+        self.stdout.write(f"📋 Session ID: {self.session.id}")
+        self.stdout.write(self.style.SUCCESS("=" * 60))
+
     def _show_dispatch_result(self, event_type, result):
         """Muestra resultado del dispatch en modo verbose"""
         emoji = {
@@ -353,9 +641,10 @@ class Command(BaseCommand):
             bar_len = 20
             filled = int(bar_len * progress / 100)
             bar = "█" * filled + "░" * (bar_len - filled)
-            print(f"\r  [{bar}] {progress:.0f}% | Eventos: {count} | Restante: {remaining:.0f}s  ", end='', flush=True)
+            self.stdout.write(f"\r  [{bar}] {progress:.0f}% | Eventos: {count} | Restante: {remaining:.0f}s  ", ending='')
         else:
-            print(f"\r  Eventos enviados: {count}  ", end='', flush=True)
+            self.stdout.write(f"\r  Eventos enviados: {count}  ", ending='')
+        self.stdout.flush()
 
     def _show_summary(self, elapsed_time):
         """Muestra resumen final"""
@@ -11,12 +11,19 @@ Uso:
     python manage.py start_event_system
     python manage.py start_event_system --session-name "Sesión noche"
     python manage.py start_event_system --verbose
+    python manage.py start_event_system --worker-processes   # cada servicio en su proceso
+    python manage.py start_event_system --capture-process    # captura en su proceso (socket Unix)
+    python manage.py start_event_system --accounts all       # todas las TikTokAccount activas
+    python manage.py start_event_system --accounts all --capture-process --capture-shards 4
 
-Nota: El username de TikTok se obtiene de la tabla Config (meta_key='tiktok_user')
+Nota: El username de TikTok se obtiene de la tabla Config (meta_key='tiktok_user'),
+salvo con --accounts
 """
 
 import os
+import asyncio
 import logging
+import subprocess
 import django
 import signal
 import sys
@@ -26,14 +33,28 @@ from datetime import datetime
 from django.conf import settings
 from django.core.management.base import BaseCommand
 from apps.tiktok_events.services import TikTokEventCapture
+from apps.tiktok_events.channel import SOCKET_PATH, BatchWriter, EventChannelServer
+from apps.tiktok_events.capture_manager import (
+    STATS_DIR, CaptureManager, read_capture_stats, resolve_accounts, shard_accounts,
+)
+from apps.tiktok_events.models import LiveSession
 from apps.queue_system.models import Service, EventQueue
-from apps.queue_system.worker import ServiceWorker
+from apps.queue_system.worker import create_worker
+from apps.queue_system.supervisor import WorkerSupervisor, parse_groups
+from apps.queue_system import metrics, tracing
+from apps.queue_system.log_setup import setup_queue_logging
 from apps.app_config.models import Config
 
 
 # Ruta del archivo de log
 LOG_FILE = os.path.join(settings.BASE_DIR, 'logs', 'event_system.log')
 
+# Cada proceso hijo expone sus propias métricas: el proceso de captura i en
+# --metrics-port + CAPTURE_METRICS_OFFSET + i y, con --worker-processes, el
+# proceso de workers i en --metrics-port + WORKER_METRICS_OFFSET + i
+CAPTURE_METRICS_OFFSET = 1
+WORKER_METRICS_OFFSET = 50
+
 
 class Command(BaseCommand):
     help = 'Inicia el sistema completo: captura de TikTok + workers de servicios'
@@ -42,16 +63,30 @@ class Command(BaseCommand):
         super().__init__()
         self.running = True
         self.workers = []
+        self.supervisor = None
         self.tiktok_capture = None
         self.tiktok_thread = None
+        self.capture_processes = []  # [(Popen, archivo de estado o None)]
+        self.capture_manager = None
+        self.capture_writer = None
+        self.channel_server = None
+        self.usernames = []
+        self.metrics_port = 0
+        self.log_listener = None
         self.stats = {
             'events_captured': 0,
             'events_queued': 0,
             'start_time': None
         }
 
-    def _setup_logging(self):
-        """Configura logging a archivo (borra el anterior al iniciar)"""
+    def _setup_logging(self, verbose=False):
+        """
+        Configura logging a archivo (borra el anterior al iniciar)
+
+        Los threads solo encolan registros; el QueueListener escribe a archivo
+        y consola en su propio thread. Sin --verbose el nivel es INFO y los
+        logger.debug() de los workers se descartan sin formatear.
+        """
         # Crear directorio si no existe
         log_dir = os.path.dirname(LOG_FILE)
         os.makedirs(log_dir, exist_ok=True)
@@ -60,15 +95,15 @@ class Command(BaseCommand):
         if os.path.exists(LOG_FILE):
             os.remove(LOG_FILE)
 
-        # Configurar logging
-        logging.basicConfig(
-            level=logging.DEBUG,
-            format='%(asctime)s [%(levelname)s] %(message)s',
-            datefmt='%Y-%m-%d %H:%M:%S',
+        # Configurar logging no bloqueante (con muestreo de mensajes repetitivos)
+        self.log_listener = setup_queue_logging(
             handlers=[
                 logging.FileHandler(LOG_FILE, encoding='utf-8'),
                 logging.StreamHandler(sys.stdout)  # También a consola
-            ]
+            ],
+            level=logging.DEBUG if verbose else logging.INFO,
+            burst=int(Config.get_float('log_sample_burst', 20)),
+            every=int(Config.get_float('log_sample_every', 100)),
         )
 
         # Redirigir prints a logging manteniendo compatibilidad con file object
@@ -97,7 +132,7 @@ class Command(BaseCommand):
         # Redirigir stdout para capturar prints
         sys.stdout = PrintLogger(sys.stdout, logging.getLogger('stdout'))
 
-        logging.info(f"📝 Log iniciado: {LOG_FILE}")
+        logging.info("📝 Log iniciado: %s", LOG_FILE)
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -116,10 +151,40 @@ class Command(BaseCommand):
             action='store_true',
             help='Modo simulador: solo inicia workers sin conectar a TikTok (usar con /simulator/)'
         )
+        parser.add_argument(
+            '--metrics-port',
+            type=int,
+            default=9108,
+            help='Puerto HTTP para métricas Prometheus en /metrics (0 = desactivado, default: 9108)'
+        )
+        parser.add_argument(
+            '--worker-processes',
+            action='store_true',
+            help='Correr cada servicio (o grupo de Config worker_process_groups) en su propio proceso, '
+                 'fuera del GIL de la captura'
+        )
+        parser.add_argument(
+            '--capture-process',
+            action='store_true',
+            help='Correr la conexión a TikTok en su propio proceso; este proceso recibe los eventos '
+                 'por un socket Unix y los guarda/distribuye en lotes'
+        )
+        parser.add_argument(
+            '--accounts',
+            type=str,
+            help='Capturar varias cuentas a la vez: "all" (TikTokAccount activas) o usernames '
+                 'separados por coma (en lugar de tiktok_user)'
+        )
+        parser.add_argument(
+            '--capture-shards',
+            type=int,
+            help='Con --accounts y --capture-process: cantidad de procesos de captura entre los que '
+                 'se reparten las cuentas (default: capture_shards de Config, 1)'
+        )
 
     def handle(self, *args, **options):
         # Configurar logging a archivo
-        self._setup_logging()
+        self._setup_logging(options.get('verbose', False))
 
         # Configurar handlers de señales
         signal.signal(signal.SIGINT, self._signal_handler)
@@ -128,9 +193,16 @@ class Command(BaseCommand):
         session_name = options.get('session_name')
         verbose = options.get('verbose', False)
         simulator_mode = options.get('simulator', False)
+        accounts = []
 
         if simulator_mode:
             username = 'simulator'
+        elif options.get('accounts'):
+            accounts = resolve_accounts(options['accounts'])
+            if not accounts:
+                self.stdout.write(self.style.ERROR('❌ Error: No hay cuentas para capturar'))
+                return
+            username = accounts[0]
         else:
             # Obtener username desde Config
             username = Config.get_value('tiktok_user')
@@ -144,15 +216,22 @@ class Command(BaseCommand):
                 return
 
         # Banner inicial
-        self._show_banner(username, session_name, simulator_mode)
+        self._show_banner(username, session_name, simulator_mode, accounts)
 
         # Configurar Django para async
         os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
         django.setup()
 
         try:
+            # 0. Métricas en memoria expuestas por HTTP (sin consultas a la BD por scrape)
+            self.metrics_port = options.get('metrics_port') or 0
+            self._start_metrics_server(self.metrics_port)
+
             # 1. Iniciar workers de servicios
-            self._start_service_workers(verbose)
+            if options.get('worker_processes'):
+                self._start_worker_processes(verbose)
+            else:
+                self._start_service_workers(verbose)
 
             if simulator_mode:
                 # Modo simulador: solo workers, sin TikTok
@@ -169,7 +248,15 @@ class Command(BaseCommand):
                 self._monitoring_loop_simulator()
             else:
                 # 2. Iniciar captura de TikTok
-                self._start_tiktok_capture(username, session_name)
+                if accounts and options.get('capture_process'):
+                    shards = options.get('capture_shards') or int(Config.get_float('capture_shards', 1))
+                    self._start_capture_shards(accounts, session_name, shards)
+                elif accounts:
+                    self._start_capture_manager(accounts, session_name)
+                elif options.get('capture_process'):
+                    self._start_capture_process(username, session_name)
+                else:
+                    self._start_tiktok_capture(username, session_name)
 
                 # 3. Loop de monitoreo
                 self._monitoring_loop()
@@ -182,7 +269,7 @@ class Command(BaseCommand):
             # Detener todo
             self._shutdown()
 
-    def _show_banner(self, username, session_name, simulator_mode=False):
+    def _show_banner(self, username, session_name, simulator_mode=False, accounts=None):
         """Muestra el banner inicial"""
         self.stdout.write('')
         self.stdout.write(self.style.SUCCESS('=' * 70))
@@ -191,13 +278,25 @@ class Command(BaseCommand):
         else:
             self.stdout.write(self.style.SUCCESS('🚀 SISTEMA DE EVENTOS TIKTOK - INICIO'))
         self.stdout.write(self.style.SUCCESS('=' * 70))
-        if not simulator_mode:
+        if accounts and len(accounts) > 1:
+            self.stdout.write(f'\n📺 Cuentas: {self.style.WARNING(str(len(accounts)))}')
+        elif not simulator_mode:
             self.stdout.write(f'\n📺 Streamer: {self.style.WARNING("@" + username)}')
         if session_name:
             self.stdout.write(f'📝 Sesión: {self.style.WARNING(session_name)}')
         self.stdout.write(f'⏰ Hora inicio: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}')
         self.stdout.write('')
 
+    def _start_metrics_server(self, port):
+        """Inicia el endpoint /metrics en formato Prometheus"""
+        if not port:
+            return
+        try:
+            metrics.start_http_server(port)
+            self.stdout.write(f'📈 Métricas Prometheus en http://0.0.0.0:{port}/metrics')
+        except OSError as e:
+            self.stdout.write(self.style.WARNING(f'⚠️  No se pudo iniciar el servidor de métricas: {e}'))
+
     def _start_service_workers(self, verbose):
         """Inicia los workers de servicios"""
         self.stdout.write(self.style.SUCCESS('=' * 70))
@@ -215,7 +314,7 @@ class Command(BaseCommand):
             self.stdout.write(f'🔧 Iniciando worker: {self.style.WARNING(service.name)}')
 
             try:
-                worker = ServiceWorker(service, verbose=verbose)
+                worker = create_worker(service, verbose=verbose)
                 worker.start()
                 self.workers.append(worker)
 
@@ -230,6 +329,30 @@ class Command(BaseCommand):
         self.stdout.write(self.style.SUCCESS(f'✅ {len(self.workers)} worker(s) iniciado(s)'))
         self.stdout.write('')
 
+    def _start_worker_processes(self, verbose):
+        """Inicia un proceso run_queue_workers por grupo de servicios (supervisado)"""
+        self.stdout.write(self.style.SUCCESS('=' * 70))
+        self.stdout.write(self.style.SUCCESS('📦 INICIANDO PROCESOS DE WORKERS'))
+        self.stdout.write(self.style.SUCCESS('=' * 70))
+        self.stdout.write('')
+
+        slugs = list(Service.objects.filter(is_active=True).values_list('slug', flat=True))
+        if not slugs:
+            self.stdout.write(self.style.WARNING('⚠️  No hay servicios activos'))
+            return
+
+        groups = parse_groups(Config.get_value('worker_process_groups'), slugs)
+        metrics_port = self.metrics_port + WORKER_METRICS_OFFSET if self.metrics_port else 0
+        self.supervisor = WorkerSupervisor(groups, verbose=verbose, log_file=LOG_FILE, metrics_port=metrics_port)
+        self.supervisor.start()
+        for worker in self.supervisor.processes:
+            port_info = f' (métricas en :{worker.metrics_port})' if worker.metrics_port else ''
+            self.stdout.write(f'🔧 Proceso: {self.style.WARNING(", ".join(worker.slugs))}{port_info}')
+
+        self.stdout.write('')
+        self.stdout.write(self.style.SUCCESS(f'✅ {len(groups)} proceso(s) de workers iniciado(s)'))
+        self.stdout.write('')
+
     def _start_tiktok_capture(self, username, session_name):
         """Inicia la captura de TikTok en un thread"""
         self.stdout.write(self.style.SUCCESS('=' * 70))
@@ -261,6 +384,141 @@ class Command(BaseCommand):
             self.stdout.write(self.style.ERROR(f'❌ Error iniciando captura: {e}'))
             raise
 
+    def _start_capture_manager(self, usernames, session_name):
+        """Inicia la captura de varias cuentas en un solo loop (CaptureManager) con guardado compartido"""
+        self.stdout.write(self.style.SUCCESS('=' * 70))
+        self.stdout.write(self.style.SUCCESS(f'📡 INICIANDO CAPTURA DE {len(usernames)} CUENTAS'))
+        self.stdout.write(self.style.SUCCESS('=' * 70))
+        self.stdout.write('')
+
+        self.usernames = usernames
+        self.stats['start_time'] = datetime.now()
+        self.capture_writer = BatchWriter(batch_size=int(Config.get_float('capture_channel_batch_size', 200)))
+        self.capture_writer.start()
+        self.capture_manager = CaptureManager(usernames, sink=self.capture_writer, session_name=session_name)
+        self.capture_manager.start()
+
+        self.stdout.write('🎬 Conectando a ' + ', '.join(f'@{name}' for name in usernames))
+        self.stdout.write(self.style.SUCCESS('✅ Captura de cuentas iniciada'))
+        self.stdout.write('')
+
+    def _start_capture_process(self, username, session_name):
+        """Inicia la captura en un proceso hijo que envía los eventos por el canal"""
+        self.stdout.write(self.style.SUCCESS('=' * 70))
+        self.stdout.write(self.style.SUCCESS('📡 INICIANDO CAPTURA DE TIKTOK LIVE (proceso separado)'))
+        self.stdout.write(self.style.SUCCESS('=' * 70))
+        self.stdout.write('')
+
+        self.usernames = [username]
+        self._start_channel_server()
+
+        self.stdout.write(f'🎬 Conectando a @{username}...')
+        process = self._spawn_capture(['--username', username], session_name)
+        self.stdout.write(self.style.SUCCESS(f'✅ Proceso de captura iniciado (pid {process.pid})'))
+        self.stdout.write('')
+
+    def _start_capture_shards(self, usernames, session_name, shards):
+        """Reparte las cuentas entre varios procesos de captura que envían todo por el mismo canal"""
+        groups = shard_accounts(usernames, shards)
+        self.stdout.write(self.style.SUCCESS('=' * 70))
+        self.stdout.write(self.style.SUCCESS(
+            f'📡 INICIANDO CAPTURA DE {len(usernames)} CUENTAS ({len(groups)} procesos)'
+        ))
+        self.stdout.write(self.style.SUCCESS('=' * 70))
+        self.stdout.write('')
+
+        self.usernames = usernames
+        self._start_channel_server()
+
+        for index, group in enumerate(groups):
+            stats_path = STATS_DIR / f'shard-{index}.json'
+            process = self._spawn_capture(
+                ['--accounts', ','.join(group), '--stats-file', str(stats_path)],
+                session_name, stats_path
+            )
+            self.stdout.write(
+                f'🔧 Proceso {index} (pid {process.pid}): ' + ', '.join(f'@{name}' for name in group)
+            )
+
+        self.stdout.write('')
+        self.stdout.write(self.style.SUCCESS(f'✅ {len(groups)} proceso(s) de captura iniciado(s)'))
+        self.stdout.write('')
+
+    def _start_channel_server(self):
+        self.channel_server = EventChannelServer(
+            SOCKET_PATH,
+            batch_size=int(Config.get_float('capture_channel_batch_size', 200))
+        )
+        self.channel_server.start()
+        self.stats['start_time'] = datetime.now()
+
+    def _spawn_capture(self, args, session_name, stats_path=None):
+        """Lanza un proceso capture_tiktok_live que envía los eventos por el canal"""
+        command = [
+            sys.executable, os.path.join(settings.BASE_DIR, 'manage.py'), 'capture_tiktok_live',
+            *args,
+            '--channel', str(SOCKET_PATH),
+            '--log-file', LOG_FILE,
+        ]
+        if session_name:
+            command.extend(['--session-name', session_name])
+        metrics_port = None
+        if self.metrics_port:
+            # Las métricas de captura (eventos recibidos, backpressure) viven en el hijo
+            metrics_port = self.metrics_port + CAPTURE_METRICS_OFFSET + len(self.capture_processes)
+            command.extend(['--metrics-port', str(metrics_port)])
+        process = subprocess.Popen(command, cwd=str(settings.BASE_DIR))
+        self.capture_processes.append((process, stats_path))
+        if metrics_port:
+            self.stdout.write(f'📈 Métricas de captura (pid {process.pid}) en http://0.0.0.0:{metrics_port}/metrics')
+        return process
+
+    def _stop_capture_processes(self):
+        """Detiene los procesos de captura (cierran sus sesiones) y guarda lo que quedó en el canal"""
+        for process, _ in self.capture_processes:
+            if process.poll() is None:
+                process.send_signal(signal.SIGTERM)
+        for process, _ in self.capture_processes:
+            try:
+                process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                self.stdout.write(self.style.WARNING(f'  ⚠️  La captura (pid {process.pid}) no terminó, se mata el proceso'))
+                process.kill()
+                process.wait()
+        self.channel_server.stop()
+
+    def _current_sessions(self):
+        """Sesiones creadas por la captura (procesos o CaptureManager) en esta corrida"""
+        return list(LiveSession.objects.filter(
+            streamer_unique_id__in=self.usernames,
+            started_at__gte=self.stats['start_time']
+        ).order_by('id'))
+
+    def _account_statuses(self):
+        """Estado por cuenta del CaptureManager o de los procesos de captura"""
+        if self.capture_manager:
+            return self.capture_manager.get_status()
+        return read_capture_stats(path for _, path in self.capture_processes if path)
+
+    def _stop_tiktok_capture(self, timeout=15):
+        """
+        Corta la conexión en el loop de la captura y espera a que el thread termine
+
+        Al salir de run_supervised el propio thread persiste lo agregado y cierra
+        la sesión, así ningún handler ni _flush_loop escribe después.
+        """
+        loop = self.tiktok_capture.loop
+        if loop and loop.is_running():
+            future = asyncio.run_coroutine_threadsafe(self.tiktok_capture.stop(), loop)
+            try:
+                future.result(timeout=timeout)
+            except Exception as e:
+                self.stdout.write(self.style.WARNING(f'  ⚠️  Error desconectando la captura: {e}'))
+        if self.tiktok_thread:
+            self.tiktok_thread.join(timeout=timeout)
+            if self.tiktok_thread.is_alive():
+                self.stdout.write(self.style.WARNING('  ⚠️  El thread de captura no terminó'))
+
     def _run_tiktok_capture(self):
         """Ejecuta la captura de TikTok (corre en thread)"""
         try:
@@ -285,15 +543,25 @@ class Command(BaseCommand):
             time.sleep(1)
             counter += 1
 
+            # Relanzar procesos de workers caídos
+            if self.supervisor:
+                self.supervisor.poll()
+
             # Mostrar estadísticas cada 30 segundos
             if counter % 30 == 0:
                 self._show_stats()
 
-            # Verificar si el thread de TikTok sigue vivo
-            if self.tiktok_thread and not self.tiktok_thread.is_alive():
+            # Verificar si la captura de TikTok sigue viva
+            if self.capture_processes:
+                capture_alive = all(process.poll() is None for process, _ in self.capture_processes)
+            elif self.capture_manager:
+                capture_alive = self.capture_manager.alive
+            else:
+                capture_alive = not self.tiktok_thread or self.tiktok_thread.is_alive()
+            if not capture_alive:
                 self.stdout.write('')
                 self.stdout.write(
-                    self.style.WARNING('⚠️  Captura de TikTok detenida inesperadamente')
+                    self.style.WARNING('⚠️  Captura de TikTok terminada (fin del live o sin reconexión)')
                 )
                 self.running = False
 
@@ -303,6 +571,8 @@ class Command(BaseCommand):
         while self.running:
             time.sleep(1)
             counter += 1
+            if self.supervisor:
+                self.supervisor.poll()
             if counter % 30 == 0:
                 self._show_stats()
 
@@ -322,27 +592,107 @@ class Command(BaseCommand):
 
         # Estadísticas de sesión
         if self.tiktok_capture and self.tiktok_capture.session:
-            session = self.tiktok_capture.session
+            capture = self.tiktok_capture
+            session = capture.session
             self.stdout.write(f"📝 Sesión ID: {session.id}")
             self.stdout.write(f"📊 Eventos capturados: {session.total_events}")
+            if capture.disconnected_at is not None:
+                self.stdout.write(self.style.WARNING(
+                    f"🔁 Reconectando (intento {capture.reconnect_attempt}, "
+                    f"sin conexión hace {time.time() - capture.disconnected_at:.0f}s)"
+                ))
+            if capture.reconnects:
+                self.stdout.write(f"🔁 Reconexiones: {capture.reconnects}")
+        elif len(self.usernames) == 1 and self.capture_processes:
+            sessions = self._current_sessions()
+            if sessions:
+                self.stdout.write(f"📝 Sesión ID: {sessions[-1].id}")
+                self.stdout.write(f"📊 Eventos capturados: {sessions[-1].total_events}")
+                if sessions[-1].disconnects:
+                    self.stdout.write(f"🔁 Reconexiones: {sessions[-1].disconnects}")
+        else:
+            accounts = self._account_statuses()
+            if accounts:
+                self._show_account_stats(accounts)
+
+        if self.channel_server:
+            self.stdout.write(
+                f"🔌 Canal: {self.channel_server.stored} guardados, {self.channel_server.backlog} en espera"
+            )
+        elif self.capture_writer:
+            self.stdout.write(
+                f"💾 Guardado: {self.capture_writer.stored} guardados, {self.capture_writer.backlog} en espera"
+            )
 
         # Estadísticas de workers
-        self.stdout.write(f"\n🔧 Workers activos: {len(self.workers)}")
-        for worker in self.workers:
-            status = worker.get_status()
+        if self.supervisor:
+            statuses = self.supervisor.get_status()
+        else:
+            statuses = [worker.get_status() for worker in self.workers]
+
+        self.stdout.write(f"\n🔧 Workers activos: {sum(1 for status in statuses if status['running'])}")
+        for status in statuses:
             status_icon = '🟢' if status['running'] else '🔴'
 
             self.stdout.write(f"\n{status_icon} {self.style.WARNING(status['service'])}")
+            if 'pid' in status:
+                self.stdout.write(f"  • Proceso: pid {status['pid']} ({status['restarts']} reinicios)")
             self.stdout.write(f"  • Pendientes: {status['pending']}")
             self.stdout.write(f"  • Procesando: {status['processing']}")
+            if status['expired']:
+                self.stdout.write(f"  • Expirados (TTL): {status['expired']}")
+            if status['reaped']:
+                self.stdout.write(f"  • Recuperados (lease vencido): {status['reaped']}")
 
             if status['async_threads'] > 0:
                 self.stdout.write(f"  • Threads async: {status['async_threads']}")
+            if status.get('async_tasks'):
+                self.stdout.write(f"  • Tareas async en vuelo: {status['async_tasks']}")
+
+        # Latencias (trazas del worker; las de render llegan al servidor web: /queue/traces/)
+        traces = tracing.recorder.summary()
+        if traces:
+            self.stdout.write(f"\n⏱️  Latencias p50/p95/p99 (ms):")
+            for entry in traces:
+                stages = ' | '.join(
+                    f"{stage} {s['p50'] * 1000:.0f}/{s['p95'] * 1000:.0f}/{s['p99'] * 1000:.0f}"
+                    for stage, s in entry['stages'].items()
+                )
+                self.stdout.write(f"  • {entry['service']} {entry['event_type']} ({entry['count']}): {stages}")
 
         self.stdout.write('')
         self.stdout.write(self.style.SUCCESS('=' * 70))
         self.stdout.write('')
 
+    def _show_account_stats(self, accounts):
+        """Una línea por cuenta capturada"""
+        icons = {'live': '🟢', 'connecting': '🟡', 'reconnecting': '🟠', 'offline': '⚪', 'error': '🔴'}
+        live = sum(1 for account in accounts if account['status'] == 'live')
+        self.stdout.write(f"\n📺 Cuentas en vivo: {live}/{len(accounts)}")
+        for account in accounts:
+            line = (
+                f"  {icons.get(account['status'], '⚫')} @{account['username']}: {account['status']}"
+                f" | {account['events']} eventos"
+            )
+            if account['last_event_age'] is not None:
+                line += f" | último hace {account['last_event_age']:.0f}s"
+            if account['session_id']:
+                line += f" | sesión #{account['session_id']}"
+            if account.get('disconnected_for') is not None:
+                line += f" | sin conexión hace {account['disconnected_for']}s"
+            if account['reconnects']:
+                line += f" | {account['reconnects']} reconexiones"
+            if account['status'] == 'error' and account['last_error']:
+                line += f" | {account['last_error'][:60]}"
+            self.stdout.write(line)
+
+    def _show_disconnects(self, session):
+        """Cortes de conexión de una sesión (reconectada sobre la misma sesión)"""
+        if session.disconnects:
+            self.stdout.write(
+                f'  • Cortes: {session.disconnects} ({session.disconnected_seconds:.0f}s sin conexión)'
+            )
+
     def _signal_handler(self, signum, frame):
         """Handler para señales de sistema"""
         self.stdout.write('')
@@ -357,6 +707,42 @@ class Command(BaseCommand):
         self.stdout.write(self.style.SUCCESS('=' * 70))
         self.stdout.write('')
 
+        # 0. Captura en procesos separados o CaptureManager: cerrar las sesiones y
+        #    guardar lo recibido antes que los workers
+        if self.capture_processes or self.capture_manager:
+            self.stdout.write('📡 Deteniendo captura...')
+            if self.capture_processes:
+                self._stop_capture_processes()
+            else:
+                self.capture_manager.stop()
+                self.capture_writer.stop()
+            for session in self._current_sessions() if self.stats['start_time'] else []:
+                self.stdout.write(f'  ✅ Sesión #{session.id} (@{session.streamer_unique_id}) finalizada')
+                self.stdout.write(f'  • Duración: {session.get_duration_display()}')
+                self.stdout.write(f'  • Eventos capturados: {session.total_events}')
+                self._show_disconnects(session)
+            self.stdout.write('')
+
+        # Captura en un thread de este proceso: desconectar y esperar antes que los workers
+        if self.tiktok_capture:
+            session = self.tiktok_capture.session
+            self.stdout.write('📡 Deteniendo captura de TikTok...')
+            try:
+                self._stop_tiktok_capture()
+                if self.tiktok_capture.session:
+                    # El thread no terminó a tiempo: cerrar desde acá
+                    self.tiktok_capture.stopping = True
+                    self.tiktok_capture.finish_session('completed')
+                if session:
+                    session.refresh_from_db()
+                    self.stdout.write(f'  ✅ Sesión #{session.id} finalizada')
+                    self.stdout.write(f'  • Duración: {session.get_duration_display()}')
+                    self.stdout.write(f'  • Eventos capturados: {session.total_events}')
+                    self._show_disconnects(session)
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f'  ❌ Error finalizando sesión: {e}'))
+            self.stdout.write('')
+
         # 1. Detener workers
         if self.workers:
             self.stdout.write('🔧 Deteniendo workers...')
@@ -369,20 +755,10 @@ class Command(BaseCommand):
                     )
             self.stdout.write('  ✅ Todos los workers detenidos')
 
-        # 2. Finalizar sesión de TikTok
-        if self.tiktok_capture and self.tiktok_capture.session:
-            self.stdout.write('\n📝 Finalizando sesión de TikTok...')
-            try:
-                self.tiktok_capture.session.end_session(status='completed')
-                duration = self.tiktok_capture.session.get_duration_display()
-                total = self.tiktok_capture.session.total_events
-
-                self.stdout.write(f'  ✅ Sesión finalizada')
-                self.stdout.write(f'  • Duración: {duration}')
-                self.stdout.write(f'  • Eventos capturados: {total}')
-
-            except Exception as e:
-                self.stdout.write(self.style.ERROR(f'  ❌ Error finalizando sesión: {e}'))
+        if self.supervisor:
+            self.stdout.write('🔧 Deteniendo procesos de workers...')
+            self.supervisor.stop()
+            self.stdout.write('  ✅ Todos los procesos detenidos')
 
         # Resumen final
         self.stdout.write('')
@@ -390,3 +766,8 @@ class Command(BaseCommand):
         self.stdout.write(self.style.SUCCESS('✅ SISTEMA DETENIDO EXITOSAMENTE'))
         self.stdout.write(self.style.SUCCESS('=' * 70))
         self.stdout.write('')
+
+        # Vaciar los logs pendientes en la cola
+        if self.log_listener:
+            self.log_listener.stop()
+            self.log_listener = None
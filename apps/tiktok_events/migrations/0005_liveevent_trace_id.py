@@ -0,0 +1,26 @@
+# Generated by Django 5.1.3 on 2026-10-19 09:20
+
+import apps.tiktok_events.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tiktok_events', '0004_tiktokaccount_livesession_account_livesession_game_type'),
+    ]
+
+    operations = [
+        # Los eventos existentes quedan sin traza ('') en lugar de compartir un mismo ID
+        migrations.AddField(
+            model_name='liveevent',
+            name='trace_id',
+            field=models.CharField(blank=True, db_index=True, default='', help_text='ID de traza para medir latencia end-to-end (recepción → overlay)', max_length=32),
+            preserve_default=False,
+        ),
+        migrations.AlterField(
+            model_name='liveevent',
+            name='trace_id',
+            field=models.CharField(blank=True, db_index=True, default=apps.tiktok_events.models.generate_trace_id, help_text='ID de traza para medir latencia end-to-end (recepción → overlay)', max_length=32),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.3 on 2026-10-19 09:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tiktok_events', '0005_liveevent_trace_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='livesession',
+            name='archive_path',
+            field=models.CharField(blank=True, default='', help_text='Archivo con los eventos archivados', max_length=500),
+        ),
+        migrations.AddField(
+            model_name='livesession',
+            name='archived_at',
+            field=models.DateTimeField(blank=True, db_index=True, help_text='Momento en que se archivaron sus eventos', null=True),
+        ),
+    ]
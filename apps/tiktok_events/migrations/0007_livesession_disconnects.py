@@ -0,0 +1,23 @@
+# Generated by Django 5.1.3 on 2026-10-19 09:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tiktok_events', '0006_livesession_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='livesession',
+            name='disconnected_seconds',
+            field=models.FloatField(default=0, help_text='Segundos acumulados sin conexión (huecos sin eventos)'),
+        ),
+        migrations.AddField(
+            model_name='livesession',
+            name='disconnects',
+            field=models.PositiveIntegerField(default=0, help_text='Veces que se cortó la conexión y se reconectó'),
+        ),
+    ]
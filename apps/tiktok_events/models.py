@@ -1,8 +1,14 @@
+import uuid
 from django.db import models
 from django.utils import timezone
 from apps.base_models import BaseModel
 
 
+def generate_trace_id():
+    """ID de traza para seguir un evento de punta a punta (ver queue_system.tracing)"""
+    return uuid.uuid4().hex
+
+
 class TikTokAccount(BaseModel):
     """
     Cuenta de TikTok utilizada para hacer lives.
@@ -95,9 +101,17 @@ class LiveSession(BaseModel):
     # Estadísticas (se actualizan conforme se agregan eventos)
     total_events = models.IntegerField(default=0, help_text="Total de eventos capturados")
 
+    # Cortes de conexión (la captura reconecta sobre la misma sesión)
+    disconnects = models.PositiveIntegerField(default=0, help_text="Veces que se cortó la conexión y se reconectó")
+    disconnected_seconds = models.FloatField(default=0, help_text="Segundos acumulados sin conexión (huecos sin eventos)")
+
     # Notas opcionales
     notes = models.TextField(null=True, blank=True, help_text="Notas sobre esta sesión")
 
+    # Archivo (archive_events): eventos movidos a un .jsonl.gz fuera de la BD
+    archived_at = models.DateTimeField(null=True, blank=True, db_index=True, help_text="Momento en que se archivaron sus eventos")
+    archive_path = models.CharField(max_length=500, blank=True, default='', help_text="Archivo con los eventos archivados")
+
     class Meta:
         db_table = 'live_sessions'
         ordering = ['-started_at']
@@ -163,6 +177,13 @@ class LiveEvent(BaseModel):
     # Identificación del evento
     event_type = models.CharField(max_length=100, db_index=True, help_text="Tipo de evento (CommentEvent, GiftEvent, etc.)")
     timestamp = models.DateTimeField(db_index=True, help_text="Momento del evento")
+    trace_id = models.CharField(
+        max_length=32,
+        default=generate_trace_id,
+        blank=True,
+        db_index=True,
+        help_text="ID de traza para medir latencia end-to-end (recepción → overlay)"
+    )
 
     # Contexto del live
     room_id = models.BigIntegerField(db_index=True, help_text="ID de la sala/live")
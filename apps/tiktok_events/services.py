@@ -1,12 +1,18 @@
+import asyncio
 import json
+import logging
+import random
 import time
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import Dict, Any, Optional
 from django.utils import timezone
 from asgiref.sync import sync_to_async
+from django.db.models import F
 from TikTokLive import TikTokLiveClient
+from TikTokLive.client.errors import UserNotFoundError, UserOfflineError
 from TikTokLive.events import (
     ConnectEvent,
+    LiveEndEvent,
     CommentEvent,
     GiftEvent,
     LikeEvent,
@@ -16,8 +22,24 @@ from TikTokLive.events import (
     SubscribeEvent,
     RoomUserSeqEvent,
 )
-from .models import LiveEvent, LiveSession, TikTokAccount
-from apps.queue_system.dispatcher import EventDispatcher
+from .models import LiveEvent, LiveSession, TikTokAccount, generate_trace_id
+from .aggregators import LikeAggregator, JoinRollup
+from .journal import EventJournal
+from apps.app_config.models import Config
+from apps.queue_system.backpressure import LEVEL_CRITICAL, LEVEL_ELEVATED, LEVEL_NAMES, LEVEL_NORMAL, PressureLevel
+from apps.queue_system.backpressure import board as backpressure_board
+from apps.queue_system.dispatcher import EventDispatcher, configure_db_pool, run_db
+from apps.queue_system.models import ServiceEventConfig
+from apps.queue_system import metrics
+
+logger = logging.getLogger(__name__)
+
+
+# Cada cuánto se vuelve a consultar qué necesitan los servicios suscritos
+ROUTING_REFRESH_SECONDS = 30
+
+# Tipos que se guardan aunque ningún servicio los procese (dashboard), incluso bajo presión
+ALWAYS_PERSIST_TYPES = {'ViewerCountEvent', 'JoinRollupEvent', 'DisconnectGapEvent'}
 
 
 def clean_text(text: str) -> str:
@@ -83,13 +105,73 @@ class StreakTracker:
 class TikTokEventCapture:
     """Servicio para capturar eventos de TikTok Live y guardarlos en la BD"""
 
-    def __init__(self, streamer_username: str, session_name: Optional[str] = None):
+    def __init__(self, streamer_username: str, session_name: Optional[str] = None, channel=None):
+        """
+        Args:
+            channel: EventChannelClient opcional. Si se pasa, los eventos no se
+                guardan en este proceso: se envían al consumidor por el canal
+        """
         self.streamer_username = streamer_username
         self.session_name = session_name
         self.client = TikTokLiveClient(unique_id=f"@{streamer_username}")
         self.room_id = None
         self.streak_tracker = StreakTracker()
         self.session = None  # Se creará al conectar
+        self.channel = channel
+
+        # Salud de la conexión (para el estado del CaptureManager)
+        self.events_received = 0
+        self.last_event_at = None
+
+        # Eventos guardados (o enviados al canal) aún no sumados a LiveSession.total_events
+        self.uncounted_events = 0
+
+        # Reconexión supervisada: un corte del websocket no cierra la sesión
+        self.reconnect_base_delay = Config.get_float('capture_reconnect_base_delay', 1.0)
+        self.reconnect_max_delay = Config.get_float('capture_reconnect_max_delay', 60.0)
+        self.reconnect_max_attempts = int(Config.get_float('capture_reconnect_max_attempts', 0))
+        self.reconnects = 0
+        self.reconnect_attempt = 0
+        self.disconnected_at = None  # epoch del corte en curso (None = conectado)
+        self.disconnect_reason = ''
+        self.live_ended = False
+        self.stopping = False
+        self.loop = None  # loop de run_supervised (para stop() desde otro thread)
+        self._wake = None
+
+        # Agregación de likes (configurable desde Config)
+        self.like_window = Config.get_float('like_aggregation_window', 5.0)
+        self.like_threshold = int(Config.get_float('like_aggregation_threshold', 50))
+        self.like_aggregator = LikeAggregator(
+            window_seconds=self.like_window,
+            threshold=self.like_threshold,
+        )
+        # Rollup de joins: 'rollup' (default) guarda un registro por minuto,
+        # 'raw' mantiene el comportamiento anterior (una fila por join)
+        self.join_handling = Config.get_value('join_handling', 'rollup')
+        self.join_rollup = JoinRollup()
+        self.join_store_raw = False
+        self.join_subscribed = False
+        self.subscribed_types = set()
+        self._refresh_routing()
+
+        # Backpressure: con las colas saturadas se ensanchan las ventanas de
+        # agregación y (en nivel crítico) no se guardan tipos sin suscriptores
+        self.backpressure_enabled = Config.get_bool('backpressure_enabled', True)
+        self.backpressure_factor = max(1.0, Config.get_float('backpressure_aggregation_factor', 4))
+        self.pressure = PressureLevel(
+            elevated=Config.get_float('backpressure_elevated', 0.7),
+            critical=Config.get_float('backpressure_critical', 0.9),
+        )
+        self._flush_task = None
+
+        # Threads para guardar y distribuir eventos en paralelo (camino sin canal)
+        configure_db_pool(int(Config.get_float('dispatch_db_threads', 4)))
+
+        # Journal append-only de eventos recibidos (se abre al crear la sesión)
+        self.journal_enabled = Config.get_bool('journal_enabled', True)
+        self.journal_max_bytes = int(Config.get_float('journal_max_mb', 64) * 1024 * 1024)
+        self.journal = None
 
         # Registrar eventos
         self._register_handlers()
@@ -97,6 +179,7 @@ class TikTokEventCapture:
     def _register_handlers(self):
         """Registra los handlers para cada tipo de evento"""
         self.client.on(ConnectEvent)(self.on_connect)
+        self.client.on(LiveEndEvent)(self.on_live_end)
         self.client.on(CommentEvent)(self.on_comment)
         self.client.on(GiftEvent)(self.on_gift)
         self.client.on(LikeEvent)(self.on_like)
@@ -106,10 +189,366 @@ class TikTokEventCapture:
         self.client.on(SubscribeEvent)(self.on_subscribe)
         self.client.on(RoomUserSeqEvent)(self.on_room_user_seq)
 
+    def _refresh_routing(self):
+        """Consulta la configuración de servicios que afecta a la captura"""
+        # Si algún servicio necesita cada tap individual, no se agregan likes
+        per_tap_required = ServiceEventConfig.objects.filter(
+            service__is_active=True,
+            event_type='LikeEvent',
+            is_enabled=True,
+            is_aggregatable=False
+        ).exists()
+        self.like_aggregator.enabled = not per_tap_required
+
+        # Tipos que algún servicio activo procesa
+        self.subscribed_types = set(ServiceEventConfig.objects.filter(
+            service__is_active=True,
+            is_enabled=True
+        ).values_list('event_type', flat=True))
+
+        # Los JoinEvent crudos solo se guardan si algún servicio los procesa
+        # o si está activado el flag de debug join_store_raw
+        self.join_subscribed = 'JoinEvent' in self.subscribed_types
+        self.join_store_raw = (
+            self.join_handling == 'raw'
+            or self.join_subscribed
+            or Config.get_bool('join_store_raw')
+        )
+
+    def _apply_backpressure(self):
+        """Ajusta la fidelidad de la captura a la saturación de las colas (llamado cada segundo)"""
+        if not self.backpressure_enabled:
+            return
+        previous = self.pressure.level
+        pressure = backpressure_board.pressure()
+        level = self.pressure.update(pressure)
+        if level == previous:
+            return
+
+        # Nivel elevado o más: ventanas de likes y joins más anchas
+        factor = self.backpressure_factor if level >= LEVEL_ELEVATED else 1
+        self.like_aggregator.window_seconds = self.like_window * factor
+        self.like_aggregator.threshold = int(self.like_threshold * factor)
+        self.join_rollup.bucket_seconds = int(JoinRollup.BUCKET_SECONDS * factor)
+        metrics.CAPTURE_PRESSURE_LEVEL.set(level)
+
+        log = logger.warning if level > previous else logger.info
+        log(
+            "[CAPTURE] 🚦 Backpressure %s → %s (saturación %.0f%%): ventana de likes %.0fs, joins %ss%s",
+            LEVEL_NAMES[previous], LEVEL_NAMES[level], pressure * 100,
+            self.like_aggregator.window_seconds, self.join_rollup.bucket_seconds,
+            ", sin guardar tipos sin suscriptores" if level >= LEVEL_CRITICAL else ""
+        )
+
+    def _shed(self, fields: Dict[str, Any]) -> bool:
+        """True si el evento no se guarda por backpressure (queda en el journal)"""
+        if self.pressure.level < LEVEL_CRITICAL:
+            return False
+        event_type = fields['event_type']
+        if event_type in self.subscribed_types or event_type in ALWAYS_PERSIST_TYPES:
+            return False
+        metrics.EVENTS_SHED.inc(event_type=event_type)
+        return True
+
+    def _store_event(self, fields: Dict[str, Any], dispatch: bool = True) -> LiveEvent:
+        """Guarda un evento de la sesión actual y (opcionalmente) lo distribuye a las colas"""
+        live_event = LiveEvent.objects.create(
+            session=self.session,
+            room_id=self.room_id,
+            streamer_unique_id=self.streamer_username,
+            **fields
+        )
+        metrics.EVENTS_STORED.inc(event_type=fields['event_type'])
+        self.uncounted_events += 1
+        if dispatch:
+            EventDispatcher.dispatch(live_event)
+        return live_event
+
+    async def _astore_event(self, fields: Dict[str, Any], dispatch: bool = True) -> LiveEvent:
+        """
+        Versión async de _store_event
+
+        El INSERT y el dispatch corren en el pool de BD del dispatcher, no en el
+        executor thread-sensitive compartido: varios eventos del live pueden
+        estar guardándose/distribuyéndose a la vez.
+        """
+        live_event = await run_db(
+            LiveEvent.objects.create,
+            session=self.session,
+            room_id=self.room_id,
+            streamer_unique_id=self.streamer_username,
+            **fields
+        )
+        metrics.EVENTS_STORED.inc(event_type=fields['event_type'])
+        self.uncounted_events += 1
+        if dispatch:
+            await EventDispatcher.adispatch(live_event)
+        return live_event
+
+    def _emit(self, fields: Dict[str, Any], dispatch: bool = True):
+        """Guarda el evento en este proceso o lo envía al consumidor por el canal"""
+        if self.channel is None:
+            self._store_event(fields, dispatch)
+            return
+        self.channel.send({
+            'session_id': self.session.id,
+            'room_id': self.room_id,
+            'streamer_unique_id': self.streamer_username,
+            'dispatch': dispatch,
+            **fields
+        })
+        self.uncounted_events += 1
+
+    def save_event_count(self, count: Optional[int] = None):
+        """
+        Suma a LiveSession.total_events los eventos guardados desde la última vez
+
+        Mismo contador con o sin canal: lo lleva la captura (cada segundo y al
+        cerrar la sesión), no el consumidor.
+
+        Args:
+            count: Eventos a sumar, ya descontados de uncounted_events por quien
+                llama desde el loop (default: todos los pendientes)
+        """
+        if count is None:
+            count, self.uncounted_events = self.uncounted_events, 0
+        if count and self.session:
+            LiveSession.objects.filter(id=self.session.id).update(total_events=F('total_events') + count)
+            self.session.total_events += count
+
+    async def _persist(self, fields: Dict[str, Any], dispatch: bool = True):
+        """Versión async de _emit: con canal no hay acceso a la BD en este proceso"""
+        if self._shed(fields):
+            return
+        if self.channel is None:
+            await self._astore_event(fields, dispatch)
+        else:
+            self._emit(fields, dispatch)
+
+    def _journal(self, fields: Dict[str, Any]):
+        """Escribe el evento recibido en el journal de la sesión (antes de agregar/persistir)"""
+        # Todo evento recibido pasa por aquí, se agregue o no después
+        metrics.EVENTS_RECEIVED.inc(event_type=fields['event_type'])
+        self.events_received += 1
+        self.last_event_at = time.time()
+        if self.journal:
+            self.journal.append({
+                'received_at': time.time(),
+                'room_id': self.room_id,
+                'streamer_unique_id': self.streamer_username,
+                **fields
+            })
+
+    async def _capture(self, fields: Dict[str, Any], dispatch: bool = True):
+        """Registra un evento recibido: journal + BD + colas de servicios"""
+        # La traza nace al recibir el evento (el journal y la BD comparten el ID)
+        fields['trace_id'] = generate_trace_id()
+        self._journal(fields)
+        await self._persist(fields, dispatch)
+
+    @staticmethod
+    def _user_fields(user) -> Dict[str, Any]:
+        """Campos de usuario comunes a todos los eventos"""
+        return {
+            'user_id': getattr(user, 'user_id', None),
+            'user_unique_id': user.unique_id,
+            'user_nickname': clean_text(user.nickname),
+        }
+
+    async def _flush_loop(self):
+        """Vacía periódicamente los likes agregados expirados y los rollups de joins"""
+        last_refresh = time.monotonic()
+
+        while True:
+            await asyncio.sleep(1)
+            try:
+                if time.monotonic() - last_refresh >= ROUTING_REFRESH_SECONDS:
+                    await sync_to_async(self._refresh_routing)()
+                    last_refresh = time.monotonic()
+
+                self._apply_backpressure()
+
+                if self.like_aggregator.enabled:
+                    buckets = self.like_aggregator.pop_expired()
+                else:
+                    buckets = self.like_aggregator.pop_all()
+
+                for bucket in buckets:
+                    await self._persist(LikeAggregator.build_event_fields(bucket))
+
+                # Los rollups no se distribuyen: ningún servicio procesa rollups
+                for rollup in self.join_rollup.pop_closed():
+                    await self._persist(JoinRollup.build_event_fields(rollup), False)
+
+                if self.journal:
+                    self.journal.flush()
+
+                # Se descuenta en el loop: los eventos siguen llegando mientras se escribe
+                if self.uncounted_events:
+                    count, self.uncounted_events = self.uncounted_events, 0
+                    await sync_to_async(self.save_event_count)(count)
+            except Exception as e:
+                logger.exception("[CAPTURE] ❌ Error vaciando eventos agregados: %s", e)
+
+    def flush_pending(self):
+        """Persiste los likes agregados y rollups que aún no se vaciaron (llamar al detener)"""
+        if not self.session:
+            return
+        for bucket in self.like_aggregator.pop_all():
+            self._emit(LikeAggregator.build_event_fields(bucket))
+        for rollup in self.join_rollup.pop_all():
+            self._emit(JoinRollup.build_event_fields(rollup), False)
+        if self.journal:
+            self.journal.close()
+            self.journal = None
+
+    def finish_session(self, status: str = 'completed'):
+        """Persiste lo agregado y cierra la sesión actual (al detener o al cortarse el live)"""
+        if not self.session:
+            return
+        self.flush_pending()
+        self.save_event_count()
+        self.session.end_session(status=status)
+        self.session = None
+
+    async def connect(self, on_connected=None):
+        """
+        Conecta al live y espera hasta que termine o se corte
+
+        Para correr varias capturas en un mismo loop (CaptureManager). No
+        cierra la sesión: eso queda a cargo de quien llama (finish_session).
+
+        Args:
+            on_connected: Función llamada cuando la conexión queda establecida
+        """
+        await self.client.connect(callback=on_connected)
+
+    def _reconnect_delay(self, attempt: int) -> float:
+        """Backoff exponencial con jitter completo: uniforme entre 0 y base * 2^(intento-1) (con tope)"""
+        ceiling = min(self.reconnect_max_delay, self.reconnect_base_delay * 2 ** (attempt - 1))
+        return random.uniform(0, ceiling)
+
+    async def run_supervised(self, on_connected=None):
+        """
+        Conecta y reconecta ante cortes hasta que el live termine o stop()
+
+        Un corte del websocket no cierra la sesión: se reintenta con backoff
+        exponencial con jitter y, al volver al mismo room, se sigue en la
+        misma LiveSession (rachas y agregados intactos) con un
+        DisconnectGapEvent que registra el hueco. Los workers no se enteran.
+
+        Raises:
+            UserOfflineError / UserNotFoundError: si no está en vivo al conectar
+            Exception: el error de la primera conexión, o el último si se agotan
+                los intentos (capture_reconnect_max_attempts, 0 = sin límite)
+        """
+        self.live_ended = False
+        self.stopping = False
+        self.loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+
+        while True:
+            error = None
+            try:
+                await self.connect(on_connected)
+                reason = 'conexión cerrada'
+            except (UserOfflineError, UserNotFoundError):
+                if self.session is None:
+                    raise
+                # El live terminó mientras estábamos desconectados
+                self.live_ended = True
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if self.session is None:
+                    raise
+                error = e
+                reason = str(e) or type(e).__name__
+
+            # client.connect() se traga la cancelación: respetarla acá
+            if asyncio.current_task().cancelling():
+                raise asyncio.CancelledError()
+            if self.stopping or self.live_ended or self.session is None:
+                return
+
+            if self.disconnected_at is None:
+                self.disconnected_at = time.time()
+                self.disconnect_reason = reason
+                logger.warning("[CAPTURE] ⚠️  @%s desconectado (%s), reconectando a la sesión #%s",
+                               self.streamer_username, reason, self.session.id)
+
+            self.reconnect_attempt += 1
+            if self.reconnect_max_attempts and self.reconnect_attempt > self.reconnect_max_attempts:
+                logger.error("[CAPTURE] ❌ @%s: sin reconexión tras %s intentos",
+                             self.streamer_username, self.reconnect_max_attempts)
+                raise error or ConnectionError(reason)
+
+            delay = self._reconnect_delay(self.reconnect_attempt)
+            logger.info("[CAPTURE] 🔁 @%s: intento %s en %.1fs", self.streamer_username, self.reconnect_attempt, delay)
+            try:
+                # Resetea el estado del cliente (room_id, task del websocket) para poder reconectar
+                await self.client.disconnect()
+            except Exception as e:
+                logger.debug("[CAPTURE] Error al limpiar el cliente: %s", e)
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+            if self.stopping:
+                return
+
+    async def stop(self):
+        """Corta la conexión sin reconectar (la sesión la cierra quien llamó a run_supervised)"""
+        self.stopping = True
+        if self._wake:
+            self._wake.set()
+        await self.client.disconnect()
+
+    async def _close_gap(self):
+        """Registra en la sesión el hueco entre el corte y la reconexión"""
+        gap = time.time() - self.disconnected_at
+        reconnected_at = timezone.now()
+        fields = {
+            'event_type': 'DisconnectGapEvent',
+            'timestamp': reconnected_at,
+            'event_data': {
+                'disconnected_at': (reconnected_at - timedelta(seconds=gap)).isoformat(),
+                'reconnected_at': reconnected_at.isoformat(),
+                'gap_seconds': round(gap, 3),
+                'attempts': self.reconnect_attempt,
+                'reason': self.disconnect_reason,
+            },
+        }
+        self.disconnected_at = None
+        self.reconnects += 1
+        metrics.CAPTURE_RECONNECTS.inc()
+        metrics.CAPTURE_GAP_SECONDS.observe(gap)
+        logger.info("[CAPTURE] ✅ @%s reconectado tras %.1fs sin conexión (%s intentos)",
+                    self.streamer_username, gap, self.reconnect_attempt)
+
+        # El hueco no se distribuye: queda en la BD y el journal para el análisis
+        await self._capture(fields, dispatch=False)
+        await sync_to_async(
+            LiveSession.objects.filter(id=self.session.id).update
+        )(disconnects=F('disconnects') + 1, disconnected_seconds=F('disconnected_seconds') + gap)
+
     async def on_connect(self, event: ConnectEvent):
-        """Se ejecuta al conectarse al live"""
+        """Se ejecuta al conectarse al live (también al reconectar tras un corte)"""
         self.room_id = event.room_id
 
+        if self.session and self.session.room_id == event.room_id:
+            # Reconexión al mismo live: se sigue en la misma sesión
+            if self.disconnected_at is not None:
+                await self._close_gap()
+            self.reconnect_attempt = 0
+            return
+
+        if self.session:
+            # Durante el corte terminó el live y empezó otro: sesión nueva
+            await sync_to_async(self.finish_session)('completed')
+        self.disconnected_at = None
+        self.reconnect_attempt = 0
+
         # Buscar cuenta asociada si existe
         account = await sync_to_async(
             lambda: TikTokAccount.objects.filter(unique_id=self.streamer_username).first()
@@ -123,9 +562,22 @@ class TikTokEventCapture:
             account=account,
         )
 
+        # Journal append-only de la sesión
+        if self.journal_enabled:
+            self.journal = EventJournal(self.session.id, max_bytes=self.journal_max_bytes)
+            self._journal({'event_type': 'ConnectEvent', 'timestamp': timezone.now(), 'event_data': {}})
+
+        if self._flush_task is None:
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush_loop())
+
         # print(f"✅ Conectado a @{event.unique_id} - Room ID: {event.room_id}")
         # print(f"📝 Sesión creada: #{self.session.id} - {self.session.name or 'Sin nombre'}")
 
+    async def on_live_end(self, event: LiveEndEvent):
+        """El streamer terminó el live: el corte que sigue no se reintenta"""
+        self.live_ended = True
+        logger.info("[CAPTURE] ⏹️  @%s terminó el live", self.streamer_username)
+
     async def on_comment(self, event: CommentEvent):
         """Captura eventos de comentarios"""
         # get_all_badges es una propiedad, no un método
@@ -144,20 +596,12 @@ class TikTokEventCapture:
             }
         }
 
-        live_event = await sync_to_async(LiveEvent.objects.create)(
-            session=self.session,
-            event_type='CommentEvent',
-            timestamp=timezone.now(),
-            room_id=self.room_id,
-            streamer_unique_id=self.streamer_username,
-            user_id=getattr(event.user, 'user_id', None),
-            user_unique_id=event.user.unique_id,
-            user_nickname=clean_text(event.user.nickname),
-            event_data=event_data
-        )
-
-        # Distribuir a las colas de servicios
-        await sync_to_async(EventDispatcher.dispatch)(live_event)
+        await self._capture({
+            'event_type': 'CommentEvent',
+            'timestamp': timezone.now(),
+            **self._user_fields(event.user),
+            'event_data': event_data
+        })
 
         # print(f"💬 {event.user.unique_id}: {event.comment}")
 
@@ -195,176 +639,152 @@ class TikTokEventCapture:
             }
         }
 
-        live_event = await sync_to_async(LiveEvent.objects.create)(
-            session=self.session,
-            event_type='GiftEvent',
-            timestamp=timezone.now(),
-            room_id=self.room_id,
-            streamer_unique_id=self.streamer_username,
-            user_id=user_id,
-            user_unique_id=event.user.unique_id,
-            user_nickname=clean_text(event.user.nickname),
-            is_streaking=is_streaking,
-            streak_id=streak_id,
-            streak_status=streak_status,
-            event_data=event_data
-        )
-
-        # Distribuir a las colas de servicios
-        await sync_to_async(EventDispatcher.dispatch)(live_event)
+        await self._capture({
+            'event_type': 'GiftEvent',
+            'timestamp': timezone.now(),
+            **self._user_fields(event.user),
+            'is_streaking': is_streaking,
+            'streak_id': streak_id,
+            'streak_status': streak_status,
+            'event_data': event_data
+        })
 
         status_emoji = "🔄" if is_streaking else "✅"
-        print(f"{status_emoji} {event.user.unique_id} envió {event.gift.name} x{repeat_count} (Total racha: {total_count})")
+        logger.info("%s %s envió %s x%s (Total racha: %s)", status_emoji, event.user.unique_id, event.gift.name, repeat_count, total_count)
 
     async def on_like(self, event: LikeEvent):
-        """Captura eventos de likes"""
-        event_data = {
-            'like_count': getattr(event, 'count', 1),
-            'total_likes': getattr(event, 'total_likes', None),
-            'user': {
-                'unique_id': event.user.unique_id,
-                'nickname': event.user.nickname
+        """Captura eventos de likes (agregados por ventana salvo que un servicio necesite cada tap)"""
+        fields = {
+            'event_type': 'LikeEvent',
+            'timestamp': timezone.now(),
+            **self._user_fields(event.user),
+            'event_data': {
+                'like_count': getattr(event, 'count', 1),
+                'total_likes': getattr(event, 'total_likes', None),
+                'user': {
+                    'unique_id': event.user.unique_id,
+                    'nickname': event.user.nickname
+                }
             }
         }
 
-        live_event = await sync_to_async(LiveEvent.objects.create)(
-            session=self.session,
-            event_type='LikeEvent',
-            timestamp=timezone.now(),
-            room_id=self.room_id,
-            streamer_unique_id=self.streamer_username,
-            user_id=getattr(event.user, 'user_id', None),
-            user_unique_id=event.user.unique_id,
-            user_nickname=clean_text(event.user.nickname),
-            event_data=event_data
-        )
-        await sync_to_async(EventDispatcher.dispatch)(live_event)
+        if not self.like_aggregator.enabled:
+            await self._capture(fields)
+            return
+
+        # Solo se persiste cuando el bucket alcanza el umbral (o expira en _flush_loop)
+        self._journal(fields)
+        bucket = self.like_aggregator.add(fields)
+        if bucket:
+            await self._persist(LikeAggregator.build_event_fields(bucket))
         # print(f"❤️ {event.user.unique_id} dio like")
 
     async def on_share(self, event: ShareEvent):
         """Captura eventos de compartir"""
-        event_data = {
-            'users_joined': getattr(event, 'users_joined', 0),
-            'user': {
-                'unique_id': event.user.unique_id,
-                'nickname': event.user.nickname
+        await self._capture({
+            'event_type': 'ShareEvent',
+            'timestamp': timezone.now(),
+            **self._user_fields(event.user),
+            'event_data': {
+                'users_joined': getattr(event, 'users_joined', 0),
+                'user': {
+                    'unique_id': event.user.unique_id,
+                    'nickname': event.user.nickname
+                }
             }
-        }
-
-        live_event = await sync_to_async(LiveEvent.objects.create)(
-            session=self.session,
-            event_type='ShareEvent',
-            timestamp=timezone.now(),
-            room_id=self.room_id,
-            streamer_unique_id=self.streamer_username,
-            user_id=getattr(event.user, 'user_id', None),
-            user_unique_id=event.user.unique_id,
-            user_nickname=clean_text(event.user.nickname),
-            event_data=event_data
-        )
-        await sync_to_async(EventDispatcher.dispatch)(live_event)
+        })
         # print(f"📤 {event.user.unique_id} compartió el live")
 
     async def on_follow(self, event: FollowEvent):
         """Captura eventos de follow"""
-        event_data = {
-            'user': {
-                'unique_id': event.user.unique_id,
-                'nickname': event.user.nickname
+        await self._capture({
+            'event_type': 'FollowEvent',
+            'timestamp': timezone.now(),
+            **self._user_fields(event.user),
+            'event_data': {
+                'user': {
+                    'unique_id': event.user.unique_id,
+                    'nickname': event.user.nickname
+                }
             }
-        }
-
-        live_event = await sync_to_async(LiveEvent.objects.create)(
-            session=self.session,
-            event_type='FollowEvent',
-            timestamp=timezone.now(),
-            room_id=self.room_id,
-            streamer_unique_id=self.streamer_username,
-            user_id=getattr(event.user, 'user_id', None),
-            user_unique_id=event.user.unique_id,
-            user_nickname=clean_text(event.user.nickname),
-            event_data=event_data
-        )
-        await sync_to_async(EventDispatcher.dispatch)(live_event)
+        })
         # print(f"👤 {event.user.unique_id} siguió al streamer")
 
     async def on_join(self, event: JoinEvent):
-        """Captura eventos de usuarios uniéndose"""
-        event_data = {
-            'user': {
-                'unique_id': event.user.unique_id,
-                'nickname': event.user.nickname
+        """Captura eventos de usuarios uniéndose (rollup por minuto, filas crudas solo si se necesitan)"""
+        fields = {
+            'event_type': 'JoinEvent',
+            'timestamp': timezone.now(),
+            **self._user_fields(event.user),
+            'event_data': {
+                'user': {
+                    'unique_id': event.user.unique_id,
+                    'nickname': event.user.nickname
+                }
             }
         }
 
-        live_event = await sync_to_async(LiveEvent.objects.create)(
-            session=self.session,
-            event_type='JoinEvent',
-            timestamp=timezone.now(),
-            room_id=self.room_id,
-            streamer_unique_id=self.streamer_username,
-            user_id=getattr(event.user, 'user_id', None),
-            user_unique_id=event.user.unique_id,
-            user_nickname=clean_text(event.user.nickname),
-            event_data=event_data
-        )
-        await sync_to_async(EventDispatcher.dispatch)(live_event)
+        if self.join_handling != 'raw':
+            self.join_rollup.add(fields['user_id'] or fields['user_unique_id'])
+            # Bajo presión las filas crudas solo se guardan si un servicio las procesa
+            store_raw = self.join_store_raw and (self.join_subscribed or self.pressure.level == LEVEL_NORMAL)
+            if not store_raw:
+                self._journal(fields)
+                return
+
+        await self._capture(fields)
         # print(f"🚪 {event.user.unique_id} se unió al live")
 
     async def on_subscribe(self, event: SubscribeEvent):
         """Captura eventos de suscripciones"""
-        event_data = {
-            'user': {
-                'unique_id': event.user.unique_id,
-                'nickname': event.user.nickname
+        await self._capture({
+            'event_type': 'SubscribeEvent',
+            'timestamp': timezone.now(),
+            **self._user_fields(event.user),
+            'event_data': {
+                'user': {
+                    'unique_id': event.user.unique_id,
+                    'nickname': event.user.nickname
+                }
             }
-        }
-
-        live_event = await sync_to_async(LiveEvent.objects.create)(
-            session=self.session,
-            event_type='SubscribeEvent',
-            timestamp=timezone.now(),
-            room_id=self.room_id,
-            streamer_unique_id=self.streamer_username,
-            user_id=getattr(event.user, 'user_id', None),
-            user_unique_id=event.user.unique_id,
-            user_nickname=clean_text(event.user.nickname),
-            event_data=event_data
-        )
-        await sync_to_async(EventDispatcher.dispatch)(live_event)
-        print(f"⭐ {event.user.unique_id} se suscribió")
+        })
+        logger.info("⭐ %s se suscribió", event.user.unique_id)
 
     async def on_room_user_seq(self, event: RoomUserSeqEvent):
         """Captura snapshots de viewer count en tiempo real"""
-        event_data = {
-            'viewer_count': getattr(event, 'm_total', 0),
-            'total_unique_viewers': getattr(event, 'total_user', 0),
-            'anonymous': getattr(event, 'anonymous', 0),
-        }
-
-        await sync_to_async(LiveEvent.objects.create)(
-            session=self.session,
-            event_type='ViewerCountEvent',
-            timestamp=timezone.now(),
-            room_id=self.room_id,
-            streamer_unique_id=self.streamer_username,
-            event_data=event_data
-        )
+        await self._capture({
+            'event_type': 'ViewerCountEvent',
+            'timestamp': timezone.now(),
+            'event_data': {
+                'viewer_count': getattr(event, 'm_total', 0),
+                'total_unique_viewers': getattr(event, 'total_user', 0),
+                'anonymous': getattr(event, 'anonymous', 0),
+            }
+        }, dispatch=False)
 
     def start(self):
-        """Inicia la captura de eventos"""
+        """Inicia la captura de eventos (reconecta ante cortes hasta que termine el live)"""
         print(f"🎬 Iniciando captura de eventos para @{self.streamer_username}...")
         try:
-            self.client.run()
+            asyncio.run(self.run_supervised())
         except KeyboardInterrupt:
             # Finalizar la sesión al detener
-            if self.session:
-                self.session.end_session(status='completed')
-                print(f"\n✅ Sesión #{self.session.id} finalizada - Duración: {self.session.get_duration_display()}")
+            session = self.session
+            if session:
+                self.finish_session('completed')
+                print(f"\n✅ Sesión #{session.id} finalizada - Duración: {session.get_duration_display()}")
             raise
         except Exception as e:
             # Marcar sesión como abortada si hay error
-            if self.session:
-                self.session.end_session(status='aborted')
-                print(f"\n❌ Sesión #{self.session.id} abortada por error")
+            session = self.session
+            if session:
+                self.finish_session('aborted')
+                print(f"\n❌ Sesión #{session.id} abortada por error")
             raise
+
+        # El live terminó (o stop() desde otro thread)
+        session = self.session
+        if session:
+            self.finish_session('completed')
+            reason = '' if self.stopping else ' (fin del live)'
+            print(f"\n✅ Sesión #{session.id} finalizada{reason} - Duración: {session.get_duration_display()}")
@@ -1,3 +1,167 @@
-from django.test import TestCase
+import math
 
-# Create your tests here.
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from apps.tiktok_events.aggregators import HyperLogLog, JoinRollup
+from apps.tiktok_events.channel import EventChannelServer, iter_stream
+from apps.tiktok_events.journal import encode_record
+from apps.tiktok_events.models import LiveSession
+from apps.tiktok_events.services import TikTokEventCapture
+
+
+class HyperLogLogTests(SimpleTestCase):
+    """Estimación de usuarios distintos dentro de los márgenes del sketch"""
+
+    def assertWithinError(self, precision, cardinality, sigmas=3):
+        sketch = HyperLogLog(precision)
+        for user_id in range(cardinality):
+            sketch.add(f'user-{user_id}')
+        # Error estándar de HyperLogLog: 1.04 / sqrt(m)
+        tolerance = sigmas * 1.04 / math.sqrt(sketch.num_registers)
+        self.assertLessEqual(abs(sketch.estimate() - cardinality) / cardinality, tolerance,
+                             f'precision={precision} n={cardinality} estimate={sketch.estimate()}')
+
+    def test_empty_sketch(self):
+        self.assertEqual(HyperLogLog().estimate(), 0)
+
+    def test_small_cardinality_uses_linear_counting(self):
+        self.assertWithinError(10, 100)
+
+    def test_large_cardinality(self):
+        self.assertWithinError(10, 20_000)
+
+    def test_higher_precision_is_tighter(self):
+        self.assertWithinError(14, 50_000)
+
+    def test_duplicates_do_not_count(self):
+        sketch = HyperLogLog()
+        for _ in range(5):
+            for user_id in range(1000):
+                sketch.add(user_id)
+        self.assertAlmostEqual(sketch.estimate(), 1000, delta=1000 * 3 * 1.04 / math.sqrt(1024))
+
+    def test_hash_is_stable_between_sketches(self):
+        first, second = HyperLogLog(), HyperLogLog()
+        for user_id in range(500):
+            first.add(user_id)
+            second.add(user_id)
+        self.assertEqual(first.registers, second.registers)
+
+
+class JoinRollupTests(SimpleTestCase):
+    """Conteo exacto de joins por ventana y usuarios distintos de la sesión"""
+
+    def test_open_window_is_not_closed(self):
+        rollup = JoinRollup()
+        rollup.add('a')
+        self.assertEqual(rollup.pop_closed(), [])
+
+    def test_pop_all_counts_joins_and_distinct_users(self):
+        rollup = JoinRollup()
+        for user_key in ('a', 'b', 'a', None):
+            rollup.add(user_key)
+
+        # Puede cruzar un cambio de minuto: se suman las ventanas
+        windows = rollup.pop_all()
+
+        self.assertEqual(sum(window['joins'] for window in windows), 4)
+        self.assertEqual(windows[-1]['distinct_users'], 2)
+        self.assertEqual(windows[-1]['window_seconds'], JoinRollup.BUCKET_SECONDS)
+        self.assertEqual(rollup.pop_all(), [])
+
+
+class FakeSocket:
+    """Socket que entrega los bytes en los trozos indicados"""
+
+    def __init__(self, chunks):
+        self.chunks = list(chunks)
+
+    def recv(self, size):
+        return self.chunks.pop(0) if self.chunks else b''
+
+
+class IterStreamTests(SimpleTestCase):
+    """Lectura de registros con prefijo de longitud desde el socket"""
+
+    records = [{'seq': seq, 'comment': 'hola: ñandú' * seq} for seq in range(1, 30)]
+
+    def stream(self):
+        return b''.join(encode_record(record) for record in self.records)
+
+    def test_many_records_per_recv(self):
+        self.assertEqual(list(iter_stream(FakeSocket([self.stream()]))), self.records)
+
+    def test_records_split_across_recvs(self):
+        data = self.stream()
+        for size in (1, 7, 64):
+            chunks = [data[index:index + size] for index in range(0, len(data), size)]
+            self.assertEqual(list(iter_stream(FakeSocket(chunks))), self.records)
+
+    def test_incomplete_tail_is_not_yielded(self):
+        data = self.stream()
+        self.assertEqual(list(iter_stream(FakeSocket([data[:-1]]))), self.records[:-1])
+
+
+class ChannelDedupTests(SimpleTestCase):
+    """El consumidor descarta registros reenviados tras un envío parcial"""
+
+    def test_resent_records_are_skipped(self):
+        server = EventChannelServer(path='/tmp/unused.sock')
+        records = [{'sender': 'a', 'seq': seq} for seq in (1, 2, 3, 2, 3, 4)]
+
+        kept = [record['seq'] for record in records if not server._is_duplicate(record)]
+
+        self.assertEqual(kept, [1, 2, 3, 4])
+        self.assertEqual(server.duplicates, 2)
+
+    def test_senders_are_independent(self):
+        server = EventChannelServer(path='/tmp/unused.sock')
+
+        self.assertFalse(server._is_duplicate({'sender': 'a', 'seq': 1}))
+        self.assertFalse(server._is_duplicate({'sender': 'b', 'seq': 1}))
+        self.assertFalse(server._is_duplicate({'event_type': 'LikeEvent'}))
+
+
+class ListSink:
+    """Destino de canal en memoria (mismo contrato que EventChannelClient.send)"""
+
+    def __init__(self):
+        self.records = []
+
+    def send(self, record):
+        self.records.append(record)
+
+
+class SessionEventCountTests(TestCase):
+    """LiveSession.total_events cuenta igual con captura en proceso o por canal"""
+
+    def capture_session(self, channel=None):
+        capture = TikTokEventCapture('streamer', channel=channel)
+        capture.room_id = 1
+        capture.session = LiveSession.objects.create(room_id=1, streamer_unique_id='streamer')
+        return capture
+
+    def emit(self, capture, count):
+        for _ in range(count):
+            capture._emit({'event_type': 'CommentEvent', 'timestamp': timezone.now(), 'event_data': {}}, False)
+
+    def test_in_process_and_channel_count_the_same(self):
+        for channel in (None, ListSink()):
+            capture = self.capture_session(channel)
+            session_id = capture.session.id
+            self.emit(capture, 3)
+            capture.save_event_count()
+            self.emit(capture, 2)
+
+            capture.finish_session()
+
+            self.assertEqual(LiveSession.objects.get(id=session_id).total_events, 5)
+
+    def test_save_only_adds_new_events(self):
+        capture = self.capture_session(ListSink())
+        self.emit(capture, 4)
+        capture.save_event_count()
+        capture.save_event_count()
+
+        self.assertEqual(LiveSession.objects.get(id=capture.session.id).total_events, 4)
@@ -11,6 +11,17 @@ def _parse_event_data(event):
     return d if isinstance(d, dict) else json.loads(d)
 
 
+def _count_joins(events):
+    """
+    Joins de la sesion. Con rollups por minuto (JoinRollupEvent) se suman esos
+    y se ignoran las filas crudas para no contar doble.
+    """
+    rollups = events.filter(event_type='JoinRollupEvent')
+    if rollups.exists():
+        return sum(_parse_event_data(r).get('joins', 0) for r in rollups)
+    return events.filter(event_type='JoinEvent').count()
+
+
 def _session_metrics(session):
     """Calcula todas las metricas de una sesion"""
     events = LiveEvent.objects.filter(session=session)
@@ -27,7 +38,7 @@ def _session_metrics(session):
     total_unique = _parse_event_data(last_vc).get('total_unique_viewers', 0) if last_vc else 0
 
     # Joins
-    total_joins = events.filter(event_type='JoinEvent').count()
+    total_joins = _count_joins(events)
 
     # Gifts & revenue
     total_diamonds = 0
@@ -54,7 +65,7 @@ def _session_metrics(session):
     conversion = round((len(gifters) / total_unique * 100), 1) if total_unique > 0 else 0
 
     # Engagement (events excluding viewer count / unique viewers)
-    interaction_events = events.exclude(event_type='ViewerCountEvent').count()
+    interaction_events = events.exclude(event_type__in=['ViewerCountEvent', 'JoinRollupEvent', 'JoinEvent']).count() + total_joins
     engagement_per_viewer = round(interaction_events / total_unique, 1) if total_unique > 0 else 0
 
     # Avg watch time estimate (total viewer-seconds / unique viewers)
@@ -167,12 +178,22 @@ def session_detail_api(request, session_id):
     duration_min = int(session.get_duration() / 60) + 1 if session.ended_at else 1
     events_by_min = {m: {'joins': 0, 'gifts': 0, 'comments': 0, 'likes': 0} for m in range(duration_min)}
 
+    has_join_rollups = events.filter(event_type='JoinRollupEvent').exists()
     for e in events.exclude(event_type='ViewerCountEvent'):
         m = int((e.timestamp - session.started_at).total_seconds() / 60)
         m = min(m, duration_min - 1)
+        if e.event_type == 'JoinRollupEvent':
+            events_by_min[m]['joins'] += _parse_event_data(e).get('joins', 0)
+            continue
+        if e.event_type == 'JoinEvent' and has_join_rollups:
+            continue
         etype = e.event_type.replace('Event', '').lower() + 's'
         if etype in events_by_min.get(m, {}):
-            events_by_min[m][etype] += 1
+            # Los likes agregados cuentan cada tap
+            if e.event_type == 'LikeEvent':
+                events_by_min[m][etype] += (_parse_event_data(e).get('aggregated') or {}).get('taps', 1)
+            else:
+                events_by_min[m][etype] += 1
 
     # Gift breakdown
     gifts = {}
@@ -121,6 +121,13 @@ else:
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
             'NAME': BASE_DIR / 'db.sqlite3',
+            'OPTIONS': {
+                # Las transacciones toman el lock de escritura al empezar: sin esto
+                # dos threads que leen y después escriben (encolado del dispatcher)
+                # fallan con "database is locked" en vez de esperarse
+                'transaction_mode': 'IMMEDIATE',
+                'timeout': 20,
+            },
         }
     }
 
@@ -33,6 +33,7 @@ urlpatterns = [
 
     path('tugofwar/', include('apps.services.tugofwar.game.urls')),
     path('simulator/', include('apps.simulator.urls')),
+    path('queue/', include('apps.queue_system.urls')),
     path('analytics/', include('apps.tiktok_events.urls')),
     path('', include('apps.tiktok_events.urls')),
 ]